@@ -0,0 +1,72 @@
+"""Fixed corpus of seeded game positions used by the benchmarks."""
+import random
+from typing import Dict, List, Optional, Tuple
+
+COLORS = ["Red", "Blue", "Yellow", "Black"]
+JOKER = (1, "Joker")
+
+TileSpec = Tuple[int, str]
+
+OPPONENT_HAND = 14
+
+# name -> (melds on the table, hand size, jokers in the hand, jokers allowed on the table)
+CATEGORIES: Dict[str, Tuple[Tuple[int, int], Tuple[int, int], int, int]] = {
+    "early": ((0, 2), (14, 16), 0, 0),
+    "mid": ((5, 15), (6, 12), 0, 1),
+    "joker": ((3, 8), (6, 10), 2, 0),
+}
+
+
+def make_position(seed: int, category: str, blocks_range: int = 13) -> dict:
+    """Deterministic position for (seed, category): hand, table and the remaining stock."""
+    (melds_lo, melds_hi), (hand_lo, hand_hi), hand_jokers, table_jokers = CATEGORIES[category]
+    rng = random.Random(f"{category}-{seed}")
+
+    available = {(n, c): 2 for c in COLORS for n in range(1, blocks_range + 1)}
+    available[JOKER] = 2 - hand_jokers
+
+    def take(tiles: List[TileSpec]) -> bool:
+        need: Dict[TileSpec, int] = {}
+        for t in tiles:
+            need[t] = need.get(t, 0) + 1
+        if any(available.get(t, 0) < k for t, k in need.items()):
+            return False
+        for t, k in need.items():
+            available[t] -= k
+        return True
+
+    table: List[List[TileSpec]] = []
+    jokers_on_table = 0
+    target = rng.randint(melds_lo, melds_hi)
+    for _ in range(1000):
+        if len(table) >= target:
+            break
+        if rng.random() < 0.5:
+            color = rng.choice(COLORS)
+            length = rng.randint(3, min(5, blocks_range))
+            start = rng.randint(1, blocks_range - length + 1)
+            meld = [(start + i, color) for i in range(length)]
+        else:
+            number = rng.randint(1, blocks_range)
+            meld = [(number, c) for c in rng.sample(COLORS, rng.randint(3, 4))]
+        if jokers_on_table < table_jokers and rng.random() < 0.2:
+            meld[rng.randrange(len(meld))] = JOKER
+        if take(meld):
+            jokers_on_table += meld.count(JOKER)
+            table.append(meld)
+
+    rest = sorted(t for t, k in available.items() for _ in range(k))
+    rng.shuffle(rest)
+    hand_size = rng.randint(hand_lo, hand_hi)
+    hand = [JOKER] * hand_jokers + rest[:hand_size - hand_jokers]
+    rest = rest[hand_size - hand_jokers:]
+    # the opponent needs a hand for the mask computed after env.step
+    opponent, stock = rest[:OPPONENT_HAND], rest[OPPONENT_HAND:]
+    return {"name": f"{category}-{seed}", "category": category,
+            "hand": hand, "opponent": opponent, "table": table, "stock": stock}
+
+
+def corpus(positions_per_category: int = 10, categories: Optional[List[str]] = None) -> List[dict]:
+    return [make_position(seed, category)
+            for category in (categories or list(CATEGORIES))
+            for seed in range(positions_per_category)]
@@ -0,0 +1,234 @@
+"""
+Benchmarks of the solvers and the environment on a fixed corpus of seeded positions.
+
+    python -m bench.run --output bench.json
+    python -m bench.run --compare bench.json     # exits with 1 when something got slower
+
+Timed for both engines: possible_moves, find_all_valid_moves (first move from three hand tiles),
+building the action mask, a full env.step and cloning the game state. Results are written as JSON.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import rummikub_solver
+
+from python import generation
+from python.environment import RummikubEnv
+from python.tile import Tile as PythonTile
+
+from .positions import CATEGORIES, corpus
+
+ENGINES = ["cpp", "python"]
+BENCHMARKS = ["possible_moves", "find_all_valid_moves", "mask", "step", "clone"]
+
+# GameState clones per position and repetition in the clone benchmark
+CLONES = 1000
+
+CPP_COLORS = {
+    "Red": rummikub_solver.TileColor.Red,
+    "Blue": rummikub_solver.TileColor.Blue,
+    "Yellow": rummikub_solver.TileColor.Yellow,
+    "Black": rummikub_solver.TileColor.Black,
+    "Joker": rummikub_solver.TileColor.Joker,
+}
+
+
+def to_tiles(engine: str, specs) -> list:
+    if engine == "cpp":
+        return [rummikub_solver.Tile(number, CPP_COLORS[color]) for number, color in specs]
+    return [PythonTile(number, color) for number, color in specs]
+
+
+def load_position(env: RummikubEnv, position: dict) -> None:
+    """Puts the position into a fresh engine of the env, player 0 to move."""
+    env.engine = env._new_engine()
+    state = env.engine.state
+    state.hands = [to_tiles(env.version, position["hand"]), to_tiles(env.version, position["opponent"])]
+    state.table = [to_tiles(env.version, meld) for meld in position["table"]]
+    state.stock = to_tiles(env.version, position["stock"])
+    state.current_player = 0
+    state.player_putted = False
+
+
+def chosen_action(mask: np.ndarray) -> int:
+    """First placing action, otherwise DRAW or PASS."""
+    placing = np.flatnonzero(mask[2:])
+    if len(placing):
+        return int(placing[0]) + 2
+    return 1 if mask[1] else 0
+
+
+def make_case(benchmark: str, engine: str, env: RummikubEnv, position: dict):
+    """(setup, timed) pair; setup runs untimed before every repetition and its result is passed to timed."""
+    hand = to_tiles(engine, position["hand"])
+    table = [to_tiles(engine, meld) for meld in position["table"]]
+    solver = rummikub_solver if engine == "cpp" else generation
+
+    if benchmark == "possible_moves":
+        return (lambda: None), (lambda _: solver.possible_moves(hand, table, 3))
+    if benchmark == "find_all_valid_moves":
+        return (lambda: None), (lambda _: solver.find_all_valid_moves(hand[:3], table, True))
+
+    if benchmark == "mask":
+        def setup():
+            load_position(env, position)
+
+        return setup, (lambda _: env._get_mask())
+
+    if benchmark == "step":
+        def setup():
+            load_position(env, position)
+            # the mask of the current state is built by the previous step in a real rollout
+            return chosen_action(env._get_mask())
+
+        return setup, env.step
+
+    if benchmark == "clone":
+        def setup():
+            load_position(env, position)
+            return env.engine.state
+
+        if engine == "cpp":
+            # looped in C++, so the Python call overhead is not measured
+            return setup, (lambda state: rummikub_solver.measure_clone_rate(state, CLONES))
+
+        def clone_many(state):
+            for _ in range(CLONES):
+                state.clone()
+
+        return setup, clone_many
+
+    raise ValueError(f"Unknown benchmark: {benchmark}")
+
+
+def measure(setup: Callable, timed: Callable, repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        timed(arg)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(engines: List[str], benchmarks: List[str], positions: List[dict], python_positions: int,
+        repeat: int) -> List[dict]:
+    envs = {engine: RummikubEnv(players=2, version=engine) for engine in engines}
+    results = []
+    for engine in engines:
+        for category in dict.fromkeys(p["category"] for p in positions):
+            selected = [p for p in positions if p["category"] == category]
+            if engine == "python":
+                selected = selected[:python_positions]
+            if not selected:
+                continue
+
+            for benchmark in benchmarks:
+                per_position: Dict[str, List[float]] = {}
+                for position in selected:
+                    setup, timed = make_case(benchmark, engine, envs[engine], position)
+                    per_position[position["name"]] = measure(setup, timed, repeat)
+
+                totals = [sum(times[i] for times in per_position.values()) for i in range(repeat)]
+                record = {
+                    "engine": engine,
+                    "benchmark": benchmark,
+                    "category": category,
+                    "positions": len(selected),
+                    "repeat": repeat,
+                    "best_s": sum(min(times) for times in per_position.values()),
+                    "median_s": statistics.median(totals),
+                    "per_position_s": {name: min(times) for name, times in per_position.items()},
+                }
+                if benchmark == "clone":
+                    record["clones_per_s"] = len(selected) * CLONES / record["best_s"]
+                results.append(record)
+                print(f"{engine:6} {benchmark:20} {category:6} {len(selected):3} positions  "
+                      f"best {record['best_s'] * 1000:10.2f} ms  median {record['median_s'] * 1000:10.2f} ms",
+                      file=sys.stderr)
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Descriptions of the results that are more than threshold times slower than in the baseline."""
+    def key(record):
+        return record["engine"], record["benchmark"], record["category"], record["positions"]
+
+    old = {key(record): record for record in baseline["results"]}
+    regressions = []
+    for record in current["results"]:
+        before = old.get(key(record))
+        if before is None or before["best_s"] <= 0:
+            continue
+        ratio = record["best_s"] / before["best_s"]
+        if ratio > threshold:
+            regressions.append(f"{record['engine']} {record['benchmark']} {record['category']}: "
+                               f"{before['best_s'] * 1000:.2f} ms -> {record['best_s'] * 1000:.2f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, default=10, help="positions per category")
+    parser.add_argument("--python_positions", type=int, default=1,
+                        help="positions per category for the (much slower) python engine")
+    parser.add_argument("--categories", nargs="+", choices=list(CATEGORIES), default=list(CATEGORIES))
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--solver_threads", type=int, default=None)
+    parser.add_argument("--output", type=str, default=None, help="JSON file, stdout when omitted")
+    parser.add_argument("--compare", type=str, default=None, help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    if args.solver_threads is not None:
+        rummikub_solver.set_num_threads(args.solver_threads)
+
+    positions = corpus(args.positions, args.categories)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "solver_threads": rummikub_solver.get_num_threads(),
+            "positions": args.positions,
+            "python_positions": args.python_positions,
+        },
+        "results": run(args.engines, args.benchmarks, positions, args.python_positions, args.repeat),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
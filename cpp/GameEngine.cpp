@@ -1,14 +1,41 @@
 #include "GameEngine.h"
+#include "thread_pool.h"
+#include "stats.h"
+#include "symmetry.h"
+#include "result_store.h"
 #include <algorithm>
+#include <array>
+#include <mutex>
 #include <random>
 #include <stdexcept>
 #include <map>
 #include <string>
+#include <unordered_set>
 
 
-GameState::GameState(int num_players, int blocks, int r)
-    : players(num_players), current_player(0), done(false), winner(std::nullopt) {
+namespace {
 
+std::mt19937_64 make_rng(std::optional<uint64_t> seed) {
+    if (seed) return std::mt19937_64(*seed);
+    std::random_device rd;
+    std::seed_seq seq{rd(), rd(), rd(), rd()};
+    return std::mt19937_64(seq);
+}
+
+}
+
+GameState::GameState(int num_players, int blocks, int r, std::optional<uint64_t> seed)
+    : players(num_players), current_player(0), done(false), winner(std::nullopt), player_putted(false) {
+    auto rng = make_rng(seed);
+    deal(blocks, r, rng);
+}
+
+GameState::GameState(int num_players, int blocks, int r, std::mt19937_64& rng)
+    : players(num_players), current_player(0), done(false), winner(std::nullopt), player_putted(false) {
+    deal(blocks, r, rng);
+}
+
+void GameState::deal(int blocks, int r, std::mt19937_64& rng) {
     std::vector<Tile> tile_pull;
     for (const auto& color : {TileColor::Red, TileColor::Blue, TileColor::Yellow, TileColor::Black}) {
         for (int number = 1; number <= r; ++number) {
@@ -19,85 +46,507 @@ GameState::GameState(int num_players, int blocks, int r)
     tile_pull.emplace_back(1, TileColor::Joker);
     tile_pull.emplace_back(1, TileColor::Joker);
 
-    stock = tile_pull;
-
     // Tasowanie
-    std::random_device rd;
-    std::mt19937 g(rd());
-    std::shuffle(stock.begin(), stock.end(), g);
+    std::shuffle(tile_pull.begin(), tile_pull.end(), rng);
 
     // Rozdawanie
-    hands.resize(players);
+    std::vector<std::vector<Tile>> dealt(players);
     for (int i = 0; i < players; ++i) {
         for (int j = 0; j < blocks; ++j) {
-            if (stock.empty()) break;
-            hands[i].push_back(stock.back());
-            stock.pop_back();
+            if (tile_pull.empty()) break;
+            dealt[i].push_back(tile_pull.back());
+            tile_pull.pop_back();
         }
     }
+
+    set_hands(std::move(dealt));
+    set_stock(std::move(tile_pull));
+    set_table({});
+}
+
+std::vector<Tile> GameState::stock() const {
+    return std::vector<Tile>(stock_tiles->begin(), stock_tiles->begin() + stock_count);
+}
+
+void GameState::set_stock(std::vector<Tile> tiles) {
+    stock_count = tiles.size();
+    stock_tiles = std::make_shared<const std::vector<Tile>>(std::move(tiles));
+}
+
+Tile GameState::draw() {
+    if (stock_count == 0) {
+        throw std::runtime_error("Draws from an empty stock");
+    }
+    return (*stock_tiles)[--stock_count];
+}
+
+void GameState::set_table(Layout layout) {
+    table_key = layout_hash(layout);
+    table_layout = std::make_shared<const Layout>(std::move(layout));
+}
+
+void GameState::set_hands(std::vector<std::vector<Tile>> new_hands) {
+    player_hands = std::move(new_hands);
+    hands_key = 0;
+    for (size_t player = 0; player < player_hands.size(); ++player) {
+        hands_key += hand_hash(static_cast<int>(player), player_hands[player]);
+    }
 }
 
-GameState GameState::clone() const {
-    GameState new_state(this->players);
-    new_state.stock = this->stock;
-    new_state.hands = this->hands;
-    new_state.table = this->table;
-    new_state.current_player = this->current_player;
-    new_state.done = this->done;
-    new_state.winner = this->winner;
-    new_state.player_putted = this->player_putted;
-    return new_state;
+void GameState::add_to_hand(int player, const Tile& tile) {
+    player_hands[player].push_back(tile);
+    hands_key += hand_key(player, tile_index(tile));
 }
 
+void GameState::remove_from_hand(int player, const std::vector<Tile>& tiles) {
+    TileCounts hand_counts(player_hands[player]);
+    uint64_t removed = 0;
+    for (const auto& tile : tiles) {
+        // Numer spoza zakresu trafiłby w indeks innego, prawdziwego kafelka
+        const bool in_range = tile.color == TileColor::Joker || (tile.number >= 1 && tile.number <= MAX_RANGE);
+        int idx = in_range ? tile_index(tile) : -1;
+        if (idx < 0 || idx >= TILE_SLOTS || hand_counts[idx] == 0) {
+            throw std::runtime_error("Player does not have the required tile: " + std::to_string(tile.number));
+        }
+        hand_counts[idx]--;
+        removed += hand_key(player, idx);
+    }
 
-GameEngine::GameEngine(int players, int blocks_start, int blocks_range)
-    : state(players, blocks_start, blocks_range) {}
+    player_hands[player] = hand_counts.to_tiles();
+    hands_key -= removed;
+}
+
+
+GameEngine::GameEngine(int players, int blocks_start, int blocks_range, std::optional<uint64_t> seed)
+    : rng(make_rng(seed)), state(players, blocks_start, blocks_range, rng),
+      blocks_start(blocks_start), blocks_range(blocks_range) {}
+
+void GameEngine::reset(std::optional<uint64_t> seed) {
+    if (seed) rng.seed(*seed);
+    state = GameState(state.players, blocks_start, blocks_range, rng);
+    move_cache.clear();
+    solver_states.clear();
+}
 
 std::vector<std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>>
 GameEngine::enumerate_moves(int player) {
     if (player < 0 || player >= state.players) {
         throw std::out_of_range("Invalid player index");
     }
-    const auto& hand = state.hands[player];
-    const auto& table = state.table;
+    const uint64_t key = state.position_hash(player);
+    auto it = move_cache.find(key);
+    if (it != move_cache.end()) {
+        cache_hits++;
+        return it->second;
+    }
+    cache_misses++;
 
-    return possible_moves_cpp(hand, table, 3);
+    std::vector<Move> moves;
+    if (SolverCache::instance().enabled() || ResultStore::instance().is_open()) {
+        // Ruchy silnika są takie same jak possible_moves_cpp(ręka, stół, 3), więc dzielą z nimi wpisy
+        // cache symetrii i magazynu na dysku: najpierw cache, potem magazyn, na końcu solver przyrostowy
+        TileCounts pool(state.table());
+        pool += TileCounts(state.hand(player));
+        const auto playable_hand = playable_tiles(TileCounts(state.hand(player)), pool).to_tiles();
+        moves = cached_moves(playable_hand, state.table(), 3, [&] {
+            return stored_moves(playable_hand, state.table(), 3, [&] { return incremental_moves(player); });
+        });
+    } else {
+        moves = incremental_moves(player);
+    }
+    move_cache.emplace(key, moves);
+    return moves;
 }
 
-void GameEngine::apply_move(int player, const std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>& move) {
-    if (player != state.current_player) {
-        throw std::runtime_error("It is not this player's turn");
+ActionTable::ActionTable(int blocks_range, const std::vector<std::vector<int>>& action_keys)
+    : blocks_range(blocks_range), observation_size(blocks_range * 4 * 2 + 2),
+      max_actions(static_cast<int>(action_keys.size()) + 2) {
+    if (blocks_range < 1 || blocks_range > MAX_RANGE) {
+        throw std::out_of_range("blocks_range must be between 1 and " + std::to_string(MAX_RANGE));
+    }
+    for (size_t i = 0; i < action_keys.size(); ++i) {
+        TileCounts key;
+        for (int idx : action_keys[i]) {
+            if (idx < 0 || idx > 4 * blocks_range) {
+                throw std::out_of_range("Action tile index out of range: " + std::to_string(idx));
+            }
+            key[idx]++;
+        }
+        index.emplace(key, static_cast<int>(i) + 2);
+        sizes.push_back(static_cast<int>(action_keys[i].size()));
+        key_width = std::max(key_width, sizes.back());
     }
 
-    const auto& new_table = std::get<0>(move);
-    const auto& used_tiles = std::get<1>(move);
+    keys.assign(action_keys.size() * key_width, -1);
+    for (size_t i = 0; i < action_keys.size(); ++i) {
+        std::copy(action_keys[i].begin(), action_keys[i].end(), keys.begin() + i * key_width);
+    }
+}
 
-    if (used_tiles.empty()) {
-        throw std::runtime_error("Incorrect move");
+std::vector<std::vector<int>> ActionTable::env_action_keys(int blocks_range) {
+    if (blocks_range < 1 || blocks_range > MAX_RANGE) {
+        throw std::out_of_range("blocks_range must be between 1 and " + std::to_string(MAX_RANGE));
     }
+    // Ta sama kolejność co w RummikubEnv.__init__; kolory Red, Blue, Yellow, Black
+    auto idx = [&](int number, int color) { return color * blocks_range + number - 1; };
+    const int joker = 4 * blocks_range;
+    auto key = [](std::vector<int> tiles) {
+        std::sort(tiles.begin(), tiles.end());
+        return tiles;
+    };
 
-    std::map<Tile, int> hand_counts;
-    for(const auto& tile : state.hands[player]) {
-        hand_counts[tile]++;
+    std::vector<std::vector<int>> actions;
+    // pojedyncze kafelki
+    for (int num = 1; num <= blocks_range; ++num) {
+        for (int color = 0; color < 4; ++color) actions.push_back({idx(num, color)});
     }
-    for(const auto& tile : used_tiles) {
-        if(hand_counts[tile] == 0) {
-            throw std::runtime_error("Player does not have the required tile: " + std::to_string(tile.number));
+    actions.push_back({joker});
+
+    // pary różnych kafelków (combinations po pojedynczych) i dwa takie same
+    const size_t singles = actions.size();
+    for (size_t a = 0; a < singles; ++a) {
+        for (size_t b = a + 1; b < singles; ++b) actions.push_back(key({actions[a][0], actions[b][0]}));
+    }
+    for (int num = 1; num <= blocks_range; ++num) {
+        for (int color = 0; color < 4; ++color) actions.push_back({idx(num, color), idx(num, color)});
+    }
+
+    // szeregi bez jokera i z jokerem w środku
+    for (int num = 1; num < blocks_range - 1; ++num) {
+        for (int color = 0; color < 4; ++color) {
+            actions.push_back({idx(num, color), idx(num + 1, color), idx(num + 2, color)});
+            actions.push_back(key({idx(num, color), joker, idx(num + 2, color)}));
         }
-        hand_counts[tile]--;
     }
+    // szeregi z jokerem na końcu
+    for (int num = 1; num < blocks_range; ++num) {
+        for (int color = 0; color < 4; ++color) {
+            actions.push_back(key({idx(num, color), idx(num + 1, color), joker}));
+        }
+    }
+    // grupy bez jokera, z jednym i z dwoma jokerami
+    const int groups[4][3] = {{0, 1, 2}, {0, 1, 3}, {0, 3, 2}, {3, 1, 2}};
+    const int pairs[6][2] = {{0, 1}, {0, 2}, {0, 3}, {1, 2}, {1, 3}, {2, 3}};
+    for (int num = 1; num <= blocks_range; ++num) {
+        for (const auto& g : groups) actions.push_back(key({idx(num, g[0]), idx(num, g[1]), idx(num, g[2])}));
+        for (const auto& p : pairs) actions.push_back(key({idx(num, p[0]), idx(num, p[1]), joker}));
+        for (int color = 0; color < 4; ++color) actions.push_back(key({idx(num, color), joker, joker}));
+    }
+    return actions;
+}
+
+std::shared_ptr<const ActionTable> ActionTable::shared(int blocks_range) {
+    if (blocks_range < 1 || blocks_range > MAX_RANGE) {
+        throw std::out_of_range("blocks_range must be between 1 and " + std::to_string(MAX_RANGE));
+    }
+    static std::mutex mtx;
+    static std::array<std::shared_ptr<const ActionTable>, MAX_RANGE + 1> tables;
+
+    std::lock_guard<std::mutex> lock(mtx);
+    if (!tables[blocks_range]) {
+        tables[blocks_range] = std::make_shared<const ActionTable>(blocks_range, env_action_keys(blocks_range));
+    }
+    return tables[blocks_range];
+}
+
+int ActionTable::find(const std::vector<Tile>& used) const {
+    TileCounts key;
+    for (const auto& tile : used) key[obs_index(tile)]++;
+    auto it = index.find(key);
+    return it == index.end() ? -1 : it->second;
+}
 
-    std::vector<Tile> new_hand;
-    for(const auto& pair : hand_counts) {
-        for(int i = 0; i < pair.second; ++i) {
-            new_hand.push_back(pair.first);
+int ActionTable::find_key(const std::vector<int>& tile_indices) const {
+    TileCounts key;
+    for (int idx : tile_indices) {
+        if (idx < 0 || idx > 4 * blocks_range) return -1;
+        key[idx]++;
+    }
+    auto it = index.find(key);
+    return it == index.end() ? -1 : it->second;
+}
+
+void GameEngine::set_action_table(std::shared_ptr<const ActionTable> table) {
+    // Bufory alokujemy raz na życie silnika: widoki numpy wskazują na nie bez kopii, więc realokacja
+    // zostawiłaby wcześniej pobrane widoki na zwolnionej pamięci. Kolejna tabela musi mieć te same rozmiary.
+    if (table) {
+        const bool allocated = !observation.empty() || !action_mask.empty();
+        if (allocated && (observation.size() != static_cast<size_t>(table->observation_size) ||
+                          action_mask.size() != static_cast<size_t>(table->max_actions))) {
+            throw std::invalid_argument("The action table must keep the engine's observation size and number of actions");
+        }
+        if (!allocated) {
+            observation.resize(table->observation_size);
+            action_mask.resize(table->max_actions);
         }
+        std::fill(observation.begin(), observation.end(), 0);
+        std::fill(action_mask.begin(), action_mask.end(), 0);
+    }
+    action_table = std::move(table);
+}
+
+const ActionTable& GameEngine::require_action_table() const {
+    if (!action_table) {
+        throw std::logic_error("Action table is not set");
+    }
+    return *action_table;
+}
+
+void GameEngine::update_observation() {
+    write_observation(observation.data());
+}
+
+void GameEngine::update_action_mask() {
+    write_action_mask(action_mask.data());
+}
+
+void GameEngine::write_observation(int32_t* out) const {
+    const ActionTable& table = require_action_table();
+    std::fill(out, out + table.observation_size, 0);
+    for (const auto& tile : state.hand(state.current_player)) out[table.obs_index(tile)]++;
+    for (const auto& meld : state.table()) {
+        for (const auto& tile : meld) out[table.obs_index(tile)]++;
+    }
+}
+
+void GameEngine::write_action_mask(int8_t* out) {
+    const ActionTable& table = require_action_table();
+    const auto legal_moves = enumerate_moves(state.current_player);
+    std::fill(out, out + table.max_actions, 0);
+
+    // PASS tylko po wystawieniu albo gdy nie ma już nic do zrobienia; DRAW dopóki jest stos
+    if (state.player_putted) {
+        out[0] = 1;
+    } else if (!state.stock_empty()) {
+        out[1] = 1;
+    } else if (legal_moves.empty()) {
+        out[0] = 1;
     }
-    state.hands[player] = new_hand;
 
-    state.table = new_table;
+    for (const auto& move : legal_moves) {
+        int action = table.find(std::get<1>(move));
+        if (action >= 0) out[action] = 1;
+    }
+}
+
+std::vector<std::vector<Move>> GameEngine::enumerate_moves_batch(const std::vector<GameEngine*>& engines) {
+    std::vector<GameEngine*> distinct(engines);
+    std::sort(distinct.begin(), distinct.end());
+    if (std::adjacent_find(distinct.begin(), distinct.end()) != distinct.end()) {
+        throw std::invalid_argument("The same engine appears more than once in the batch");
+    }
 
-    if (state.hands[player].empty()) {
+    std::vector<std::vector<Move>> results(engines.size());
+    ThreadPool::instance().parallel_for(engines.size(), 1, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            results[i] = engines[i]->enumerate_moves(engines[i]->state.current_player);
+        }
+    });
+    return results;
+}
+
+std::vector<std::vector<Move>> enumerate_moves_batch(const std::vector<GameState>& states) {
+    for (const auto& state : states) {
+        if (state.current_player < 0 || state.current_player >= state.players) {
+            throw std::out_of_range("Invalid player index");
+        }
+    }
+
+    std::vector<std::vector<Move>> results(states.size());
+    ThreadPool::instance().parallel_for(states.size(), 1, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            const auto& state = states[i];
+            results[i] = possible_moves_cpp(state.hand(state.current_player), state.table(), 3);
+        }
+    });
+    return results;
+}
+
+std::vector<Move> GameEngine::incremental_moves(int player) {
+    if (solver_states.size() < static_cast<size_t>(state.players)) {
+        solver_states.resize(state.players);
+    }
+    PlayerSolverState& solver = solver_states[player];
+    const MeldTable& meld_table = get_meld_table(MAX_RANGE);
+
+    TileCounts hand(state.hand(player));
+    TileCounts table_tiles(state.table());
+    TileCounts pool = table_tiles;
+    pool += hand;
+
+    if (!solver.initialized) {
+        solver.candidate_melds = meld_table.fitting_melds(pool);
+        solver.is_candidate.assign(meld_table.melds.size(), 0);
+        for (int meld_id : solver.candidate_melds) solver.is_candidate[meld_id] = 1;
+        solver.playability = PlayabilityIndex(pool);
+        solver.initialized = true;
+    } else if (pool != solver.playability.pool) {
+        PhaseTimer timer(StatPhase::MeldGeneration);
+        // Usuwamy układy z kafelkami, których ubyło, i dokładamy te z kafelkami, które doszły
+        bool removed = false;
+        std::vector<int> added;
+        for (int idx = 0; idx <= JOKER_INDEX; ++idx) {
+            if (pool[idx] < solver.playability.pool[idx]) removed = true;
+            else if (pool[idx] > solver.playability.pool[idx]) added.push_back(idx);
+        }
+        solver.playability.update(pool);
+
+        if (removed) {
+            auto& candidates = solver.candidate_melds;
+            candidates.erase(std::remove_if(candidates.begin(), candidates.end(), [&](int meld_id) {
+                if (pool.contains(meld_table.melds[meld_id])) return false;
+                solver.is_candidate[meld_id] = 0;
+                return true;
+            }), candidates.end());
+        }
+        for (int idx : added) {
+            for (int meld_id : meld_table.tile_to_melds[idx]) {
+                if (!solver.is_candidate[meld_id] && pool.contains(meld_table.melds[meld_id])) {
+                    solver.is_candidate[meld_id] = 1;
+                    solver.candidate_melds.push_back(meld_id);
+                    count_stat(StatCounter::MeldsGenerated);
+                }
+            }
+        }
+        if (!added.empty()) {
+            std::sort(solver.candidate_melds.begin(), solver.candidate_melds.end());
+        }
+    }
+
+    // Wynik kombinacji zależy tylko od niej i od stołu, więc po dobraniu kafelka liczymy tylko nowe kombinacje
+    if (state.table_hash() != solver.table_hash) {
+        solver.combo_results.clear();
+        solver.table_hash = state.table_hash();
+    }
+
+    // Pula zmienia się o kilka kafelków na turę, więc indeks grywalności jest tylko aktualizowany
+    auto playable_hand = solver.playability.playable(hand).to_tiles();
+    auto combos = hand_combinations(playable_hand, 3);
+
+    std::vector<Layout> solutions(combos.size());
+    std::vector<size_t> missing;
+    for (size_t i = 0; i < combos.size(); ++i) {
+        auto it = solver.combo_results.find(TileCounts(combos[i]));
+        if (it != solver.combo_results.end()) {
+            solutions[i] = it->second;
+        } else {
+            missing.push_back(i);
+        }
+    }
+
+    count_stat(StatCounter::Combinations, missing.size());
+    if (!missing.empty()) {
+        // Jedna sesja solvera na wywołanie: wiersze kandydatów budowane raz dla wszystkich brakujących kombinacji
+        const auto initial_table_canonical = canonical_layout(state.table());
+        const MeldSession session(meld_table, solver.candidate_melds);
+        ThreadPool::instance().parallel_for(missing.size(), 8, [&](size_t begin, size_t end) {
+            for (size_t k = begin; k < end; ++k) {
+                size_t i = missing[k];
+                auto solution_for_combo = find_valid_moves_in(session, TileCounts(combos[i]),
+                                                              table_tiles, initial_table_canonical, true);
+                if (!solution_for_combo.empty()) {
+                    solutions[i] = std::move(solution_for_combo[0]);
+                }
+            }
+        });
+        for (size_t i : missing) {
+            solver.combo_results.emplace(TileCounts(combos[i]), solutions[i]);
+        }
+    }
+
+    return collect_unique_moves(combos, solutions);
+}
+
+void GameEngine::clear_move_cache() {
+    move_cache.clear();
+}
+
+bool GameEngine::can_play(int player, const std::vector<Tile>& tiles) const {
+    return can_play_batch(player, {tiles})[0];
+}
+
+std::vector<bool> GameEngine::can_play_batch(int player, const std::vector<std::vector<Tile>>& tile_sets) const {
+    if (player < 0 || player >= state.players) {
+        throw std::out_of_range("Invalid player index");
+    }
+
+    std::vector<TileCounts> sets;
+    sets.reserve(tile_sets.size());
+    for (const auto& tiles : tile_sets) sets.emplace_back(tiles);
+
+    // Cache zna wszystkie ruchy do 3 kafelków, więc odpowiada bez szukania
+    auto it = move_cache.find(state.position_hash(player));
+    const bool small_sets = std::all_of(sets.begin(), sets.end(), [](const TileCounts& tiles) { return tiles.total() <= 3; });
+    if (it != move_cache.end() && small_sets) {
+        std::unordered_set<TileCounts, TileCountsHash> legal;
+        for (const auto& move : it->second) legal.insert(TileCounts(std::get<1>(move)));
+        std::vector<bool> result;
+        result.reserve(sets.size());
+        for (const auto& tiles : sets) result.push_back(legal.count(tiles) > 0);
+        return result;
+    }
+    if (solver_backend == SolverBackend::Dp) {
+        return can_play_dp(TileCounts(state.hand(player)), TileCounts(state.table()), sets);
+    }
+    return can_play_counts(TileCounts(state.hand(player)), TileCounts(state.table()), sets);
+}
+
+bool GameEngine::has_any_move(int player) const {
+    if (player < 0 || player >= state.players) {
+        throw std::out_of_range("Invalid player index");
+    }
+    auto it = move_cache.find(state.position_hash(player));
+    if (it != move_cache.end()) {
+        return !it->second.empty();
+    }
+    if (solver_backend == SolverBackend::Dp) {
+        return max_placeable_dp(TileCounts(state.hand(player)), TileCounts(state.table()), 3) > 0;
+    }
+    return has_any_move_cpp(state.hand(player), state.table(), 3);
+}
+
+MoveGenerator GameEngine::iter_moves(int player) const {
+    if (player < 0 || player >= state.players) {
+        throw std::out_of_range("Invalid player index");
+    }
+    auto it = move_cache.find(state.position_hash(player));
+    if (it != move_cache.end()) {
+        return MoveGenerator(it->second);
+    }
+    return MoveGenerator(state.hand(player), state.table(), 3);
+}
+
+std::optional<Move> GameEngine::best_move(int player, const std::string& objective, size_t max_tiles) const {
+    if (player < 0 || player >= state.players) {
+        throw std::out_of_range("Invalid player index");
+    }
+    return best_move_cpp(state.hand(player), state.table(), objective, max_tiles);
+}
+
+int GameEngine::max_tiles_placeable(int player, size_t max_tiles) const {
+    if (player < 0 || player >= state.players) {
+        throw std::out_of_range("Invalid player index");
+    }
+    return max_tiles_placeable_cpp(state.hand(player), state.table(), max_tiles, solver_backend_name(solver_backend));
+}
+
+void GameEngine::apply_move(int player, const std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>& move) {
+    if (player != state.current_player) {
+        throw std::runtime_error("It is not this player's turn");
+    }
+
+    const auto& new_table = std::get<0>(move);
+    const auto& used_tiles = std::get<1>(move);
+
+    if (used_tiles.empty()) {
+        throw std::runtime_error("Incorrect move");
+    }
+
+    state.remove_from_hand(player, used_tiles);
+    state.set_table(new_table);
+    move_cache.clear();
+
+    if (state.hand(player).empty()) {
         state.done = true;
         state.winner = player;
     }
@@ -106,13 +555,9 @@ void GameEngine::apply_move(int player, const std::tuple<std::vector<std::vector
 void GameEngine::next_player(bool placed) {
     int player = state.current_player;
     if (!placed) {
-        if (state.stock.empty()) {
-            throw std::runtime_error("Draws from an empty stock");
-        } else {
-            state.hands[player].push_back(state.stock.back());
-            state.stock.pop_back();
-        }
+        state.add_to_hand(player, state.draw());
     }
+    move_cache.clear();
 
     state.player_putted = false;
 
@@ -3,37 +3,192 @@
 
 #include "tile.h"
 #include "solver.h"
+#include "dp_solver.h"
+#include "zobrist.h"
 #include <vector>
 #include <optional>
+#include <string>
 #include <tuple>
+#include <map>
+#include <memory>
+#include <cstdint>
+#include <random>
+#include <unordered_map>
 
 class GameState {
 public:
-    std::vector<Tile> stock;
-    std::vector<std::vector<Tile>> hands;
-    std::vector<std::vector<Tile>> table;
     int players;
     int current_player;
     bool done;
     std::optional<int> winner;
     bool player_putted;
 
-    GameState(int num_players, int blocks = 14, int r = 13);
+    // Rozdanie z podanego ziarna albo losowe, gdy go brak
+    GameState(int num_players, int blocks = 14, int r = 13, std::optional<uint64_t> seed = std::nullopt);
+    GameState(int num_players, int blocks, int r, std::mt19937_64& rng);
 
-    GameState clone() const;
+    // Kopia bez ponownego tasowania; stos i stół są współdzielone z oryginałem
+    GameState clone() const { return *this; }
+
+    // Stos i stół są współdzielone między klonami (copy-on-write): dobieranie tylko skraca
+    // widoczną część stosu, a ruch podmienia cały stół, więc wspólne dane nigdy się nie zmieniają
+    size_t stock_size() const { return stock_count; }
+    bool stock_empty() const { return stock_count == 0; }
+    std::vector<Tile> stock() const;
+    void set_stock(std::vector<Tile> tiles);
+    Tile draw();
+
+    // Stół i ręce zmieniają się tylko przez metody stanu (Python dostaje kopie, nie widoki na nie),
+    // więc hasz Zobrista i wspólny stół klonów są zawsze aktualne
+    const Layout& table() const { return *table_layout; }
+    void set_table(Layout layout);
+
+    const std::vector<std::vector<Tile>>& hands() const { return player_hands; }
+    const std::vector<Tile>& hand(int player) const { return player_hands[player]; }
+    void set_hands(std::vector<std::vector<Tile>> new_hands);
+    void add_to_hand(int player, const Tile& tile);
+    // Zabiera kafelki z ręki (ręka zostaje posortowana); brak któregoś kafelka to runtime_error
+    void remove_from_hand(int player, const std::vector<Tile>& tiles);
+
+    // Hasz Zobrista: ręce wszystkich graczy, stół i gracz na ruchu (bez stosu, którego gracze nie widzą).
+    // Dobranie i zagranie kafelka zmienia go w O(1) na kafelek, nowy stół w czasie liczby jego kafelków
+    uint64_t zobrist_hash() const { return hands_key ^ table_key ^ player_key(current_player); }
+    // Hasz ręki gracza i stołu: wszystko, od czego zależą ruchy gracza (ręka haszowana przy wywołaniu,
+    // żeby klon nie kopiował haszy wszystkich rąk)
+    uint64_t position_hash(int player) const { return hand_hash(player, player_hands[player]) ^ table_key; }
+    uint64_t table_hash() const { return table_key; }
+
+private:
+    std::shared_ptr<const std::vector<Tile>> stock_tiles;
+    size_t stock_count = 0;
+    std::shared_ptr<const Layout> table_layout;
+
+    std::vector<std::vector<Tile>> player_hands;
+    uint64_t hands_key = 0;           // suma hand_hash wszystkich graczy
+    uint64_t table_key = 0;           // layout_hash stołu
+
+    void deal(int blocks, int r, std::mt19937_64& rng);
+};
+
+// Stan solvera jednego gracza zachowywany między turami
+struct PlayerSolverState {
+    bool initialized = false;
+    PlayabilityIndex playability;         // pula ręka + stół z poprzedniego wywołania
+    std::vector<int> candidate_melds;     // układy z tabeli mieszczące się w puli (rosnąco)
+    std::vector<char> is_candidate;
+    uint64_t table_hash = 0;              // hasz stołu, dla którego ważne są wyniki kombinacji
+    std::map<TileCounts, Layout> combo_results; // pierwsze rozwiązanie kombinacji (puste = brak ruchu)
+};
+
+// Tabela akcji środowiska: użyte kafelki (w indeksach obserwacji) -> numer akcji (PASS i DRAW to 0 i 1)
+struct ActionTable {
+    int blocks_range;
+    int observation_size;
+    int max_actions;
+    std::unordered_map<TileCounts, int, TileCountsHash> index;
+    std::vector<int> sizes;   // liczba kafelków akcji i + 2
+    int key_width = 0;        // najwięcej kafelków w jednej akcji
+    std::vector<int32_t> keys; // (max_actions - 2) x key_width indeksów kafelków, dopełnione -1
+
+    // action_keys: dla akcji i + 2 posortowane indeksy kafelków jak w obserwacji
+    ActionTable(int blocks_range, const std::vector<std::vector<int>>& action_keys);
+
+    // Klucze akcji RummikubEnv (bez PASS i DRAW) w kolejności RummikubEnv.actions
+    static std::vector<std::vector<int>> env_action_keys(int blocks_range);
+    // Tabela akcji RummikubEnv dla zakresu, budowana raz na proces i współdzielona przez wszystkie środowiska
+    static std::shared_ptr<const ActionTable> shared(int blocks_range);
+
+    // indeks = kolor * liczba kafelków + (numer-1), jokery na końcu (jak RummikubEnv._tile_index)
+    int obs_index(const Tile& tile) const {
+        if (tile.color == TileColor::Joker) return 4 * blocks_range;
+        return static_cast<int>(tile.color) * blocks_range + (tile.number - 1);
+    }
+
+    // Numer akcji dla użytych kafelków albo -1
+    int find(const std::vector<Tile>& used) const;
+    // Numer akcji dla indeksów kafelków (w dowolnej kolejności) albo -1
+    int find_key(const std::vector<int>& tile_indices) const;
 };
 
 class GameEngine {
+    // Strumień losowy silnika; kolejne rozdania reset() bez ziarna pochodzą z niego
+    std::mt19937_64 rng;
+
 public:
     GameState state;
 
-    GameEngine(int players = 2, int blocks_start = 14, int blocks_range = 13);
+    // Statystyki cache ruchów
+    size_t cache_hits = 0;
+    size_t cache_misses = 0;
+
+    GameEngine(int players = 2, int blocks_start = 14, int blocks_range = 13, std::optional<uint64_t> seed = std::nullopt);
+
+    // Nowa gra; to samo ziarno daje to samo rozdanie
+    void reset(std::optional<uint64_t> seed = std::nullopt);
 
     std::vector<std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>> enumerate_moves(int player);
 
+    // Czy gracz może wyłożyć dokładnie te kafelki; z cache ruchów, jeśli jest, inaczej samo sprawdzenie pokrycia
+    bool can_play(int player, const std::vector<Tile>& tiles) const;
+    // can_play dla wielu zestawów naraz, np. kluczy wszystkich akcji środowiska
+    std::vector<bool> can_play_batch(int player, const std::vector<std::vector<Tile>>& tile_sets) const;
+    // Czy enumerate_moves(player) zwróciłoby cokolwiek (kończy na pierwszym znalezionym ruchu)
+    bool has_any_move(int player) const;
+
+    // Ruchy enumerate_moves po kolei: z cache, jeśli są, inaczej wyliczane leniwie bez zapisu do cache
+    MoveGenerator iter_moves(int player) const;
+
+    // Najlepszy ruch gracza bez wyliczania wszystkich (best_move_cpp); max_tiles = 3 jak w enumerate_moves
+    std::optional<Move> best_move(int player, const std::string& objective = "tiles", size_t max_tiles = 3) const;
+    // Najwięcej kafelków, które gracz może wyłożyć (0 = brak ruchu), bez budowania stołu
+    int max_tiles_placeable(int player, size_t max_tiles = 3) const;
+
+    // Solver zapytań bez budowania stołu (can_play, has_any_move, max_tiles_placeable): "exact_cover" albo "dp".
+    // enumerate_moves i best_move potrzebują nowego stołu, więc zawsze używają pokrycia dokładnego
+    void set_solver_backend(const std::string& backend) { solver_backend = solver_backend_from_string(backend); }
+    std::string get_solver_backend() const { return solver_backend_name(solver_backend); }
+
     void apply_move(int player, const std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>& move);
 
     void next_player(bool placed);
+
+    void clear_move_cache();
+
+    // Obserwacja i maska akcji bieżącego gracza, liczone w pamięci silnika (wymagają tabeli akcji).
+    // Przydzielane przy pierwszej tabeli akcji i nigdy nie realokowane.
+    std::vector<int32_t> observation;
+    std::vector<int8_t> action_mask;
+
+    void set_action_table(std::shared_ptr<const ActionTable> table);
+    const std::shared_ptr<const ActionTable>& get_action_table() const { return action_table; }
+
+    void update_observation();
+    void update_action_mask();
+    void write_observation(int32_t* out) const;
+    void write_action_mask(int8_t* out);
+
+    // enumerate_moves dla bieżącego gracza każdego silnika, równolegle w puli wątków (silniki muszą być różne)
+    static std::vector<std::vector<Move>> enumerate_moves_batch(const std::vector<GameEngine*>& engines);
+
+private:
+    int blocks_start;
+    int blocks_range;
+    SolverBackend solver_backend = SolverBackend::ExactCover;
+
+    // Ruchy zapamiętane dla position_hash gracza (ręka i stół), czyszczone przy każdej zmianie stanu
+    std::unordered_map<uint64_t, std::vector<Move>> move_cache;
+
+    // Stan solvera każdego gracza, aktualizowany o zmiany od poprzedniego wywołania
+    std::vector<PlayerSolverState> solver_states;
+
+    std::shared_ptr<const ActionTable> action_table;
+
+    const ActionTable& require_action_table() const;
+
+    std::vector<Move> incremental_moves(int player);
 };
 
+// Ruchy bieżącego gracza dla wielu stanów naraz, liczone równolegle w puli wątków
+std::vector<std::vector<Move>> enumerate_moves_batch(const std::vector<GameState>& states);
+
 #endif // GAME_LOGIC_H
\ No newline at end of file
@@ -0,0 +1,122 @@
+#include "VecEnv.h"
+#include "thread_pool.h"
+#include <algorithm>
+#include <stdexcept>
+#include <string>
+
+
+VecEnv::VecEnv(int num_envs, int players, int blocks_start, int blocks_range,
+               const std::vector<std::vector<int>>& action_keys)
+    : players(players), blocks_start(blocks_start), blocks_range(blocks_range),
+      action_table(action_keys.empty() ? ActionTable::shared(blocks_range)
+                                       : std::make_shared<const ActionTable>(blocks_range, action_keys)) {
+    if (num_envs < 1) {
+        throw std::invalid_argument("num_envs must be positive");
+    }
+
+    for (int i = 0; i < num_envs; ++i) {
+        engines.push_back(new_engine());
+    }
+    const size_t obs_size = static_cast<size_t>(num_envs) * observation_size();
+    observations.assign(obs_size, 0);
+    terminal_observations.assign(obs_size, 0);
+    rewards.assign(num_envs, 0.0f);
+    dones.assign(num_envs, 0);
+    action_masks.assign(static_cast<size_t>(num_envs) * max_actions(), 0);
+}
+
+GameEngine VecEnv::new_engine() const {
+    GameEngine engine(players, blocks_start, blocks_range);
+    engine.set_action_table(action_table);
+    return engine;
+}
+
+GameEngine& VecEnv::engine(int env) {
+    if (env < 0 || env >= num_envs()) {
+        throw std::out_of_range("Invalid env index");
+    }
+    return engines[env];
+}
+
+void VecEnv::reset(const std::vector<std::optional<uint64_t>>& seeds) {
+    if (!seeds.empty() && seeds.size() != engines.size()) {
+        throw std::invalid_argument("Expected one seed per env");
+    }
+
+    const size_t obs_size = observation_size();
+    const size_t mask_size = max_actions();
+    ThreadPool::instance().parallel_for(engines.size(), 1, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            engines[i].reset(seeds.empty() ? std::nullopt : seeds[i]);
+            rewards[i] = 0.0f;
+            dones[i] = 0;
+            engines[i].write_observation(&observations[i * obs_size]);
+            engines[i].write_action_mask(&action_masks[i * mask_size]);
+        }
+    });
+}
+
+void VecEnv::step(const std::vector<int64_t>& actions) {
+    if (actions.size() != engines.size()) {
+        throw std::invalid_argument("Expected one action per env");
+    }
+
+    const size_t obs_size = observation_size();
+    const size_t mask_size = max_actions();
+    // Wszystkie akcje sprawdzamy przed ruszeniem którejkolwiek gry, żeby błąd nie zostawił paczki w połowie kroku
+    for (size_t i = 0; i < engines.size(); ++i) {
+        if (actions[i] < 0 || actions[i] >= max_actions()) {
+            throw std::out_of_range("Out-of-scope action " + std::to_string(actions[i]) + " in env " + std::to_string(i));
+        }
+        if (!action_masks[i * mask_size + actions[i]]) {
+            throw std::invalid_argument("Action " + std::to_string(actions[i]) + " is not legal in env " + std::to_string(i));
+        }
+    }
+
+    ThreadPool::instance().parallel_for(engines.size(), 1, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            rewards[i] = step_env(static_cast<int>(i), actions[i]);
+            dones[i] = engines[i].state.done;
+
+            if (dones[i]) {
+                engines[i].write_observation(&terminal_observations[i * obs_size]);
+                engines[i].reset();
+            }
+            engines[i].write_observation(&observations[i * obs_size]);
+            engines[i].write_action_mask(&action_masks[i * mask_size]);
+        }
+    });
+}
+
+float VecEnv::step_env(int env, int64_t action) {
+    GameEngine& eng = engines[env];
+    const int player = eng.state.current_player;
+
+    // 0 - placed; 1 - draw
+    if (action <= 1) {
+        eng.next_player(action == 0);
+    } else {
+        // ruchy są już w cache silnika po wyliczeniu maski dla tego stanu
+        auto moves = eng.enumerate_moves(player);
+        auto it = std::find_if(moves.begin(), moves.end(), [&](const Move& move) {
+            return action_table->find(std::get<1>(move)) == action;
+        });
+        if (it == moves.end()) {
+            throw std::invalid_argument("Action " + std::to_string(action) + " is not legal in env " + std::to_string(env));
+        }
+        eng.apply_move(player, *it);
+        eng.state.player_putted = true;
+    }
+
+    // nagrody jak w RummikubEnv._get_reward
+    float reward = 0.0f;
+    if (action == 1) {
+        reward -= 0.5f;
+    } else if (action > 1) {
+        reward += static_cast<float>(action_table->sizes[action - 2]);
+    }
+    if (eng.state.done) {
+        reward += eng.state.winner == player ? 100.0f : -100.0f;
+    }
+    return reward;
+}
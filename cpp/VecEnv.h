@@ -0,0 +1,52 @@
+#ifndef VEC_ENV_H
+#define VEC_ENV_H
+
+#include "GameEngine.h"
+#include "tile.h"
+#include <cstdint>
+#include <memory>
+#include <optional>
+#include <vector>
+
+
+// N gier w jednym procesie, krokowanych równolegle w puli wątków.
+// Obserwacje, nagrody, końce epizodów i maski akcji są zapisywane w stałych buforach,
+// które Python widzi jako tablice numpy bez kopiowania.
+class VecEnv {
+public:
+    // action_keys: dla akcji i (numer akcji i + 2) posortowane indeksy kafelków jak w obserwacji;
+    // puste = wspólna tabela akcji RummikubEnv (ActionTable::shared)
+    VecEnv(int num_envs, int players, int blocks_start, int blocks_range,
+           const std::vector<std::vector<int>>& action_keys = {});
+
+    // seeds: opcjonalne ziarno dla każdego środowiska (puste = dalej strumienie silników)
+    void reset(const std::vector<std::optional<uint64_t>>& seeds = {});
+
+    // Wykonuje po jednej akcji w każdym środowisku; zakończone gry są od razu rozpoczynane od nowa,
+    // a ich ostatnia obserwacja trafia do terminal_observations
+    void step(const std::vector<int64_t>& actions);
+
+    int num_envs() const { return static_cast<int>(engines.size()); }
+    int observation_size() const { return action_table->observation_size; }
+    int max_actions() const { return action_table->max_actions; }
+
+    GameEngine& engine(int env);
+
+    std::vector<int32_t> observations;          // num_envs x observation_size
+    std::vector<int32_t> terminal_observations; // num_envs x observation_size
+    std::vector<float> rewards;
+    std::vector<uint8_t> dones;
+    std::vector<int8_t> action_masks;           // num_envs x max_actions
+
+private:
+    int players;
+    int blocks_start;
+    int blocks_range;
+    std::shared_ptr<const ActionTable> action_table;
+    std::vector<GameEngine> engines;
+
+    GameEngine new_engine() const;
+    float step_env(int env, int64_t action);
+};
+
+#endif // VEC_ENV_H
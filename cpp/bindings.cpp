@@ -2,12 +2,45 @@
 #include <pybind11/stl.h>
 #include <pybind11/operators.h>
 #include <pybind11/stl_bind.h>
+#include <pybind11/numpy.h>
+
+#include <chrono>
 
 #include "solver.h"
 #include "GameEngine.h"
+#include "thread_pool.h"
+#include "VecEnv.h"
+#include "simulation.h"
+#include "stats.h"
+#include "dp_solver.h"
+#include "zobrist.h"
+#include "symmetry.h"
+#include "result_store.h"
 
 namespace py = pybind11;
 
+namespace {
+
+// Liczy wynik bez GIL, a jego zamianę na obiekty Pythona mierzy jako fazę conversion
+template <typename Solve>
+py::object solve_then_cast(Solve&& solve) {
+    auto result = [&] {
+        py::gil_scoped_release release;
+        return solve();
+    }();
+    PhaseTimer timer(StatPhase::Conversion);
+    return py::cast(std::move(result));
+}
+
+// Widok bufora C++ bez prawa zapisu: zapis przez widok omijałby właściciela bufora
+template <typename T>
+py::array_t<T> read_only(py::array_t<T> array) {
+    array.attr("setflags")(py::arg("write") = false);
+    return array;
+}
+
+}
+
 PYBIND11_MODULE(rummikub_solver, m) {
     m.doc() = "C++ solver for Rummikub-like game logic";
 
@@ -44,41 +77,435 @@ PYBIND11_MODULE(rummikub_solver, m) {
 
 
     // Bindowanie głównej funkcji
-    m.def("find_all_valid_moves", &find_all_valid_moves_cpp,
+    m.def("find_all_valid_moves",
+        [](const std::vector<Tile>& hand, const std::vector<std::vector<Tile>>& table, bool first_only) {
+            return solve_then_cast([&] { return find_all_valid_moves_cpp(hand, table, first_only); });
+        },
         "Finds all valid moves (new table layouts)",
         py::arg("hand"),
         py::arg("table"),
         py::arg("first_only") = false);
 
+    m.def("generate_all_possible_melds", [](const std::vector<Tile>& tiles) {
+            auto melds = generate_all_possible_melds(tiles);
+            return std::vector<std::vector<Tile>>(melds.begin(), melds.end());
+        },
+        "Returns all valid groups and runs that can be built from the tiles",
+        py::arg("tiles"),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("meld_table_size", [](int blocks_range) { return get_meld_table(blocks_range).melds.size(); },
+        "Number of melds in the precomputed table for the given blocks range",
+        py::arg("blocks_range"));
+
     // Bindowanie nowej funkcji
     m.def("pre_filter_unplayable_tiles", &pre_filter_unplayable_tiles_cpp,
         "Filters out tiles from hand that cannot be part of any meld with current table and hand.",
         py::arg("hand"),
-        py::arg("table"));
+        py::arg("table"),
+        py::call_guard<py::gil_scoped_release>());
 
     // Zmodyfikowane bindowanie
-    m.def("possible_moves", &possible_moves_cpp,
+    m.def("possible_moves",
+        [](const std::vector<Tile>& hand, const std::vector<std::vector<Tile>>& table, size_t max_target) {
+            return solve_then_cast([&] { return possible_moves_cpp(hand, table, max_target); });
+        },
         "Returns all possible new table setups with used tiles",
         py::arg("hand"),
         py::arg("table"),
         py::arg("max_target") = 0);
 
+    py::class_<MoveGenerator>(m, "MoveIterator")
+        .def("__iter__", [](MoveGenerator& moves) -> MoveGenerator& { return moves; })
+        .def("__next__", [](MoveGenerator& moves) {
+            std::optional<Move> move;
+            {
+                py::gil_scoped_release release;
+                move = moves.next();
+            }
+            if (!move) throw py::stop_iteration();
+            return std::move(*move);
+        });
+
+    m.def("iter_moves", [](const std::vector<Tile>& hand, const std::vector<std::vector<Tile>>& table, size_t max_target) {
+            return MoveGenerator(hand, table, max_target);
+        },
+        "Iterator over the moves of possible_moves, in the same order; moves are solved only as they are requested",
+        py::arg("hand"),
+        py::arg("table"),
+        py::arg("max_target") = 0,
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("can_play",
+        [](const std::vector<Tile>& hand, const std::vector<std::vector<Tile>>& table,
+           const std::vector<std::vector<Tile>>& tile_sets, const std::string& backend) {
+            if (solver_backend_from_string(backend) == SolverBackend::ExactCover) {
+                return can_play_cpp(hand, table, tile_sets);
+            }
+            std::vector<TileCounts> sets;
+            for (const auto& tiles : tile_sets) sets.emplace_back(tiles);
+            return can_play_dp(TileCounts(hand), TileCounts(table), sets);
+        },
+        "For every tile set from the hand, whether placing exactly those tiles is a legal move; "
+        "only checks that the table can be rebuilt, without building it (backend 'exact_cover' or 'dp')",
+        py::arg("hand"),
+        py::arg("table"),
+        py::arg("tile_sets"),
+        py::arg("backend") = "exact_cover",
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("has_any_move",
+        [](const std::vector<Tile>& hand, const std::vector<std::vector<Tile>>& table, size_t max_target,
+           const std::string& backend) {
+            if (solver_backend_from_string(backend) == SolverBackend::ExactCover) {
+                return has_any_move_cpp(hand, table, max_target);
+            }
+            return max_placeable_dp(TileCounts(hand), TileCounts(table), max_target) > 0;
+        },
+        "Whether any move with at most max_target hand tiles (0 = no limit) exists, stopping at the first one "
+        "(backend 'exact_cover' or 'dp')",
+        py::arg("hand"),
+        py::arg("table"),
+        py::arg("max_target") = 0,
+        py::arg("backend") = "exact_cover",
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("max_tiles_placeable", &max_tiles_placeable_cpp,
+        "The most hand tiles (at most max_tiles, 0 = no limit) that can be placed together with the whole table, "
+        "0 without a move; backend 'dp' sweeps the numbers, 'exact_cover' uses best_move",
+        py::arg("hand"),
+        py::arg("table"),
+        py::arg("max_tiles") = 0,
+        py::arg("backend") = "dp",
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("tiles_hash", &tiles_hash,
+        "64-bit Zobrist hash of a multiset of tiles, independent of their order",
+        py::arg("tiles"));
+
+    m.def("layout_hash", &layout_hash,
+        "64-bit Zobrist hash of a table, independent of the order of the melds and of the tiles in them",
+        py::arg("table"));
+
+    m.def("best_move", &best_move_cpp,
+        "Returns the move placing the most tiles (objective='tiles') or the highest total number (objective='value', "
+        "joker = 30) found by branch and bound, or None; max_tiles limits the tiles taken from the hand (0 = no limit)",
+        py::arg("hand"),
+        py::arg("table"),
+        py::arg("objective") = "tiles",
+        py::arg("max_tiles") = 0,
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("set_num_threads", [](size_t num_threads) { ThreadPool::instance().set_num_threads(num_threads); },
+        "Sets the size of the solver thread pool (0 = all cores, 1 = solve in the calling thread only)",
+        py::arg("num_threads"),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("get_num_threads", []() { return ThreadPool::instance().num_threads(); },
+        "Returns the size of the solver thread pool");
+
+    m.def("set_stats_enabled", &set_stats_enabled,
+        "Turns the solver phase timers and counters on or off (off by default, RUMMIKUB_SOLVER_STATS=1 turns them on)",
+        py::arg("enabled"));
+
+    m.def("get_stats", []() {
+        const StatsSnapshot snapshot = get_stats();
+        py::dict stats;
+        stats["enabled"] = snapshot.enabled;
+        for (size_t i = 0; i < STAT_PHASES; ++i) {
+            const std::string name = stat_phase_name(static_cast<StatPhase>(i));
+            stats[(name + "_calls").c_str()] = snapshot.phase_calls[i];
+            stats[(name + "_seconds").c_str()] = snapshot.phase_seconds[i];
+        }
+        for (size_t i = 0; i < STAT_COUNTERS; ++i) {
+            stats[stat_counter_name(static_cast<StatCounter>(i))] = snapshot.counters[i];
+        }
+        return stats;
+    }, "Solver statistics since the last reset_stats(): calls and seconds (summed over threads) of every phase "
+       "(pre_filter, meld_generation, exact_cover, dedup, conversion, dp_sweep) and the search_nodes, "
+       "melds_generated, combinations, moves, dp_states, symmetry_hits, symmetry_misses, store_hits and "
+       "store_misses counters");
+
+    m.def("reset_stats", &reset_stats, "Zeroes the solver statistics");
+
+    m.def("set_solver_cache", [](bool enabled, size_t max_entries) {
+            SolverCache::instance().configure(enabled, max_entries);
+        },
+        "Turns the colour-symmetry cache of possible_moves and GameEngine.enumerate_moves on or off. Positions that "
+        "differ only by a permutation of the four colours share one entry; a hit can return another valid table "
+        "than solving would, so results depend on which position filled the entry. The oldest entries are dropped "
+        "beyond max_entries",
+        py::arg("enabled"),
+        py::arg("max_entries") = 10000);
+
+    m.def("solver_cache_info", [] {
+        const auto info = SolverCache::instance().info();
+        const uint64_t lookups = info.hits + info.misses;
+        py::dict result;
+        result["enabled"] = info.enabled;
+        result["entries"] = info.entries;
+        result["max_entries"] = info.max_entries;
+        result["hits"] = info.hits;
+        result["misses"] = info.misses;
+        result["hit_rate"] = lookups ? static_cast<double>(info.hits) / lookups : 0.0;
+        return result;
+    }, "State of the colour-symmetry cache: enabled, entries, max_entries, hits, misses and hit_rate");
+
+    m.def("clear_solver_cache", [] { SolverCache::instance().clear(); },
+        "Drops the colour-symmetry cache entries and zeroes its hit counters");
+
+    m.def("open_solver_store", [](const std::string& path, size_t max_bytes) {
+            ResultStore::instance().open(path, max_bytes);
+        },
+        "Opens or creates a memory-mapped file of find_all_valid_moves, possible_moves and "
+        "GameEngine.enumerate_moves results, consulted before solving. Any number of processes can share one file; a full store is emptied and refilled, so "
+        "the file never exceeds max_bytes. An existing store keeps the size it was created with",
+        py::arg("path"),
+        py::arg("max_bytes") = 64 * 1024 * 1024);
+
+    m.def("close_solver_store", [] { ResultStore::instance().close(); }, "Closes the solver result store");
+
+    m.def("solver_store_info", [] {
+        const auto info = ResultStore::instance().info();
+        const uint64_t lookups = info.hits + info.misses;
+        py::dict result;
+        result["open"] = info.open;
+        result["path"] = info.path;
+        result["entries"] = info.entries;
+        result["used_bytes"] = info.used_bytes;
+        result["max_bytes"] = info.max_bytes;
+        result["resets"] = info.resets;
+        result["hits"] = info.hits;
+        result["misses"] = info.misses;
+        result["hit_rate"] = lookups ? static_cast<double>(info.hits) / lookups : 0.0;
+        return result;
+    }, "State of the solver result store: open, path, entries, used_bytes, max_bytes, resets (times it was "
+       "emptied when full) and this process's hits, misses and hit_rate");
+
+    m.def("clear_solver_store", [] { ResultStore::instance().clear(); },
+        "Drops every entry of the solver result store, for all processes using the file, and zeroes the hit "
+        "counters of this process");
+
+    m.def("canonical_colors", [](const std::vector<Tile>& hand, const Layout& table) {
+            const ColorPermutation permutation = canonical_colors(TileCounts(hand), TileCounts(table));
+            std::vector<TileColor> mapping;
+            for (int color = 0; color < NUM_COLORS; ++color) {
+                mapping.push_back(static_cast<TileColor>(permutation.to_canonical[color]));
+            }
+            return py::make_tuple(permutation.apply(hand), permutation.apply(table), mapping);
+        },
+        "Colour-canonical form of a position: (hand, table, permutation), where permutation[c] is the colour that "
+        "colour c becomes; positions differing only by their colours get the same form",
+        py::arg("hand"),
+        py::arg("table"));
+
     py::class_<GameState>(m, "GameState")
-        .def(py::init<int, int, int>(), py::arg("players"), py::arg("blocks") = 14, py::arg("r") = 13)
-        .def_readwrite("stock", &GameState::stock)
-        .def_readwrite("hands", &GameState::hands)
-        .def_readwrite("table", &GameState::table)
+        .def(py::init<int, int, int, std::optional<uint64_t>>(), py::arg("players"), py::arg("blocks") = 14, py::arg("r") = 13,
+             py::arg("seed") = py::none())
+        .def_property("stock", &GameState::stock, &GameState::set_stock)
+        // Kopie, nie widoki: stół jest współdzielony przez klony, a zapis przez kafelek omijałby hasz Zobrista
+        .def_property("hands", [](const GameState& state) { return state.hands(); }, &GameState::set_hands,
+                      "Copy of the players' hands; assign a new list to change them")
+        .def_property("table", [](const GameState& state) { return state.table(); }, &GameState::set_table,
+                      "Copy of the table melds; assign a new list to change it")
         .def_readwrite("players", &GameState::players)
         .def_readwrite("current_player", &GameState::current_player)
         .def_readwrite("done", &GameState::done)
         .def_readwrite("winner", &GameState::winner)
         .def_readwrite("player_putted", &GameState::player_putted)
-        .def("clone", &GameState::clone);
+        .def("clone", &GameState::clone, "Copy without reshuffling; the stock and the table are shared until replaced")
+        .def("zobrist_hash", &GameState::zobrist_hash,
+             "64-bit Zobrist hash of the hands, the table and the player to move (the stock is not included)")
+        .def("position_hash", [](const GameState& state, int player) {
+                if (player < 0 || player >= static_cast<int>(state.hands().size())) {
+                    throw std::out_of_range("Invalid player index");
+                }
+                return state.position_hash(player);
+            },
+            "64-bit Zobrist hash of the player's hand and the table, the key of the engine's move cache",
+            py::arg("player"));
+
+    m.def("measure_clone_rate", [](const GameState& state, size_t iterations) {
+            auto start = std::chrono::steady_clock::now();
+            size_t checksum = 0;
+            for (size_t i = 0; i < iterations; ++i) {
+                GameState copy = state.clone();
+                checksum += copy.stock_size();
+            }
+            std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+            // suma kontrolna nie pozwala kompilatorowi usunąć pętli
+            return checksum == size_t(-1) || elapsed.count() <= 0 ? 0.0 : iterations / elapsed.count();
+        },
+        "Clones the state the given number of times in C++ and returns clones per second",
+        py::arg("state"),
+        py::arg("iterations") = 100000,
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("enumerate_moves_batch", py::overload_cast<const std::vector<GameState>&>(&enumerate_moves_batch),
+        "Returns the current player's possible moves for every state, solved in parallel",
+        py::arg("states"),
+        py::call_guard<py::gil_scoped_release>());
+
+    py::class_<SimulationStats>(m, "SimulationStats")
+        .def_readonly("games", &SimulationStats::games)
+        .def_readonly("unfinished", &SimulationStats::unfinished)
+        .def_readonly("wins", &SimulationStats::wins)
+        .def_readonly("rounds", &SimulationStats::rounds)
+        .def_readonly("moves", &SimulationStats::moves)
+        .def_readonly("tiles_placed", &SimulationStats::tiles_placed)
+        .def_readonly("winners", &SimulationStats::winners)
+        .def_readonly("game_seconds", &SimulationStats::game_seconds)
+        .def_readonly("total_seconds", &SimulationStats::total_seconds)
+        .def("__repr__", [](const SimulationStats& stats) {
+            return "<SimulationStats games=" + std::to_string(stats.games) +
+                   " unfinished=" + std::to_string(stats.unfinished) +
+                   " rounds=" + std::to_string(stats.rounds) + ">";
+        });
+
+    py::class_<ActionTable, std::shared_ptr<ActionTable>>(m, "ActionTable")
+        .def(py::init<int, const std::vector<std::vector<int>>&>(), py::arg("blocks_range"), py::arg("action_keys"))
+        .def_readonly("blocks_range", &ActionTable::blocks_range)
+        .def_readonly("observation_size", &ActionTable::observation_size)
+        .def_readonly("max_actions", &ActionTable::max_actions)
+        .def_property_readonly("keys", [](py::object self) {
+            // (max_actions - 2) x key_width, dopełnione -1; tylko do odczytu, bo tabela bywa współdzielona
+            auto& table = self.cast<ActionTable&>();
+            const py::ssize_t rows = table.max_actions - 2;
+            const py::ssize_t width = table.key_width;
+            return read_only(py::array_t<int32_t>(
+                {rows, width}, {width * py::ssize_t(sizeof(int32_t)), py::ssize_t(sizeof(int32_t))},
+                table.keys.data(), self));
+        })
+        .def("find", &ActionTable::find, "Action number of the used tiles, or -1", py::arg("tiles"))
+        .def("find_key", &ActionTable::find_key, "Action number of the tile indices (any order), or -1",
+             py::arg("tile_indices"));
+
+    m.def("get_action_table", [](int blocks_range) {
+            return std::const_pointer_cast<ActionTable>(ActionTable::shared(blocks_range));
+        },
+        "The RummikubEnv action table for the range, built once per process and shared by all environments",
+        py::arg("blocks_range"));
+
+    m.def("simulate", [](int n_games, const std::string& policy, size_t threads, std::optional<uint64_t> seed,
+                         int players, int blocks_start, int blocks_range, std::shared_ptr<ActionTable> action_table,
+                         int max_moves) {
+            return simulate(n_games, policy, threads, seed, players, blocks_start, blocks_range,
+                            std::move(action_table), max_moves);
+        },
+        "Plays full games with a random or greedy policy on several threads (0 = all cores) and returns SimulationStats; "
+        "with an action table only the moves RummikubEnv can choose are played",
+        py::arg("n_games"),
+        py::arg("policy") = "random",
+        py::arg("threads") = 0,
+        py::arg("seed") = py::none(),
+        py::arg("players") = 2,
+        py::arg("blocks_start") = 14,
+        py::arg("blocks_range") = 13,
+        py::arg("action_table") = nullptr,
+        py::arg("max_moves") = 10000,
+        py::call_guard<py::gil_scoped_release>());
 
     py::class_<GameEngine>(m, "GameEngine")
-        .def(py::init<int, int, int>(), py::arg("players") = 2, py::arg("blocks_start") = 14, py::arg("blocks_range") = 13)
+        .def(py::init<int, int, int, std::optional<uint64_t>>(), py::arg("players") = 2, py::arg("blocks_start") = 14,
+             py::arg("blocks_range") = 13, py::arg("seed") = py::none())
         .def_readwrite("state", &GameEngine::state)
-        .def("enumerate_moves", &GameEngine::enumerate_moves, py::arg("player"))
+        .def("reset", &GameEngine::reset,
+             "Starts a new game; the same seed gives the same deal, without a seed the engine's own stream is used",
+             py::arg("seed") = py::none())
+        .def("enumerate_moves",
+             [](GameEngine& engine, int player) {
+                 return solve_then_cast([&] { return engine.enumerate_moves(player); });
+             },
+             py::arg("player"))
+        .def("can_play", &GameEngine::can_play, py::arg("player"), py::arg("tiles"),
+             "Whether the player can place exactly these tiles", py::call_guard<py::gil_scoped_release>())
+        .def("can_play_batch", &GameEngine::can_play_batch, py::arg("player"), py::arg("tile_sets"),
+             "can_play for many tile sets at once, e.g. the keys of all env actions",
+             py::call_guard<py::gil_scoped_release>())
+        .def("has_any_move", &GameEngine::has_any_move, py::arg("player"),
+             "Whether enumerate_moves would return any move", py::call_guard<py::gil_scoped_release>())
+        .def("max_tiles_placeable", &GameEngine::max_tiles_placeable, py::arg("player"), py::arg("max_tiles") = 3,
+             "The most tiles the player can place (at most max_tiles, 0 = no limit), 0 without a move",
+             py::call_guard<py::gil_scoped_release>())
+        .def("set_solver_backend", &GameEngine::set_solver_backend, py::arg("backend"),
+             "Solver of can_play, can_play_batch, has_any_move and max_tiles_placeable when the moves are not cached: "
+             "'exact_cover' (default) or 'dp'; enumerate_moves and best_move always use exact cover")
+        .def("get_solver_backend", &GameEngine::get_solver_backend)
+        .def("iter_moves", &GameEngine::iter_moves, py::arg("player"),
+             "Iterator over the moves of enumerate_moves, solved lazily unless they are already cached",
+             py::call_guard<py::gil_scoped_release>())
+        .def("best_move", &GameEngine::best_move, py::arg("player"), py::arg("objective") = "tiles",
+             py::arg("max_tiles") = 3, py::call_guard<py::gil_scoped_release>())
         .def("apply_move", &GameEngine::apply_move, py::arg("player"), py::arg("move"))
-        .def("next_player", &GameEngine::next_player, py::arg("placed"));
-}
\ No newline at end of file
+        .def("next_player", &GameEngine::next_player, py::arg("placed"))
+        .def("clear_move_cache", &GameEngine::clear_move_cache)
+        .def("set_action_table", [](GameEngine& engine, std::shared_ptr<ActionTable> table) {
+                engine.set_action_table(std::move(table));
+             },
+             "Sets the action table used for the observation and action mask buffers. The buffers are allocated "
+             "by the first table; a later table must have the same observation_size and max_actions "
+             "(ValueError otherwise)",
+             py::arg("table"))
+        .def("update_observation", &GameEngine::update_observation,
+             "Writes the current player's tile counts into the observation buffer")
+        .def("update_action_mask", &GameEngine::update_action_mask,
+             "Writes the current player's legal actions into the action mask buffer",
+             py::call_guard<py::gil_scoped_release>())
+        // Widoki numpy na pamięć silnika, nadpisywane przez kolejne update_*
+        .def_property_readonly("observation", [](py::object self) {
+            auto& engine = self.cast<GameEngine&>();
+            return read_only(py::array_t<int32_t>({engine.observation.size()}, engine.observation.data(), self));
+        }, "Read-only view of the observation buffer, overwritten by the next update_observation()")
+        .def_property_readonly("action_mask", [](py::object self) {
+            auto& engine = self.cast<GameEngine&>();
+            return read_only(py::array_t<int8_t>({engine.action_mask.size()}, engine.action_mask.data(), self));
+        }, "Read-only view of the action mask buffer, overwritten by the next update_action_mask()")
+        .def_static("enumerate_moves_batch", &GameEngine::enumerate_moves_batch,
+             "Enumerates the current player's moves of every engine in parallel, using each engine's cache",
+             py::arg("engines"),
+             py::call_guard<py::gil_scoped_release>())
+        .def_readonly("cache_hits", &GameEngine::cache_hits)
+        .def_readonly("cache_misses", &GameEngine::cache_misses);
+
+    // Bufory VecEnv jako tablice numpy bez kopiowania; obiekt VecEnv żyje tak długo jak tablice
+    py::class_<VecEnv>(m, "VecEnv")
+        .def(py::init<int, int, int, int, const std::vector<std::vector<int>>&>(),
+             py::arg("num_envs"), py::arg("players") = 2, py::arg("blocks_start") = 14, py::arg("blocks_range") = 13,
+             py::arg("action_keys") = std::vector<std::vector<int>>())
+        .def("reset", &VecEnv::reset,
+             "Starts new games; seeds holds one optional seed per env (empty keeps the engines' own streams)",
+             py::arg("seeds") = std::vector<std::optional<uint64_t>>{},
+             py::call_guard<py::gil_scoped_release>())
+        .def("step", [](VecEnv& env, py::array_t<int64_t, py::array::c_style | py::array::forcecast> actions) {
+                std::vector<int64_t> acts(actions.data(), actions.data() + actions.size());
+                py::gil_scoped_release release;
+                env.step(acts);
+             },
+             "Steps every env with its action, resetting the finished ones. Every action is checked against "
+             "action_masks first, so an illegal one raises before any env moves",
+             py::arg("actions"))
+        .def("engine", &VecEnv::engine, py::arg("env"), py::return_value_policy::reference_internal)
+        .def_property_readonly("num_envs", &VecEnv::num_envs)
+        .def_property_readonly("observation_size", &VecEnv::observation_size)
+        .def_property_readonly("max_actions", &VecEnv::max_actions)
+        .def_property_readonly("observations", [](py::object self) {
+            auto& env = self.cast<VecEnv&>();
+            return py::array_t<int32_t>({env.num_envs(), env.observation_size()}, env.observations.data(), self);
+        })
+        .def_property_readonly("terminal_observations", [](py::object self) {
+            auto& env = self.cast<VecEnv&>();
+            return py::array_t<int32_t>({env.num_envs(), env.observation_size()}, env.terminal_observations.data(), self);
+        })
+        .def_property_readonly("rewards", [](py::object self) {
+            auto& env = self.cast<VecEnv&>();
+            return py::array_t<float>({env.num_envs()}, env.rewards.data(), self);
+        })
+        .def_property_readonly("dones", [](py::object self) {
+            auto& env = self.cast<VecEnv&>();
+            return py::array(py::dtype::of<bool>(), {env.num_envs()}, {1}, env.dones.data(), self);
+        })
+        .def_property_readonly("action_masks", [](py::object self) {
+            auto& env = self.cast<VecEnv&>();
+            return py::array_t<int8_t>({env.num_envs(), env.max_actions()}, env.action_masks.data(), self);
+        });
+}
@@ -0,0 +1,219 @@
+#include "dp_solver.h"
+#include "solver.h"
+#include "stats.h"
+#include "thread_pool.h"
+#include <array>
+#include <bitset>
+#include <stdexcept>
+#include <unordered_map>
+
+
+namespace {
+
+// Zestawy kafelków w jednym zadaniu puli wątków
+constexpr size_t SETS_PER_TASK = 8;
+
+// Osiągalne liczby kafelków wyłożonych z ręki (bit k = da się wyłożyć k)
+constexpr int MAX_PLACED = 127;
+using Placed = std::bitset<MAX_PLACED + 1>;
+
+// Numery 0 i MAX_RANGE + 1 są tylko dla jokerów na końcach szeregu, np. 1..13 z jokerem
+constexpr int FIRST_COLUMN = 0;
+constexpr int LAST_COLUMN = MAX_RANGE + 1;
+constexpr int MAX_COPIES = 2;
+constexpr int MAX_JOKERS = 2;
+
+// Stan koloru: liczba otwartych szeregów o długości 1, 2 i 3+ (razem najwyżej 4: dwie kopie i dwa jokery)
+constexpr int color_code(int len1, int len2, int len3) { return len1 + 5 * len2 + 25 * len3; }
+
+// Klucz stanu: 7 bitów na kolor, potem kafelki odłożone do grup na bieżącym numerze (0..2 na kolor), potem jokery
+constexpr int COLOR_BITS = 7;
+constexpr int GROUP_SHIFT = NUM_COLORS * COLOR_BITS;
+constexpr int JOKER_SHIFT = GROUP_SHIFT + 7;
+constexpr uint64_t COLOR_MASK = (1u << COLOR_BITS) - 1;
+constexpr uint64_t RUNS_MASK = (uint64_t{1} << GROUP_SHIFT) - 1;
+
+int color_state(uint64_t key, int color) { return static_cast<int>((key >> (color * COLOR_BITS)) & COLOR_MASK); }
+int group_code(uint64_t key) { return static_cast<int>((key >> GROUP_SHIFT) & 0x7F); }
+int jokers_used(uint64_t key) { return static_cast<int>(key >> JOKER_SHIFT); }
+
+// Czy kafelki odłożone do grup (group_code: kopie każdego koloru w systemie trójkowym) razem z jokers jokerami
+// dzielą się na grupy: różne kolory, 3-4 kafelki, w każdej przynajmniej jeden zwykły kafelek
+bool split_into_groups(std::array<int, NUM_COLORS>& copies, int jokers) {
+    int first = 0;
+    while (first < NUM_COLORS && copies[first] == 0) ++first;
+    if (first == NUM_COLORS) return jokers == 0;
+
+    // Grupa z pierwszym kolorem, który jeszcze ma kafelki, i dowolnym podzbiorem pozostałych
+    for (int subset = 0; subset < (1 << NUM_COLORS); ++subset) {
+        if (!(subset & (1 << first))) continue;
+        int size = 0;
+        bool fits = true;
+        for (int color = 0; color < NUM_COLORS; ++color) {
+            if (!(subset & (1 << color))) continue;
+            fits &= copies[color] > 0;
+            size++;
+        }
+        if (!fits) continue;
+        for (int k = 0; k <= jokers; ++k) {
+            if (size + k < 3 || size + k > 4) continue;
+            for (int color = 0; color < NUM_COLORS; ++color) copies[color] -= (subset >> color) & 1;
+            bool ok = split_into_groups(copies, jokers - k);
+            for (int color = 0; color < NUM_COLORS; ++color) copies[color] += (subset >> color) & 1;
+            if (ok) return true;
+        }
+    }
+    return false;
+}
+
+const std::array<std::array<bool, MAX_JOKERS + 1>, 81>& group_table() {
+    static const auto table = [] {
+        std::array<std::array<bool, MAX_JOKERS + 1>, 81> result{};
+        for (int code = 0; code < 81; ++code) {
+            std::array<int, NUM_COLORS> copies{};
+            for (int color = 0, rest = code; color < NUM_COLORS; ++color, rest /= 3) copies[color] = rest % 3;
+            for (int jokers = 0; jokers <= MAX_JOKERS; ++jokers) result[code][jokers] = split_into_groups(copies, jokers);
+        }
+        return result;
+    }();
+    return table;
+}
+
+constexpr std::array<int, NUM_COLORS> GROUP_WEIGHT = {1, 3, 9, 27};
+
+void check_counts(const TileCounts& pool) {
+    for (int idx = 0; idx < JOKER_INDEX; ++idx) {
+        if (pool[idx] > MAX_COPIES) throw std::invalid_argument("The dp solver supports at most two copies of a tile");
+    }
+    if (pool[JOKER_INDEX] > MAX_JOKERS) throw std::invalid_argument("The dp solver supports at most two jokers");
+}
+
+// Osiągalne liczby kafelków z ręki (najwyżej cap), przy których cały stół i wybrane kafelki dzielą się na układy
+Placed sweep(const TileCounts& hand, const TileCounts& table, int cap) {
+    TileCounts pool = table;
+    pool += hand;
+    check_counts(pool);
+    PhaseTimer timer(StatPhase::DpSweep);
+
+    const int table_jokers = table[JOKER_INDEX];
+    const int total_jokers = pool[JOKER_INDEX];
+    Placed cap_mask;
+    for (int k = 0; k <= cap; ++k) cap_mask.set(k);
+    const auto& groups = group_table();
+
+    std::unordered_map<uint64_t, Placed> states{{0, Placed().set(0)}};
+    std::unordered_map<uint64_t, Placed> next;
+    uint64_t visited = 0;
+
+    for (int number = FIRST_COLUMN; number <= LAST_COLUMN; ++number) {
+        // Kolory po kolei: w kluczu kolory przed bieżącym mają już nowy stan, pozostałe jeszcze stary
+        for (int color = 0; color < NUM_COLORS; ++color) {
+            const int required = table.count(number, color);
+            const int optional = hand.count(number, color);
+            next.clear();
+            for (const auto& [key, placed] : states) {
+                const int state = color_state(key, color);
+                const int len1 = state % 5, len2 = state / 5 % 5, len3 = state / 25;
+                const int jokers_left = total_jokers - jokers_used(key);
+                const uint64_t base = key & ~(COLOR_MASK << (color * COLOR_BITS));
+
+                // Szeregi długości 1 i 2 muszą trwać, spośród 3+ extend trwa dalej, a started zaczyna się tutaj
+                for (int extend = 0; extend <= len3; ++extend) {
+                    for (int started = 0; len1 + len2 + extend + started <= required + optional + jokers_left; ++started) {
+                        const int in_runs = len1 + len2 + extend + started;
+                        for (int jokers = 0; jokers <= std::min(in_runs, jokers_left); ++jokers) {
+                            const int real_in_runs = in_runs - jokers;
+                            for (int used = std::max(required, real_in_runs); used <= required + optional; ++used) {
+                                const int grouped = used - real_in_runs;
+                                // Grupy i jokery są sumami, więc dodajemy zamiast składać bity
+                                const uint64_t new_key = base
+                                    + (uint64_t(color_code(started, len1, len2 + extend)) << (color * COLOR_BITS))
+                                    + (uint64_t(grouped * GROUP_WEIGHT[color]) << GROUP_SHIFT)
+                                    + (uint64_t(jokers) << JOKER_SHIFT);
+                                Placed shifted = (placed << (used - required)) & cap_mask;
+                                if (shifted.none()) continue;
+                                next[new_key] |= shifted;
+                            }
+                        }
+                    }
+                }
+            }
+            states.swap(next);
+        }
+
+        // Kafelki odłożone na tym numerze muszą utworzyć grupy, razem z częścią pozostałych jokerów
+        next.clear();
+        for (const auto& [key, placed] : states) {
+            const int code = group_code(key);
+            const int used = jokers_used(key);
+            for (int jokers = 0; jokers <= std::min(MAX_JOKERS, total_jokers - used); ++jokers) {
+                if (!groups[code][jokers]) continue;
+                next[(key & RUNS_MASK) | (uint64_t(used + jokers) << JOKER_SHIFT)] |= placed;
+            }
+        }
+        states.swap(next);
+        visited += states.size();
+    }
+    count_stat(StatCounter::DpStates, visited);
+
+    // Na końcu wszystkie szeregi muszą mieć co najmniej 3 kafelki; jokery stołu są obowiązkowe, jokery z ręki się liczą
+    Placed result;
+    for (const auto& [key, placed] : states) {
+        bool closed = true;
+        for (int color = 0; color < NUM_COLORS; ++color) closed &= color_state(key, color) % 25 == 0;
+        const int used = jokers_used(key);
+        if (closed && used >= table_jokers) result |= (placed << (used - table_jokers)) & cap_mask;
+    }
+    return result;
+}
+
+}
+
+SolverBackend solver_backend_from_string(const std::string& name) {
+    if (name == "exact_cover") return SolverBackend::ExactCover;
+    if (name == "dp") return SolverBackend::Dp;
+    throw std::invalid_argument("Unknown solver backend: " + name);
+}
+
+std::string solver_backend_name(SolverBackend backend) {
+    return backend == SolverBackend::Dp ? "dp" : "exact_cover";
+}
+
+bool has_cover_dp(const TileCounts& pool) {
+    return sweep(TileCounts(), pool, 0).test(0);
+}
+
+int max_placeable_dp(const TileCounts& hand, const TileCounts& table, size_t max_tiles) {
+    const int cap = max_tiles == 0 ? MAX_PLACED : static_cast<int>(std::min<size_t>(max_tiles, MAX_PLACED));
+    const Placed placed = sweep(hand, table, cap);
+    for (int k = cap; k >= 1; --k) {
+        if (placed.test(k)) return k;
+    }
+    return 0;
+}
+
+std::vector<bool> can_play_dp(const TileCounts& hand, const TileCounts& table, const std::vector<TileCounts>& tile_sets) {
+    std::vector<char> playable_sets(tile_sets.size(), 0);
+    ThreadPool::instance().parallel_for(tile_sets.size(), SETS_PER_TASK, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            if (tile_sets[i].empty() || !hand.contains(tile_sets[i])) continue;
+            TileCounts workspace = table;
+            workspace += tile_sets[i];
+            playable_sets[i] = has_cover_dp(workspace);
+        }
+    });
+    return std::vector<bool>(playable_sets.begin(), playable_sets.end());
+}
+
+int max_tiles_placeable_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const size_t max_tiles,
+    const std::string& backend
+) {
+    if (solver_backend_from_string(backend) == SolverBackend::Dp) {
+        return max_placeable_dp(TileCounts(hand), TileCounts(table), max_tiles);
+    }
+    auto move = best_move_cpp(hand, table, "tiles", max_tiles);
+    return move ? static_cast<int>(std::get<1>(*move).size()) : 0;
+}
@@ -0,0 +1,38 @@
+#ifndef DP_SOLVER_H
+#define DP_SOLVER_H
+
+#include "tile.h"
+#include <string>
+#include <vector>
+
+
+// Drugi solver: zamiast pokrycia dokładnego dla każdej kombinacji kafelków z ręki przechodzi numery po kolei
+// (programowanie dynamiczne). Stan po numerze N to liczba otwartych szeregów każdego koloru o długości 1, 2 i 3+
+// oraz liczba użytych jokerów; kafelki numeru N przedłużają szeregi, zaczynają nowe albo tworzą grupy.
+// Przy dwóch kopiach kafelka i dwóch jokerach liczba stanów jest stała, więc czas rośnie liniowo z zakresem numerów.
+// Odpowiada tylko na pytania o istnienie ruchu, bez budowania nowego stołu.
+
+enum class SolverBackend { ExactCover, Dp };
+
+// "exact_cover" albo "dp"
+SolverBackend solver_backend_from_string(const std::string& name);
+std::string solver_backend_name(SolverBackend backend);
+
+// Czy całą pulę da się podzielić na układy
+bool has_cover_dp(const TileCounts& pool);
+
+// Najwięcej kafelków z ręki (od 1 do max_tiles, 0 = bez limitu), które da się wyłożyć razem z całym stołem; 0 gdy brak ruchu
+int max_placeable_dp(const TileCounts& hand, const TileCounts& table, size_t max_tiles = 0);
+
+// can_play_counts liczone przemiataniem numerów
+std::vector<bool> can_play_dp(const TileCounts& hand, const TileCounts& table, const std::vector<TileCounts>& tile_sets);
+
+// max_placeable_dp albo rozmiar ruchu z best_move_cpp, zależnie od backendu
+int max_tiles_placeable_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const size_t max_tiles = 0,
+    const std::string& backend = "dp"
+);
+
+#endif // DP_SOLVER_H
@@ -0,0 +1,440 @@
+#include "result_store.h"
+#include "stats.h"
+#include <cstdlib>
+#include <cstring>
+#include <stdexcept>
+
+#ifndef _WIN32
+#include <cerrno>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+
+namespace {
+
+constexpr uint64_t STORE_MAGIC = 0x31524f5453424b52ULL; // "RKBSTOR1"
+constexpr uint32_t STORE_VERSION = 1;
+constexpr size_t HEADER_BYTES = 4096;
+constexpr size_t MIN_STORE_BYTES = 64 * 1024;
+constexpr size_t MIN_INDEX_SLOTS = 1024;
+constexpr size_t BYTES_PER_SLOT = 512; // jeden wpis indeksu na tyle bajtów pliku
+
+// Rodzaje zapytań w kluczu, żeby ta sama pozycja różnych funkcji dawała różne klucze
+constexpr uint64_t VALID_MOVES_KIND = 1;
+constexpr uint64_t POSSIBLE_MOVES_KIND = 16;
+
+struct StoreHeader {
+    uint64_t magic;
+    uint32_t version;
+    uint32_t index_slots;  // potęga dwójki
+    uint64_t data_bytes;   // pojemność obszaru danych
+    uint64_t used_bytes;   // koniec ostatniego dopisanego rekordu
+    uint64_t entries;
+    uint64_t resets;       // ile razy magazyn był czyszczony po zapełnieniu
+};
+
+struct IndexSlot {
+    uint64_t key;
+    uint64_t offset; // przesunięcie rekordu w obszarze danych + 1, 0 oznacza pusty slot
+};
+
+struct RecordHeader {
+    uint64_t key;
+    uint32_t size;
+    uint32_t reserved;
+};
+
+size_t index_slots_for(size_t max_bytes) {
+    size_t slots = MIN_INDEX_SLOTS;
+    while (slots * BYTES_PER_SLOT < max_bytes) slots *= 2;
+    return slots;
+}
+
+size_t store_bytes(const StoreHeader& header) {
+    return HEADER_BYTES + header.index_slots * sizeof(IndexSlot) + header.data_bytes;
+}
+
+size_t aligned(size_t bytes) {
+    return (bytes + 7) & ~size_t(7);
+}
+
+// Zapis wyników: kafelek to jeden bajt tile_index, listy poprzedza ich długość
+class Writer {
+public:
+    std::vector<uint8_t> bytes;
+
+    void put_u8(size_t value) { bytes.push_back(static_cast<uint8_t>(value)); }
+    void put_u32(size_t value) {
+        for (int shift = 0; shift < 32; shift += 8) bytes.push_back(static_cast<uint8_t>(value >> shift));
+    }
+    void put_tiles(const std::vector<Tile>& tiles) {
+        put_u8(tiles.size());
+        for (const auto& tile : tiles) put_u8(tile_index(tile));
+    }
+    void put_layout(const Layout& layout) {
+        put_u32(layout.size());
+        for (const auto& meld : layout) put_tiles(meld);
+    }
+};
+
+// Odczyt wyników; uszkodzony rekord zamienia się w brak wpisu
+class Reader {
+public:
+    Reader(const std::vector<uint8_t>& bytes) : bytes(bytes) {}
+
+    bool ok() const { return good; }
+    bool at_end() const { return pos == bytes.size(); }
+
+    size_t get_u8() {
+        if (pos + 1 > bytes.size()) return fail();
+        return bytes[pos++];
+    }
+    size_t get_u32() {
+        if (pos + 4 > bytes.size()) return fail();
+        size_t value = 0;
+        for (int shift = 0; shift < 32; shift += 8) value |= size_t(bytes[pos++]) << shift;
+        return value;
+    }
+    // Długość listy, której każdy element zajmuje co najmniej bajt, więc nie może przekraczać reszty rekordu
+    size_t get_count() {
+        const size_t count = get_u32();
+        return count <= bytes.size() - pos ? count : fail();
+    }
+    std::vector<Tile> get_tiles() {
+        std::vector<Tile> tiles(get_u8());
+        for (auto& tile : tiles) {
+            const size_t idx = get_u8();
+            if (idx > JOKER_INDEX) fail();
+            tile = index_to_tile(good ? static_cast<int>(idx) : 0);
+        }
+        return tiles;
+    }
+    Layout get_layout() {
+        const size_t melds = get_count();
+        Layout layout;
+        for (size_t i = 0; i < melds && good; ++i) layout.push_back(get_tiles());
+        return layout;
+    }
+
+private:
+    size_t fail() {
+        good = false;
+        pos = bytes.size();
+        return 0;
+    }
+
+    const std::vector<uint8_t>& bytes;
+    size_t pos = 0;
+    bool good = true;
+};
+
+#ifndef _WIN32
+// Blokada fcntl całego pliku na czas zakresu
+class FileLock {
+public:
+    FileLock(int fd, short type) : fd(fd) { lock(type); }
+    ~FileLock() { lock(F_UNLCK); }
+
+private:
+    void lock(short type) {
+        struct flock request{};
+        request.l_type = type;
+        request.l_whence = SEEK_SET;
+        while (fcntl(fd, F_SETLKW, &request) == -1 && errno == EINTR) {
+        }
+    }
+
+    int fd;
+};
+#endif
+
+}
+
+uint64_t valid_moves_key(const TileCounts& hand, const Layout& table, bool first_only) {
+    return mix64(counts_hash(hand) + mix64(VALID_MOVES_KIND + first_only)) ^ layout_hash(table);
+}
+
+uint64_t possible_moves_key(const std::vector<Tile>& playable_hand, const Layout& table, size_t max_target) {
+    return mix64(tiles_hash(playable_hand) + mix64(POSSIBLE_MOVES_KIND + max_target)) ^ layout_hash(table);
+}
+
+ResultStore::ResultStore() {
+    // RUMMIKUB_SOLVER_STORE=<ścieżka> otwiera magazyn od importu modułu, np. w każdym workerze SubprocVecEnv
+    const char* env = std::getenv("RUMMIKUB_SOLVER_STORE");
+    if (env && env[0] != '\0') {
+        try {
+            open(env, 64 * 1024 * 1024);
+        } catch (const std::exception&) {
+            // Niedostępny plik nie może zablokować importu; magazyn zostaje zamknięty
+        }
+    }
+}
+
+ResultStore::~ResultStore() {
+    std::lock_guard<std::mutex> lock(mutex);
+    close_locked();
+}
+
+ResultStore& ResultStore::instance() {
+    static ResultStore store;
+    return store;
+}
+
+#ifdef _WIN32
+
+void ResultStore::open(const std::string&, size_t) {
+    throw std::runtime_error("The solver store needs a POSIX system");
+}
+
+void ResultStore::close_locked() {}
+
+std::optional<std::vector<uint8_t>> ResultStore::find(uint64_t) { return std::nullopt; }
+
+void ResultStore::insert(uint64_t, const std::vector<uint8_t>&) {}
+
+void ResultStore::clear() {}
+
+#else
+
+void ResultStore::open(const std::string& new_path, size_t max_bytes) {
+    if (max_bytes < MIN_STORE_BYTES) {
+        throw std::invalid_argument("The solver store needs at least " + std::to_string(MIN_STORE_BYTES) + " bytes");
+    }
+    std::lock_guard<std::mutex> lock(mutex);
+    close_locked();
+
+    const int new_fd = ::open(new_path.c_str(), O_RDWR | O_CREAT | O_CLOEXEC, 0644);
+    if (new_fd == -1) {
+        throw std::runtime_error("Cannot open the solver store " + new_path + ": " + std::strerror(errno));
+    }
+
+    size_t file_bytes = 0;
+    {
+        FileLock file_lock(new_fd, F_WRLCK);
+        struct stat info{};
+        fstat(new_fd, &info);
+
+        StoreHeader header{};
+        const bool has_header = static_cast<size_t>(info.st_size) >= sizeof(header) &&
+                                pread(new_fd, &header, sizeof(header), 0) == sizeof(header);
+        const bool valid = has_header && header.magic == STORE_MAGIC && header.version == STORE_VERSION &&
+                           store_bytes(header) == static_cast<size_t>(info.st_size);
+
+        if (valid) {
+            file_bytes = store_bytes(header);
+        } else if (info.st_size != 0 && !(has_header && header.magic == STORE_MAGIC)) {
+            ::close(new_fd);
+            throw std::runtime_error("The file " + new_path + " is not a solver store");
+        } else {
+            // Nowy plik albo magazyn starszej wersji: zakładamy pusty magazyn o żądanym rozmiarze
+            header = StoreHeader{};
+            header.magic = STORE_MAGIC;
+            header.version = STORE_VERSION;
+            header.index_slots = static_cast<uint32_t>(index_slots_for(max_bytes));
+            const size_t fixed_bytes = HEADER_BYTES + header.index_slots * sizeof(IndexSlot);
+            if (max_bytes < fixed_bytes + MIN_STORE_BYTES / 2) max_bytes = fixed_bytes + MIN_STORE_BYTES / 2;
+            header.data_bytes = max_bytes - fixed_bytes;
+            file_bytes = store_bytes(header);
+
+            // Obcięcie do zera zeruje też indeks
+            if (ftruncate(new_fd, 0) == -1 || ftruncate(new_fd, static_cast<off_t>(file_bytes)) == -1 ||
+                pwrite(new_fd, &header, sizeof(header), 0) != sizeof(header)) {
+                const std::string error = std::strerror(errno);
+                ::close(new_fd);
+                throw std::runtime_error("Cannot create the solver store " + new_path + ": " + error);
+            }
+        }
+    }
+
+    void* mapped = mmap(nullptr, file_bytes, PROT_READ | PROT_WRITE, MAP_SHARED, new_fd, 0);
+    if (mapped == MAP_FAILED) {
+        const std::string error = std::strerror(errno);
+        ::close(new_fd);
+        throw std::runtime_error("Cannot map the solver store " + new_path + ": " + error);
+    }
+
+    fd = new_fd;
+    base = static_cast<uint8_t*>(mapped);
+    mapped_bytes = file_bytes;
+    path = new_path;
+    hits = 0;
+    misses = 0;
+    open_flag = true;
+}
+
+void ResultStore::close_locked() {
+    open_flag = false;
+    if (base) munmap(base, mapped_bytes);
+    if (fd != -1) ::close(fd);
+    base = nullptr;
+    mapped_bytes = 0;
+    fd = -1;
+    path.clear();
+}
+
+namespace {
+
+StoreHeader& header_of(uint8_t* base) {
+    return *reinterpret_cast<StoreHeader*>(base);
+}
+
+IndexSlot* index_of(uint8_t* base) {
+    return reinterpret_cast<IndexSlot*>(base + HEADER_BYTES);
+}
+
+uint8_t* data_of(uint8_t* base) {
+    return base + HEADER_BYTES + header_of(base).index_slots * sizeof(IndexSlot);
+}
+
+// Slot z kluczem albo pierwszy pusty slot na jego ścieżce sondowania
+IndexSlot& probe(uint8_t* base, uint64_t key) {
+    IndexSlot* index = index_of(base);
+    const size_t mask = header_of(base).index_slots - 1;
+    for (size_t i = key & mask;; i = (i + 1) & mask) {
+        if (index[i].offset == 0 || index[i].key == key) return index[i];
+    }
+}
+
+void reset_store(uint8_t* base) {
+    StoreHeader& header = header_of(base);
+    std::memset(index_of(base), 0, header.index_slots * sizeof(IndexSlot));
+    header.used_bytes = 0;
+    header.entries = 0;
+}
+
+}
+
+std::optional<std::vector<uint8_t>> ResultStore::find(uint64_t key) {
+    std::lock_guard<std::mutex> lock(mutex);
+    if (!base) return std::nullopt;
+
+    std::optional<std::vector<uint8_t>> payload;
+    {
+        FileLock file_lock(fd, F_RDLCK);
+        const StoreHeader& header = header_of(base);
+        const IndexSlot& slot = probe(base, key);
+        if (slot.offset != 0 && slot.offset - 1 + sizeof(RecordHeader) <= header.used_bytes) {
+            const uint8_t* record = data_of(base) + slot.offset - 1;
+            RecordHeader record_header;
+            std::memcpy(&record_header, record, sizeof(record_header));
+            if (record_header.key == key &&
+                slot.offset - 1 + sizeof(RecordHeader) + record_header.size <= header.used_bytes) {
+                const uint8_t* bytes = record + sizeof(RecordHeader);
+                payload.emplace(bytes, bytes + record_header.size);
+            }
+        }
+    }
+
+    if (payload) {
+        hits.fetch_add(1, std::memory_order_relaxed);
+        count_stat(StatCounter::StoreHits);
+    } else {
+        misses.fetch_add(1, std::memory_order_relaxed);
+        count_stat(StatCounter::StoreMisses);
+    }
+    return payload;
+}
+
+void ResultStore::insert(uint64_t key, const std::vector<uint8_t>& payload) {
+    std::lock_guard<std::mutex> lock(mutex);
+    if (!base) return;
+
+    FileLock file_lock(fd, F_WRLCK);
+    StoreHeader& header = header_of(base);
+    const size_t record_bytes = aligned(sizeof(RecordHeader) + payload.size());
+    // Rekord większy niż ćwierć obszaru danych wypychałby wszystko inne, więc go nie zapisujemy
+    if (record_bytes > header.data_bytes / 4 || probe(base, key).offset != 0) return;
+
+    // Zapełniony magazyn zaczyna od nowa; indeks zostaje najwyżej w 3/4 pełny, żeby sondowanie było krótkie
+    if (header.used_bytes + record_bytes > header.data_bytes || (header.entries + 1) * 4 > header.index_slots * 3ULL) {
+        reset_store(base);
+        ++header.resets;
+    }
+
+    RecordHeader record_header{key, static_cast<uint32_t>(payload.size()), 0};
+    uint8_t* record = data_of(base) + header.used_bytes;
+    std::memcpy(record, &record_header, sizeof(record_header));
+    if (!payload.empty()) std::memcpy(record + sizeof(record_header), payload.data(), payload.size());
+
+    IndexSlot& slot = probe(base, key);
+    slot.key = key;
+    slot.offset = header.used_bytes + 1;
+    header.used_bytes += record_bytes;
+    ++header.entries;
+}
+
+void ResultStore::clear() {
+    std::lock_guard<std::mutex> lock(mutex);
+    hits = 0;
+    misses = 0;
+    if (!base) return;
+    FileLock file_lock(fd, F_WRLCK);
+    reset_store(base);
+}
+
+#endif
+
+void ResultStore::close() {
+    std::lock_guard<std::mutex> lock(mutex);
+    close_locked();
+}
+
+ResultStore::Info ResultStore::info() const {
+    std::lock_guard<std::mutex> lock(mutex);
+    Info result{base != nullptr, path, 0, 0, mapped_bytes, 0, hits.load(), misses.load()};
+#ifndef _WIN32
+    if (base) {
+        FileLock file_lock(fd, F_RDLCK);
+        const StoreHeader& header = header_of(base);
+        result.entries = header.entries;
+        result.used_bytes = header.used_bytes;
+        result.resets = header.resets;
+    }
+#endif
+    return result;
+}
+
+std::optional<std::vector<Layout>> ResultStore::find_layouts(uint64_t key) {
+    auto payload = find(key);
+    if (!payload) return std::nullopt;
+
+    Reader reader(*payload);
+    std::vector<Layout> layouts(reader.get_count());
+    for (auto& layout : layouts) layout = reader.get_layout();
+    if (!reader.ok() || !reader.at_end()) return std::nullopt;
+    return layouts;
+}
+
+void ResultStore::insert_layouts(uint64_t key, const std::vector<Layout>& layouts) {
+    Writer writer;
+    writer.put_u32(layouts.size());
+    for (const auto& layout : layouts) writer.put_layout(layout);
+    insert(key, writer.bytes);
+}
+
+std::optional<std::vector<Move>> ResultStore::find_moves(uint64_t key) {
+    auto payload = find(key);
+    if (!payload) return std::nullopt;
+
+    Reader reader(*payload);
+    std::vector<Move> moves(reader.get_count());
+    for (auto& [layout, used] : moves) {
+        layout = reader.get_layout();
+        used = reader.get_tiles();
+    }
+    if (!reader.ok() || !reader.at_end()) return std::nullopt;
+    return moves;
+}
+
+void ResultStore::insert_moves(uint64_t key, const std::vector<Move>& moves) {
+    Writer writer;
+    writer.put_u32(moves.size());
+    for (const auto& [layout, used] : moves) {
+        writer.put_layout(layout);
+        writer.put_tiles(used);
+    }
+    insert(key, writer.bytes);
+}
@@ -0,0 +1,108 @@
+#ifndef RESULT_STORE_H
+#define RESULT_STORE_H
+
+#include "solver.h"
+#include "zobrist.h"
+#include <atomic>
+#include <cstdint>
+#include <mutex>
+#include <optional>
+#include <string>
+#include <vector>
+
+
+// Trwały magazyn wyników solvera w pliku mapowanym w pamięć, wspólny dla procesów (np. workerów SubprocVecEnv)
+// i kolejnych uruchomień. Klucz to hasz Zobrista pozycji (kafelki ręki, stół, rodzaj zapytania), wartość to
+// znalezione stoły albo ruchy; pusty wynik first_only zapisuje sam brak ruchu.
+//
+// Układ pliku: nagłówek, tablica indeksu (adresowanie otwarte, klucz -> przesunięcie rekordu) i obszar danych,
+// do którego rekordy są tylko dopisywane. Gdy obszar danych albo indeks się zapełni, magazyn jest czyszczony
+// w całości i zapełniany od nowa, więc plik nigdy nie rośnie ponad rozmiar podany przy tworzeniu.
+// Odczyty biorą współdzieloną blokadę fcntl na pliku, zapisy wyłączną: wiele procesów czyta naraz.
+class ResultStore {
+public:
+    struct Info {
+        bool open;
+        std::string path;
+        size_t entries;
+        size_t used_bytes;
+        size_t max_bytes;
+        uint64_t resets;
+        uint64_t hits;
+        uint64_t misses;
+    };
+
+    static ResultStore& instance();
+
+    // Otwiera albo tworzy plik; istniejący poprawny plik zachowuje swój rozmiar, max_bytes dotyczy nowego
+    void open(const std::string& path, size_t max_bytes);
+    void close();
+    bool is_open() const { return open_flag.load(std::memory_order_relaxed); }
+    Info info() const;
+    // Usuwa wszystkie wpisy z pliku (także dla innych procesów) i zeruje liczniki trafień tego procesu
+    void clear();
+
+    std::optional<std::vector<Layout>> find_layouts(uint64_t key);
+    void insert_layouts(uint64_t key, const std::vector<Layout>& layouts);
+    std::optional<std::vector<Move>> find_moves(uint64_t key);
+    void insert_moves(uint64_t key, const std::vector<Move>& moves);
+
+    ResultStore(const ResultStore&) = delete;
+    ResultStore& operator=(const ResultStore&) = delete;
+
+private:
+    ResultStore();
+    ~ResultStore();
+
+    std::optional<std::vector<uint8_t>> find(uint64_t key);
+    void insert(uint64_t key, const std::vector<uint8_t>& payload);
+    void close_locked();
+
+    std::atomic<bool> open_flag{false};
+    std::atomic<uint64_t> hits{0};
+    std::atomic<uint64_t> misses{0};
+    // Blokady fcntl należą do procesu, więc wątki jednego procesu dostają się do pliku po kolei
+    mutable std::mutex mutex;
+    std::string path;
+    int fd = -1;
+    uint8_t* base = nullptr;
+    size_t mapped_bytes = 0;
+};
+
+// Klucze zapytań: find_all_valid_moves (ręka, stół, first_only) i possible_moves (grywalna ręka, stół, max_target)
+uint64_t valid_moves_key(const TileCounts& hand, const Layout& table, bool first_only);
+uint64_t possible_moves_key(const std::vector<Tile>& playable_hand, const Layout& table, size_t max_target);
+
+// solve() przez magazyn, jeśli jest otwarty
+template <typename Solve>
+std::vector<Layout> stored_layouts(const TileCounts& hand, const Layout& table, bool first_only, Solve solve) {
+    ResultStore& store = ResultStore::instance();
+    if (!store.is_open()) {
+        return solve();
+    }
+    const uint64_t key = valid_moves_key(hand, table, first_only);
+    if (auto layouts = store.find_layouts(key)) {
+        return std::move(*layouts);
+    }
+    auto layouts = solve();
+    store.insert_layouts(key, layouts);
+    return layouts;
+}
+
+template <typename Solve>
+std::vector<Move> stored_moves(const std::vector<Tile>& playable_hand, const Layout& table, size_t max_target,
+                               Solve solve) {
+    ResultStore& store = ResultStore::instance();
+    if (!store.is_open()) {
+        return solve();
+    }
+    const uint64_t key = possible_moves_key(playable_hand, table, max_target);
+    if (auto moves = store.find_moves(key)) {
+        return std::move(*moves);
+    }
+    auto moves = solve();
+    store.insert_moves(key, moves);
+    return moves;
+}
+
+#endif // RESULT_STORE_H
@@ -0,0 +1,176 @@
+#include "simulation.h"
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <exception>
+#include <mutex>
+#include <random>
+#include <stdexcept>
+#include <thread>
+
+
+namespace {
+
+enum class Policy { Random, Greedy };
+
+struct GameResult {
+    int winner = -1;
+    long rounds = 1;
+    std::vector<long> moves;
+    std::vector<long> tiles_placed;
+    double seconds = 0.0;
+};
+
+uint64_t game_seed(uint64_t base, int game) {
+    // splitmix64, żeby sąsiednie gry miały niezależne rozdania
+    uint64_t z = base + 0x9E3779B97F4A7C15ULL * (static_cast<uint64_t>(game) + 1);
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+    return z ^ (z >> 31);
+}
+
+GameResult play_game(Policy policy, uint64_t seed, int players, int blocks_start, int blocks_range,
+                     const ActionTable* action_table, int max_moves) {
+    auto start = std::chrono::steady_clock::now();
+    GameEngine engine(players, blocks_start, blocks_range, seed);
+    std::mt19937_64 rng(seed ^ 0xD1B54A32D192ED03ULL);
+
+    GameResult result;
+    result.moves.assign(players, 0);
+    result.tiles_placed.assign(players, 0);
+
+    constexpr int PASS = -2;
+    constexpr int DRAW = -1;
+
+    for (int move_number = 0; move_number < max_moves && !engine.state.done; ++move_number) {
+        const int player = engine.state.current_player;
+        const auto moves = engine.enumerate_moves(player);
+
+        // Ruchy do wyboru; z tabelą akcji jeden ruch na numer akcji, jak w masce RummikubEnv
+        std::vector<int> placing;
+        if (action_table) {
+            std::vector<char> seen(action_table->max_actions, 0);
+            for (size_t i = 0; i < moves.size(); ++i) {
+                int action = action_table->find(std::get<1>(moves[i]));
+                if (action >= 0 && !seen[action]) {
+                    seen[action] = 1;
+                    placing.push_back(static_cast<int>(i));
+                }
+            }
+        } else {
+            for (size_t i = 0; i < moves.size(); ++i) placing.push_back(static_cast<int>(i));
+        }
+
+        // PASS i DRAW według reguł maski RummikubEnv
+        const bool can_pass = engine.state.player_putted || (engine.state.stock_empty() && moves.empty());
+        const bool can_draw = !engine.state.player_putted && !engine.state.stock_empty();
+
+        int choice = PASS;
+        if (policy == Policy::Random) {
+            std::vector<int> options = placing;
+            if (can_pass) options.push_back(PASS);
+            if (can_draw) options.push_back(DRAW);
+            if (options.empty()) break;
+            choice = options[std::uniform_int_distribution<size_t>(0, options.size() - 1)(rng)];
+        } else {
+            size_t best_size = 0;
+            for (int i : placing) {
+                size_t size = std::get<1>(moves[i]).size();
+                if (size > best_size) {
+                    best_size = size;
+                    choice = i;
+                }
+            }
+            if (best_size == 0) {
+                if (can_draw) choice = DRAW;
+                else if (can_pass) choice = PASS;
+                else break;
+            }
+        }
+
+        result.moves[player]++;
+        if (choice == PASS || choice == DRAW) {
+            engine.next_player(choice == PASS);
+            if (player == players - 1) result.rounds++;
+        } else {
+            result.tiles_placed[player] += static_cast<long>(std::get<1>(moves[choice]).size());
+            engine.apply_move(player, moves[choice]);
+            engine.state.player_putted = true;
+        }
+    }
+
+    if (engine.state.done && engine.state.winner) result.winner = *engine.state.winner;
+    result.seconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    return result;
+}
+
+}
+
+SimulationStats simulate(
+    int n_games,
+    const std::string& policy,
+    size_t threads,
+    std::optional<uint64_t> seed,
+    int players,
+    int blocks_start,
+    int blocks_range,
+    std::shared_ptr<const ActionTable> action_table,
+    int max_moves
+) {
+    Policy chosen;
+    if (policy == "random") chosen = Policy::Random;
+    else if (policy == "greedy") chosen = Policy::Greedy;
+    else throw std::invalid_argument("Unknown policy: " + policy);
+
+    if (n_games < 0) throw std::invalid_argument("n_games must not be negative");
+    if (players < 1) throw std::invalid_argument("players must be positive");
+
+    const uint64_t base_seed = seed ? *seed : std::random_device{}() * 0x100000001ULL + std::random_device{}();
+    if (threads == 0) threads = std::max<unsigned>(1, std::thread::hardware_concurrency());
+    threads = std::min<size_t>(threads, std::max(1, n_games));
+
+    auto start = std::chrono::steady_clock::now();
+    std::vector<GameResult> results(n_games);
+    std::atomic<int> next{0};
+    std::exception_ptr error;
+    std::mutex error_mtx;
+
+    // Każdy wątek bierze kolejne gry ze wspólnego licznika; solver w środku gry korzysta z puli wątków
+    auto worker = [&]() {
+        try {
+            for (int game = next++; game < n_games; game = next++) {
+                results[game] = play_game(chosen, game_seed(base_seed, game), players, blocks_start, blocks_range,
+                                          action_table.get(), max_moves);
+            }
+        } catch (...) {
+            std::lock_guard<std::mutex> lock(error_mtx);
+            if (!error) error = std::current_exception();
+            next = n_games;
+        }
+    };
+
+    std::vector<std::thread> pool;
+    for (size_t i = 1; i < threads; ++i) pool.emplace_back(worker);
+    worker();
+    for (auto& thread : pool) thread.join();
+    if (error) std::rethrow_exception(error);
+
+    SimulationStats stats;
+    stats.games = n_games;
+    stats.wins.assign(players, 0);
+    stats.moves.assign(players, 0);
+    stats.tiles_placed.assign(players, 0);
+    for (const auto& result : results) {
+        if (result.winner >= 0) stats.wins[result.winner]++;
+        else stats.unfinished++;
+        stats.rounds += result.rounds;
+        for (int p = 0; p < players; ++p) {
+            stats.moves[p] += result.moves[p];
+            stats.tiles_placed[p] += result.tiles_placed[p];
+        }
+        stats.winners.push_back(result.winner);
+        stats.game_seconds.push_back(result.seconds);
+    }
+    stats.total_seconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    return stats;
+}
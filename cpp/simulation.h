@@ -0,0 +1,41 @@
+#ifndef SIMULATION_H
+#define SIMULATION_H
+
+#include "GameEngine.h"
+#include <cstdint>
+#include <memory>
+#include <optional>
+#include <string>
+#include <vector>
+
+
+// Zbiorcze wyniki symulowanych gier (jak statystyki wypisywane przez train.py --mode test)
+struct SimulationStats {
+    int games = 0;
+    int unfinished = 0;                // gry przerwane po max_moves (np. same PASS przy pustym stosie)
+    std::vector<int> wins;             // na gracza
+    long rounds = 0;
+    std::vector<long> moves;           // wykonane akcje na gracza
+    std::vector<long> tiles_placed;    // wyłożone kafelki na gracza
+    std::vector<int> winners;          // na grę, -1 dla gier bez zwycięzcy
+    std::vector<double> game_seconds;  // na grę
+    double total_seconds = 0.0;
+};
+
+// Rozgrywa n_games pełnych gier na threads wątkach (0 = liczba rdzeni).
+// policy: "random" (losowa legalna akcja) albo "greedy" (ruch z największą liczbą kafelków, potem DRAW/PASS).
+// Gra i jest rozdawana z ziarna pochodnego od seed i i, więc wyniki nie zależą od liczby wątków.
+// Z action_table dostępne są tylko ruchy mające numer akcji, jak w RummikubEnv.
+SimulationStats simulate(
+    int n_games,
+    const std::string& policy = "random",
+    size_t threads = 0,
+    std::optional<uint64_t> seed = std::nullopt,
+    int players = 2,
+    int blocks_start = 14,
+    int blocks_range = 13,
+    std::shared_ptr<const ActionTable> action_table = nullptr,
+    int max_moves = 10000
+);
+
+#endif // SIMULATION_H
@@ -1,6 +1,11 @@
 #include "solver.h"
 #include "validation.h"
 #include "tile.h"
+#include "thread_pool.h"
+#include "stats.h"
+#include "zobrist.h"
+#include "symmetry.h"
+#include "result_store.h"
 #include <set>
 #include <algorithm>
 #include <functional>
@@ -8,8 +13,17 @@
 #include <numeric>
 #include <vector>
 #include <tuple>
-#include <future>
 #include <mutex>
+#include <array>
+#include <string>
+#include <stdexcept>
+#include <unordered_map>
+#include <unordered_set>
+#include <climits>
+
+
+// Liczba kombinacji z ręki w jednym zadaniu puli wątków
+constexpr size_t COMBOS_PER_TASK = 8;
 
 
 std::vector<std::vector<Tile>> get_combinations(const std::vector<Tile>& tiles, int r) {
@@ -31,69 +45,155 @@ std::vector<std::vector<Tile>> get_combinations(const std::vector<Tile>& tiles,
     return result;
 }
 
-std::set<std::vector<Tile>> generate_all_possible_melds(const std::vector<Tile>& tiles) {
-    std::set<std::vector<Tile>> possible_melds;
-    std::map<Tile, int> tile_counts;
-    for(const auto& tile : tiles) {
-        tile_counts[tile]++;
-    }
-
-    std::vector<Tile> unique_tiles_for_groups;
-    for (const auto& pair : tile_counts) {
-        unique_tiles_for_groups.push_back(pair.first);
-    }
-    for (int r = 3; r <= 4; ++r) {
-        if (tiles.size() < r) continue;
-        std::vector<std::vector<Tile>> combos = get_combinations(tiles, r);
-        for (auto& combo : combos) {
-            if (is_valid_group(combo)) {
-                std::sort(combo.begin(), combo.end());
-                possible_melds.insert(combo);
+std::vector<TileCounts> generate_meld_counts(const TileCounts& pool) {
+    std::vector<TileCounts> melds;
+    const int jokers = std::min<int>(pool[JOKER_INDEX], 2);
+
+    // Grupy: ten sam numer, różne kolory, 3-4 kafelki razem z jokerami
+    for (int number = 1; number <= MAX_RANGE; ++number) {
+        int present = 0;
+        for (int color = 0; color < NUM_COLORS; ++color) {
+            if (pool.count(number, color) > 0) present |= 1 << color;
+        }
+        for (int subset = present; subset > 0; subset = (subset - 1) & present) {
+            int size = 0;
+            TileCounts meld;
+            for (int color = 0; color < NUM_COLORS; ++color) {
+                if (subset & (1 << color)) {
+                    meld[tile_index(number, color)] = 1;
+                    size++;
+                }
+            }
+            for (int k = 0; k <= jokers; ++k) {
+                if (size + k < 3 || size + k > 4) continue;
+                meld[JOKER_INDEX] = k;
+                melds.push_back(meld);
             }
         }
     }
 
-    std::map<TileColor, std::vector<Tile>> tiles_by_color;
-    std::vector<Tile> jokers;
-    for(const auto& tile : tiles) {
-        if(tile.color == TileColor::Joker) {
-            jokers.push_back(tile);
-        } else {
-            tiles_by_color[tile.color].push_back(tile);
-        }
-    }
+    // Szeregi: kafelki lo..hi w jednym kolorze, brakujące numery uzupełniają jokery
+    for (int color = 0; color < NUM_COLORS; ++color) {
+        for (int lo = 1; lo <= MAX_RANGE; ++lo) {
+            if (pool.count(lo, color) == 0) continue;
+            int absent = 0;
+            for (int hi = lo + 1; hi <= MAX_RANGE; ++hi) {
+                if (pool.count(hi, color) == 0) {
+                    absent++;
+                    if (absent > jokers) break;
+                    continue;
+                }
 
-    for(auto const& [color, color_tiles_vec] : tiles_by_color) {
-        std::vector<Tile> unique_non_jokers = color_tiles_vec;
-        std::sort(unique_non_jokers.begin(), unique_non_jokers.end());
-        unique_non_jokers.erase(std::unique(unique_non_jokers.begin(), unique_non_jokers.end()), unique_non_jokers.end());
-
-        for (int r_tiles = 1; r_tiles <= unique_non_jokers.size(); ++r_tiles) {
-            std::vector<std::vector<Tile>> tile_subsets = get_combinations(unique_non_jokers, r_tiles);
-            for (const auto& tile_subset : tile_subsets) {
-                for (int r_jokers = 0; r_jokers <= jokers.size(); ++r_jokers) {
-                    if (r_jokers + r_tiles < 3) continue;
-                    std::vector<std::vector<Tile>> joker_subsets = get_combinations(jokers, r_jokers);
-                    if (joker_subsets.empty() && r_jokers == 0) {
-                         std::vector<Tile> run_candidate = tile_subset;
-                         std::sort(run_candidate.begin(), run_candidate.end());
-                         if (is_valid_run(run_candidate)) {
-                             possible_melds.insert(run_candidate);
-                         }
-                    } else {
-                        for (const auto& joker_subset : joker_subsets) {
-                            std::vector<Tile> run_candidate = tile_subset;
-                            run_candidate.insert(run_candidate.end(), joker_subset.begin(), joker_subset.end());
-                            std::sort(run_candidate.begin(), run_candidate.end());
-                            if (is_valid_run(run_candidate)) {
-                                possible_melds.insert(run_candidate);
-                            }
-                        }
+                TileCounts base;
+                std::vector<int> removable;
+                for (int number = lo; number <= hi; ++number) {
+                    if (pool.count(number, color) > 0) {
+                        base[tile_index(number, color)] = 1;
+                        if (number != lo && number != hi) removable.push_back(number);
+                    }
+                }
+                const int span = hi - lo + 1;
+
+                auto add_runs = [&](const TileCounts& run, int dropped) {
+                    int size = span - absent - dropped;
+                    for (int k = absent + dropped; k <= jokers; ++k) {
+                        if (size + k < 3) continue;
+                        TileCounts meld = run;
+                        meld[JOKER_INDEX] = k;
+                        melds.push_back(meld);
+                    }
+                };
+
+                // Opcjonalnie pomijamy obecne kafelki ze środka, jeśli starczy jokerów
+                add_runs(base, 0);
+                for (size_t i = 0; i < removable.size(); ++i) {
+                    TileCounts run = base;
+                    run[tile_index(removable[i], color)] = 0;
+                    add_runs(run, 1);
+                    for (size_t j = i + 1; j < removable.size(); ++j) {
+                        TileCounts run2 = run;
+                        run2[tile_index(removable[j], color)] = 0;
+                        add_runs(run2, 2);
                     }
                 }
             }
         }
     }
+    return melds;
+}
+
+const MeldTable& get_meld_table(int blocks_range) {
+    if (blocks_range < 1 || blocks_range > MAX_RANGE) {
+        throw std::out_of_range("blocks_range must be between 1 and " + std::to_string(MAX_RANGE));
+    }
+
+    static std::array<MeldTable, MAX_RANGE + 1> tables;
+    static std::array<std::once_flag, MAX_RANGE + 1> built;
+
+    std::call_once(built[blocks_range], [blocks_range]() {
+        // Pełna pula: po dwa kafelki każdego rodzaju i dwa jokery
+        TileCounts full_pool;
+        for (int color = 0; color < NUM_COLORS; ++color) {
+            for (int number = 1; number <= blocks_range; ++number) {
+                full_pool[tile_index(number, color)] = 2;
+            }
+        }
+        full_pool[JOKER_INDEX] = 2;
+
+        std::vector<std::pair<std::vector<Tile>, TileCounts>> sorted_melds;
+        for (const auto& meld : generate_meld_counts(full_pool)) {
+            sorted_melds.emplace_back(meld.to_tiles(), meld);
+        }
+        std::sort(sorted_melds.begin(), sorted_melds.end(),
+                  [](const auto& a, const auto& b) { return a.first < b.first; });
+
+        MeldTable& table = tables[blocks_range];
+        table.blocks_range = blocks_range;
+        for (auto& [tiles, counts] : sorted_melds) {
+            int meld_id = static_cast<int>(table.melds.size());
+            int first_tile = -1;
+            for (int idx = 0; idx < TILE_SLOTS; ++idx) {
+                if (counts[idx] == 0) continue;
+                table.tile_to_melds[idx].push_back(meld_id);
+                if (first_tile == -1) first_tile = idx;
+            }
+            table.melds_by_first_tile[first_tile].push_back(meld_id);
+            table.melds.push_back(counts);
+            table.tiles.push_back(std::move(tiles));
+        }
+    });
+
+    return tables[blocks_range];
+}
+
+std::vector<int> MeldTable::fitting_melds(const TileCounts& pool) const {
+    PhaseTimer timer(StatPhase::MeldGeneration);
+    // Układ mieszczący się w puli ma w niej swój pierwszy kafelek, więc każdy sprawdzamy co najwyżej raz
+    std::vector<int> fitting;
+    for (int idx = 0; idx < JOKER_INDEX; ++idx) {
+        if (pool[idx] == 0) continue;
+        for (int meld_id : melds_by_first_tile[idx]) {
+            if (pool.contains(melds[meld_id])) fitting.push_back(meld_id);
+        }
+    }
+    std::sort(fitting.begin(), fitting.end());
+    count_stat(StatCounter::MeldsGenerated, fitting.size());
+    return fitting;
+}
+
+// Tabela układów najmniejszego zakresu obejmującego pulę
+static const MeldTable& meld_table_for(const TileCounts& pool) {
+    return get_meld_table(std::max(1, pool.max_number()));
+}
+
+std::set<std::vector<Tile>> generate_all_possible_melds(const std::vector<Tile>& tiles) {
+    TileCounts pool(tiles);
+    const MeldTable& meld_table = meld_table_for(pool);
+
+    std::set<std::vector<Tile>> possible_melds;
+    for (int meld_id : meld_table.fitting_melds(pool)) {
+        possible_melds.insert(meld_table.tiles[meld_id]);
+    }
     return possible_melds;
 }
 
@@ -108,129 +208,313 @@ std::set<std::vector<Tile>> canonical_layout(const std::vector<std::vector<Tile>
     return canonical_set;
 }
 
-std::vector<std::vector<std::vector<Tile>>>
-find_all_valid_moves_cpp(
-    const std::vector<Tile>& hand,
-    const std::vector<std::vector<Tile>>& table,
-    bool first_only
-) {
-    auto initial_table_canonical = canonical_layout(table);
+MeldSession::MeldSession(const MeldTable& table, const std::vector<int>& candidate_melds) : meld_table(table) {
+    row_meld.reserve(candidate_melds.size());
+    row_tiles.reserve(candidate_melds.size());
+    for (int meld_id : candidate_melds) {
+        const TileCounts& meld = meld_table.melds[meld_id];
+        int row = static_cast<int>(row_meld.size());
+        row_meld.push_back(meld_id);
+        row_tiles.emplace_back();
+        for (int idx = 0; idx < TILE_SLOTS; ++idx) {
+            if (!meld[idx]) continue;
+            row_tiles.back().push_back({static_cast<uint8_t>(idx), meld[idx]});
+            column_rows[idx].push_back(row);
+            column_need[idx].push_back(meld[idx]);
+            max_need[idx] = std::max(max_need[idx], meld[idx]);
+        }
+    }
+}
+
+namespace {
+
+// Dokładne pokrycie puli układami w stylu dancing links, z krotnościami kafelków.
+// Wiersze to układy sesji, kolumny to rodzaje kafelków z licznikiem pozostałych sztuk. Wiersz jest żywy,
+// dopóki mieści się w pozostałej puli; po wybraniu układu martwe wiersze trafiają na stos i wracają przy cofaniu.
+// Wiersze sesji, które nie mieszczą się w puli od początku, są martwe przez całe szukanie.
+struct ExactCoverSearch {
+    using Entry = MeldSession::Entry;
+
+    const MeldSession& session;
+    const std::vector<int>& row_meld;
+    const std::vector<std::vector<Entry>>& row_tiles;
+    const std::array<std::vector<int>, TILE_SLOTS>& column_rows;
+    bool first_only;
+    TileCounts remaining;
+
+    std::vector<char> alive;
+    std::array<int, TILE_SLOTS> live_count{};        // żywe wiersze zawierające dany kafelek
+    std::array<int, TILE_SLOTS> first_row{};         // dwa egzemplarze kafelka pokrywamy w rosnącej kolejności wierszy
+    std::vector<int> removed;
+
+    std::vector<int> layout;
+    std::set<std::vector<int>> solutions;
+    std::unordered_set<TileCounts, TileCountsHash> dead_ends; // pule bez pokrycia (tylko first_only)
+    uint64_t nodes = 0;
+
+    ExactCoverSearch(const MeldSession& session_, const TileCounts& workspace, bool first_only_)
+        : session(session_), row_meld(session_.row_meld), row_tiles(session_.row_tiles),
+          column_rows(session_.column_rows), first_only(first_only_), remaining(workspace),
+          alive(session_.row_meld.size(), 0) {
+        const auto& melds = session.meld_table.melds;
+        size_t live_rows = 0;
+        for (size_t row = 0; row < row_meld.size(); ++row) {
+            if (!remaining.contains(melds[row_meld[row]])) continue;
+            alive[row] = 1;
+            live_rows++;
+            for (const Entry& e : row_tiles[row]) live_count[e.tile]++;
+        }
+        removed.reserve(live_rows);
+        layout.reserve(remaining.total());
+    }
+
+    ~ExactCoverSearch() { count_stat(StatCounter::SearchNodes, nodes); }
 
-    std::map<Tile, int> workspace_tiles_counter;
-    for (const auto& tile : hand) workspace_tiles_counter[tile]++;
+    // Zdejmuje układ z puli i usuwa wiersze, które przestały się mieścić.
+    // Żywy wiersz mieścił się wcześniej, więc wystarczy sprawdzić kafelki, których ubyło.
+    void cover(int row) {
+        for (const Entry& e : row_tiles[row]) remaining[e.tile] -= e.count;
+        for (const Entry& e : row_tiles[row]) kill_rows_over(e.tile);
+    }
 
-    std::map<Tile, int> table_tiles_counter;
-    for (const auto& meld : table) {
-        for (const auto& tile : meld) {
-            workspace_tiles_counter[tile]++;
-            table_tiles_counter[tile]++;
+    void kill_rows_over(int tile) {
+        const uint8_t left = remaining[tile];
+        if (left >= session.max_need[tile]) return;
+        const auto& rows = column_rows[tile];
+        const auto& need = session.column_need[tile];
+        for (size_t k = 0; k < rows.size(); ++k) {
+            int other = rows[k];
+            if (need[k] <= left || !alive[other]) continue;
+            alive[other] = 0;
+            for (const Entry& o : row_tiles[other]) live_count[o.tile]--;
+            removed.push_back(other);
         }
     }
 
-    if (workspace_tiles_counter.empty()) {
-        return {};
+    // Rezygnacja z kafelka: znika z puli razem z wierszami, które go zawierają; cofa restore
+    uint8_t exclude(int tile) {
+        const uint8_t count = remaining[tile];
+        remaining[tile] = 0;
+        kill_rows_over(tile);
+        return count;
     }
 
-    std::vector<Tile> all_tiles_list;
-    for(const auto& [tile, count] : workspace_tiles_counter) {
-        for(int i = 0; i < count; ++i) all_tiles_list.push_back(tile);
+    void restore(int tile, uint8_t count, size_t removed_mark) {
+        revive(removed_mark);
+        remaining[tile] = count;
     }
 
-    auto all_melds_set = generate_all_possible_melds(all_tiles_list);
-    std::vector<std::vector<Tile>> all_melds(all_melds_set.begin(), all_melds_set.end());
+    void uncover(int row, size_t removed_mark) {
+        revive(removed_mark);
+        for (const Entry& e : row_tiles[row]) remaining[e.tile] += e.count;
+    }
 
-    std::map<Tile, std::vector<std::vector<Tile>>> tile_to_melds_map;
-    for(const auto& meld : all_melds) {
-        std::set<Tile> unique_tiles_in_meld(meld.begin(), meld.end());
-        for(const auto& tile : unique_tiles_in_meld) {
-            tile_to_melds_map[tile].push_back(meld);
+    void revive(size_t removed_mark) {
+        while (removed.size() > removed_mark) {
+            int other = removed.back();
+            removed.pop_back();
+            alive[other] = 1;
+            for (const Entry& o : row_tiles[other]) live_count[o.tile]++;
         }
     }
 
-    std::set<std::vector<std::vector<Tile>>> solutions;
-
-    std::function<void(std::map<Tile, int>, std::vector<std::vector<Tile>>)> solve_recursive;
-    solve_recursive = [&](
-        std::map<Tile, int> tiles_to_cover,
-        std::vector<std::vector<Tile>> current_layout
-    ) {
+    void solve() {
+        ++nodes;
         if (first_only && !solutions.empty()) {
             return;
         }
 
-        if (tiles_to_cover.empty()) {
-            for(auto& meld : current_layout) std::sort(meld.begin(), meld.end());
-            std::sort(current_layout.begin(), current_layout.end());
-            solutions.insert(current_layout);
+        // Kolumna z najmniejszą liczbą żywych wierszy; kafelek bez żadnego oznacza ślepą gałąź
+        int column = -1;
+        for (int idx : tile_order()) {
+            if (remaining[idx] == 0) continue;
+            if (column == -1 || live_count[idx] < live_count[column]) {
+                column = idx;
+                if (live_count[idx] == 0) return;
+            }
+        }
+
+        if (column == -1) {
+            std::vector<int> solution = layout;
+            std::sort(solution.begin(), solution.end());
+            solutions.insert(std::move(solution));
             return;
         }
 
-        Tile tile_to_process;
-        int min_melds = -1;
+        // Przy pierwszym rozwiązaniu ta sama pula osiągnięta w innej kolejności nie ma sensu drugi raz,
+        // a przy wszystkich rozwiązaniach permutacje odcina kolejność wierszy w kolumnie
+        if (first_only && dead_ends.count(remaining)) return;
 
-        for (const auto& pair : tiles_to_cover) {
-            int current_melds_count = tile_to_melds_map.count(pair.first) ? tile_to_melds_map.at(pair.first).size() : 0;
-            if (min_melds == -1 || current_melds_count < min_melds) {
-                min_melds = current_melds_count;
-                tile_to_process = pair.first;
-            }
+        const int saved_first_row = first_only ? 0 : first_row[column];
+        for (int row : column_rows[column]) {
+            if (row < saved_first_row || !alive[row]) continue;
+
+            size_t removed_mark = removed.size();
+            first_row[column] = row;
+            cover(row);
+            layout.push_back(row_meld[row]);
+            solve();
+            layout.pop_back();
+            uncover(row, removed_mark);
+
+            if (first_only && !solutions.empty()) return;
+        }
+        first_row[column] = saved_first_row;
+        if (first_only) dead_ends.insert(remaining);
+    }
+};
+
+
+// Branch and bound po pokryciach puli: kafelki stołu trzeba pokryć, kafelki z ręki są opcjonalne.
+// Górna granica to wartość kafelków z ręki, które mają jeszcze żywy wiersz (najcenniejsze w limicie max_tiles).
+// Pula przeszukana do końca zapamiętuje, ile najwyżej można z niej jeszcze zyskać.
+struct BestMoveSearch {
+    ExactCoverSearch rows;
+    TileCounts hand;
+    std::array<int, TILE_SLOTS> value{};
+    std::vector<int> by_value;                       // kafelki z ręki od najcenniejszego
+    int max_tiles;                                   // 0 = bez limitu
+
+    int placed_tiles = 0;
+    int placed_value = 0;
+    int best_value = 0;
+    std::vector<int> layout;
+    std::vector<int> best_layout;
+    // pula -> najwyższy możliwy dalszy zysk; z limitem max_tiles osobno dla każdej liczby wyłożonych kafelków
+    std::vector<std::unordered_map<TileCounts, int, TileCountsHash>> bounds;
+
+    BestMoveSearch(const MeldSession& session, const TileCounts& workspace,
+                   const TileCounts& hand_, const std::array<int, TILE_SLOTS>& value_, int max_tiles_)
+        : rows(session, workspace, false), hand(hand_), value(value_), max_tiles(max_tiles_),
+          bounds(max_tiles_ ? hand_.total() + 1 : 1) {
+        for (int idx : tile_order()) {
+            if (hand[idx]) by_value.push_back(idx);
         }
+        std::stable_sort(by_value.begin(), by_value.end(), [&](int a, int b) { return value[a] > value[b]; });
+    }
 
-        if(tile_to_melds_map.find(tile_to_process) == tile_to_melds_map.end()) {
-            return;
+    int hand_left(int idx) const { return std::min<int>(hand[idx], rows.remaining[idx]); }
+    bool mandatory(int idx) const { return rows.remaining[idx] > hand[idx]; }
+
+    int upper_bound() const {
+        int capacity = max_tiles ? max_tiles - placed_tiles : INT_MAX;
+        int bound = 0;
+        for (int idx : by_value) {
+            if (capacity <= 0) break;
+            if (rows.live_count[idx] == 0) continue;
+            int take = std::min(hand_left(idx), capacity);
+            bound += take * value[idx];
+            capacity -= take;
         }
+        return bound;
+    }
 
-        for (const auto& meld : tile_to_melds_map.at(tile_to_process)) {
-            std::map<Tile, int> meld_counter;
-            for (const auto& t : meld) meld_counter[t]++;
+    void branch(int column) {
+        for (int row : rows.column_rows[column]) {
+            if (!rows.alive[row]) continue;
+
+            // Kafelki stołu zużywamy przed kafelkami z ręki tego samego rodzaju
+            int tiles = 0;
+            int gained = 0;
+            for (const auto& e : rows.row_tiles[row]) {
+                int from_hand = hand_left(e.tile) - std::min<int>(hand[e.tile], rows.remaining[e.tile] - e.count);
+                tiles += from_hand;
+                gained += from_hand * value[e.tile];
+            }
+            if (max_tiles && placed_tiles + tiles > max_tiles) continue;
+
+            size_t removed_mark = rows.removed.size();
+            rows.cover(row);
+            placed_tiles += tiles;
+            placed_value += gained;
+            layout.push_back(rows.row_meld[row]);
+            solve();
+            layout.pop_back();
+            placed_value -= gained;
+            placed_tiles -= tiles;
+            rows.uncover(row, removed_mark);
+        }
+    }
 
-            bool is_subset = true;
-            for (const auto& pair : meld_counter) {
-                auto it = tiles_to_cover.find(pair.first);
-                if (it == tiles_to_cover.end() || it->second < pair.second) {
-                    is_subset = false;
-                    break;
-                }
+    void solve() {
+        ++rows.nodes;
+        if (placed_value + upper_bound() <= best_value) return;
+        auto& memo = bounds[max_tiles ? placed_tiles : 0];
+        auto known = memo.find(rows.remaining);
+        if (known != memo.end() && placed_value + known->second <= best_value) return;
+
+        // Najpierw kafelki stołu, kolumna z najmniejszą liczbą żywych wierszy
+        int column = -1;
+        for (int idx : tile_order()) {
+            if (!mandatory(idx)) continue;
+            if (column == -1 || rows.live_count[idx] < rows.live_count[column]) {
+                column = idx;
+                if (rows.live_count[idx] == 0) break;
             }
+        }
 
-            if (is_subset) {
-                std::map<Tile, int> new_tiles_to_cover = tiles_to_cover;
-                for (const auto& pair : meld_counter) {
-                    new_tiles_to_cover[pair.first] -= pair.second;
-                    if (new_tiles_to_cover[pair.first] == 0) {
-                        new_tiles_to_cover.erase(pair.first);
-                    }
-                }
-                std::vector<std::vector<Tile>> new_layout = current_layout;
-                new_layout.push_back(meld);
-                solve_recursive(new_tiles_to_cover, new_layout);
+        if (column != -1) {
+            if (rows.live_count[column] > 0) branch(column);
+        } else {
+            // Stół pokryty: to już jest ruch, dalej można tylko dokładać kafelki z ręki
+            if (placed_value > best_value) {
+                best_value = placed_value;
+                best_layout = layout;
+            }
+            for (int idx : tile_order()) {
+                if (hand_left(idx) == 0 || rows.live_count[idx] == 0) continue;
+                if (column == -1 || rows.live_count[idx] < rows.live_count[column]) column = idx;
+            }
+            if (column != -1) {
+                branch(column);
+                size_t removed_mark = rows.removed.size();
+                uint8_t count = rows.exclude(column);
+                solve();
+                rows.restore(column, count, removed_mark);
             }
         }
-    };
 
-    solve_recursive(workspace_tiles_counter, {});
+        int bound = best_value - placed_value;
+        auto [it, inserted] = memo.emplace(rows.remaining, bound);
+        if (!inserted) it->second = std::min(it->second, bound);
+    }
+};
+
+}
 
-    std::vector<std::vector<std::vector<Tile>>> final_moves;
-    for (const auto& layout : solutions) {
-        auto new_table_canonical = canonical_layout(layout);
+std::vector<Layout>
+find_valid_moves_in(
+    const MeldSession& session,
+    const TileCounts& hand,
+    const TileCounts& table_tiles,
+    const std::set<std::vector<Tile>>& initial_table_canonical,
+    bool first_only
+) {
+    PhaseTimer timer(StatPhase::ExactCover);
+    TileCounts workspace_counts = table_tiles;
+    workspace_counts += hand;
 
-        bool is_new_layout = (new_table_canonical != initial_table_canonical);
+    if (workspace_counts.empty()) {
+        return {};
+    }
 
-        std::map<Tile, int> new_table_tiles_counter;
-        for(const auto& meld : layout) {
-            for(const auto& tile : meld) new_table_tiles_counter[tile]++;
-        }
+    // Kandydaci są posortowani jak tabela układów, więc posortowane indeksy dają posortowany stół
+    ExactCoverSearch search(session, workspace_counts, first_only);
+    search.solve();
 
-        int used_from_hand_count = 0;
-        for(const auto& pair : new_table_tiles_counter) {
-            int in_table = table_tiles_counter.count(pair.first) ? table_tiles_counter.at(pair.first) : 0;
-            if(pair.second > in_table) {
-                used_from_hand_count += pair.second - in_table;
-            }
-        }
+    if (search.solutions.empty() || hand.empty()) {
+        return {};
+    }
 
-        if (is_new_layout && used_from_hand_count > 0) {
-            final_moves.push_back(layout);
+    // Każde pokrycie zawiera wszystkie kafelki z ręki, więc jest nowym układem, o ile nie powtarza stołu
+    std::vector<Layout> final_moves;
+    for (const auto& solution : search.solutions) {
+        Layout layout;
+        layout.reserve(solution.size());
+        for (int meld_id : solution) layout.push_back(session.meld_table.tiles[meld_id]);
+
+        if (canonical_layout(layout) != initial_table_canonical) {
+            final_moves.push_back(std::move(layout));
             if (first_only) {
                 return final_moves;
             }
@@ -240,167 +524,374 @@ find_all_valid_moves_cpp(
     return final_moves;
 }
 
-std::vector<std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>>
-possible_moves_cpp(
+std::vector<std::vector<std::vector<Tile>>>
+find_all_valid_moves_cpp(
     const std::vector<Tile>& hand,
     const std::vector<std::vector<Tile>>& table,
-    const size_t max_target
+    bool first_only
 ) {
-    auto filtered_hands = pre_filter_unplayable_tiles_cpp(hand, table);
-    const auto& playable_hand = filtered_hands.first;
+    TileCounts hand_counts(hand);
+    TileCounts table_counts(table);
+    TileCounts workspace_counts = table_counts;
+    workspace_counts += hand_counts;
 
-    if (playable_hand.empty()) {
+    if (workspace_counts.empty()) {
         return {};
     }
 
-    std::vector<std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>> all_found_moves;
-    std::set<std::vector<std::vector<Tile>>> seen_tables;
-    std::mutex mtx;
+    return stored_layouts(hand_counts, table, first_only, [&] {
+        const MeldTable& meld_table = meld_table_for(workspace_counts);
+        const MeldSession session(meld_table, meld_table.fitting_melds(workspace_counts));
+        return find_valid_moves_in(session, hand_counts, table_counts, canonical_layout(table), first_only);
+    });
+}
 
+std::vector<std::vector<Tile>> hand_combinations(const std::vector<Tile>& playable_hand, size_t max_target) {
     size_t target = max_target ? std::min(max_target, playable_hand.size()) : playable_hand.size();
 
+    std::vector<std::vector<Tile>> combos;
     for (size_t r = 1; r <= target; ++r) {
-        std::vector<std::vector<Tile>> combinations_of_hand = get_combinations(playable_hand, r);
-        std::vector<std::future<void>> futures;
-
-        for (const auto& combo : combinations_of_hand) {
-            futures.push_back(std::async(std::launch::async, [&, combo]() {
-                auto used_hand_tiles = combo;
-                auto solution_for_combo = find_all_valid_moves_cpp(used_hand_tiles, table, true);
-
-                if (!solution_for_combo.empty()) {
-                    auto solution = solution_for_combo[0];
-
-                    std::vector<std::vector<Tile>> sorted_solution = solution;
-                    for (auto& meld : sorted_solution)
-                        std::sort(meld.begin(), meld.end());
-                    std::sort(sorted_solution.begin(), sorted_solution.end());
-
-                    std::lock_guard<std::mutex> lock(mtx);
-                    if (seen_tables.find(sorted_solution) == seen_tables.end()) {
-                        all_found_moves.emplace_back(solution, used_hand_tiles);
-                        seen_tables.insert(sorted_solution);
-                    }
-                }
-            }));
-        }
-
-        for (auto& f : futures)
-            f.get();
+        auto combinations_of_hand = get_combinations(playable_hand, static_cast<int>(r));
+        combos.insert(combos.end(),
+                      std::make_move_iterator(combinations_of_hand.begin()),
+                      std::make_move_iterator(combinations_of_hand.end()));
     }
+    return combos;
+}
 
+std::vector<Move> collect_unique_moves(std::vector<std::vector<Tile>>& combos, std::vector<Layout>& solutions) {
+    PhaseTimer timer(StatPhase::Dedup);
+    std::vector<Move> all_found_moves;
+    std::unordered_set<uint64_t> seen_tables;
+
+    for (size_t i = 0; i < combos.size(); ++i) {
+        if (solutions[i].empty()) continue;
+
+        // Stoły porównujemy po haszu Zobrista, niezależnym od kolejności układów i kafelków
+        if (seen_tables.insert(layout_hash(solutions[i])).second) {
+            all_found_moves.emplace_back(std::move(solutions[i]), std::move(combos[i]));
+        }
+    }
+    count_stat(StatCounter::Moves, all_found_moves.size());
     return all_found_moves;
 }
 
+// Ruchy dla grywalnej ręki: kombinacje rozwiązywane równolegle na wspólnej sesji
+static std::vector<Move> solve_moves(const std::vector<Tile>& playable_hand, const Layout& table, size_t max_target) {
+    auto combos = hand_combinations(playable_hand, max_target);
+    count_stat(StatCounter::Combinations, combos.size());
+
+    // Jedna sesja dla wszystkich kombinacji: układy mieszczące się w grywalnej ręce i stole
+    TileCounts table_counts(table);
+    TileCounts pool = table_counts;
+    pool += TileCounts(playable_hand);
+    const MeldTable& meld_table = meld_table_for(pool);
+    const MeldSession session(meld_table, meld_table.fitting_melds(pool));
+    const auto initial_table_canonical = canonical_layout(table);
+
+    // Każda kombinacja ma własne miejsce na wynik, więc wątki nie potrzebują blokady,
+    // a kolejność ruchów nie zależy od kolejności ich obliczania
+    std::vector<Layout> solutions(combos.size());
+    ThreadPool::instance().parallel_for(combos.size(), COMBOS_PER_TASK, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            auto solution_for_combo = find_valid_moves_in(session, TileCounts(combos[i]),
+                                                          table_counts, initial_table_canonical, true);
+            if (!solution_for_combo.empty()) {
+                solutions[i] = std::move(solution_for_combo[0]);
+            }
+        }
+    });
 
-std::pair<std::vector<Tile>, std::vector<Tile>>
-pre_filter_unplayable_tiles_cpp(
+    return collect_unique_moves(combos, solutions);
+}
+
+std::vector<std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>>
+possible_moves_cpp(
     const std::vector<Tile>& hand,
-    const std::vector<std::vector<Tile>>& table
+    const std::vector<std::vector<Tile>>& table,
+    const size_t max_target
 ) {
-    if (hand.empty()) {
-        return {std::vector<Tile>(), std::vector<Tile>()};
+    TileCounts pool(table);
+    pool += TileCounts(hand);
+    return possible_moves_cpp(hand, table, PlayabilityIndex(pool), max_target);
+}
+
+std::vector<std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>>
+possible_moves_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const PlayabilityIndex& pool_index,
+    const size_t max_target
+) {
+    const auto playable_hand = pool_index.playable(TileCounts(hand)).to_tiles();
+
+    if (playable_hand.empty()) {
+        return {};
     }
 
-    std::map<Tile, int> pool_counter;
-    int joker_count = 0;
+    // Najpierw cache symetrii w pamięci, potem magazyn na dysku, na końcu solver
+    return cached_moves(playable_hand, table, max_target, [&] {
+        return stored_moves(playable_hand, table, max_target, [&] {
+            return solve_moves(playable_hand, table, max_target);
+        });
+    });
+}
 
-    for (const auto& tile : hand) {
-        if (tile.color == TileColor::Joker) {
-            joker_count++;
-        } else {
-            pool_counter[tile]++;
-        }
+
+bool has_cover(const MeldSession& session, const TileCounts& pool) {
+    if (pool.empty()) {
+        return true;
     }
-    for (const auto& meld : table) {
-        for (const auto& tile : meld) {
-            if (tile.color == TileColor::Joker) {
-                joker_count++;
-            } else {
-                pool_counter[tile]++;
-            }
-        }
+    PhaseTimer timer(StatPhase::ExactCover);
+    ExactCoverSearch search(session, pool, true);
+    search.solve();
+    return !search.solutions.empty();
+}
+
+std::vector<bool> can_play_counts(const TileCounts& hand, const TileCounts& table,
+                                  const std::vector<TileCounts>& tile_sets) {
+    std::vector<char> playable_sets(tile_sets.size(), 0);
+    TileCounts pool = table;
+    pool += hand;
+    const TileCounts playable = playable_tiles(hand, pool);
+    if (playable.empty() || tile_sets.empty()) {
+        return std::vector<bool>(tile_sets.size(), false);
     }
 
-    std::vector<Tile> playable_hand;
-    std::vector<Tile> unplayable_hand;
+    // Wspólna sesja dla wszystkich zestawów, jak w possible_moves_cpp
+    pool = table;
+    pool += playable;
+    const MeldTable& meld_table = meld_table_for(pool);
+    const MeldSession session(meld_table, meld_table.fitting_melds(pool));
+
+    ThreadPool::instance().parallel_for(tile_sets.size(), COMBOS_PER_TASK, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            // Kafelek spoza grywalnej części ręki nie wejdzie do żadnego układu
+            if (tile_sets[i].empty() || !playable.contains(tile_sets[i])) continue;
+            TileCounts workspace = table;
+            workspace += tile_sets[i];
+            playable_sets[i] = has_cover(session, workspace);
+        }
+    });
+    return std::vector<bool>(playable_sets.begin(), playable_sets.end());
+}
 
-    std::map<Tile, int> hand_counter;
-    for (const auto& tile : hand) {
-        hand_counter[tile]++;
-    }
+std::vector<bool>
+can_play_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const std::vector<std::vector<Tile>>& tile_sets
+) {
+    std::vector<TileCounts> sets;
+    sets.reserve(tile_sets.size());
+    for (const auto& tiles : tile_sets) sets.emplace_back(tiles);
+    return can_play_counts(TileCounts(hand), TileCounts(table), sets);
+}
 
-    for (const auto& pair : hand_counter) {
-        const auto& tile = pair.first;
-        const int count = pair.second;
+bool
+has_any_move_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const size_t max_target
+) {
+    TileCounts hand_counts(hand);
+    TileCounts table_counts(table);
+    TileCounts pool = table_counts;
+    pool += hand_counts;
+    const TileCounts playable = playable_tiles(hand_counts, pool);
+    if (playable.empty()) {
+        return false;
+    }
 
-        if (tile.color == TileColor::Joker) {
-            for (int i = 0; i < count; ++i) {
-                playable_hand.push_back(tile);
-            }
-            continue;
+    pool = table_counts;
+    pool += playable;
+    const MeldTable& meld_table = meld_table_for(pool);
+    const MeldSession session(meld_table, meld_table.fitting_melds(pool));
+
+    // Kombinacje od najmniejszych, każdy zestaw kafelków raz (duplikaty w ręce dają te same zestawy)
+    std::unordered_set<TileCounts, TileCountsHash> checked;
+    for (const auto& combo : hand_combinations(playable.to_tiles(), max_target)) {
+        TileCounts tiles(combo);
+        if (!checked.insert(tiles).second) continue;
+        TileCounts workspace = table_counts;
+        workspace += tiles;
+        if (has_cover(session, workspace)) {
+            return true;
         }
+    }
+    return false;
+}
 
-        bool is_playable = false;
+MoveGenerator::MoveGenerator(const std::vector<Tile>& hand, const Layout& table, size_t max_target) {
+    auto filtered_hands = pre_filter_unplayable_tiles_cpp(hand, table);
+    const auto& playable_hand = filtered_hands.first;
+    if (playable_hand.empty()) {
+        return;
+    }
+
+    // Ta sama sesja i kolejność kombinacji co w possible_moves_cpp
+    combos = hand_combinations(playable_hand, max_target);
+    table_counts = TileCounts(table);
+    TileCounts pool = table_counts;
+    pool += TileCounts(playable_hand);
+    const MeldTable& meld_table = meld_table_for(pool);
+    session = std::make_unique<const MeldSession>(meld_table, meld_table.fitting_melds(pool));
+    initial_table_canonical = canonical_layout(table);
+}
 
-        pool_counter[tile]--;
+MoveGenerator::MoveGenerator(std::vector<Move> moves)
+    : ready(std::make_move_iterator(moves.begin()), std::make_move_iterator(moves.end())) {}
 
-        int same_number_partners = 0;
-        std::vector<TileColor> colors_to_check = {TileColor::Red, TileColor::Blue, TileColor::Yellow, TileColor::Black};
+std::optional<Move> MoveGenerator::next() {
+    while (ready.empty() && next_combo < combos.size()) {
+        solve_batch();
+    }
+    if (ready.empty()) {
+        return std::nullopt;
+    }
+    Move move = std::move(ready.front());
+    ready.pop_front();
+    return move;
+}
 
-        for (const auto& color : colors_to_check) {
-            if(color != tile.color) {
-                same_number_partners += pool_counter.count(Tile(tile.number, color)) ? pool_counter.at(Tile(tile.number, color)) : 0;
+void MoveGenerator::solve_batch() {
+    const size_t begin = next_combo;
+    const size_t count = std::min(std::max<size_t>(1, ThreadPool::instance().num_threads()), combos.size() - begin);
+    next_combo += count;
+    count_stat(StatCounter::Combinations, count);
+
+    std::vector<Layout> solutions(count);
+    ThreadPool::instance().parallel_for(count, 1, [&](size_t first, size_t last) {
+        for (size_t i = first; i < last; ++i) {
+            auto solution_for_combo = find_valid_moves_in(*session, TileCounts(combos[begin + i]),
+                                                          table_counts, initial_table_canonical, true);
+            if (!solution_for_combo.empty()) {
+                solutions[i] = std::move(solution_for_combo[0]);
             }
         }
+    });
+
+    // Jak collect_unique_moves, ale zbiór widzianych stołów przechodzi między partiami
+    PhaseTimer timer(StatPhase::Dedup);
+    for (size_t i = 0; i < count; ++i) {
+        if (solutions[i].empty()) continue;
+        if (seen_tables.insert(layout_hash(solutions[i])).second) {
+            ready.emplace_back(std::move(solutions[i]), std::move(combos[begin + i]));
+            count_stat(StatCounter::Moves);
+        }
+    }
+}
+
+std::optional<Move>
+best_move_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const std::string& objective,
+    const size_t max_tiles
+) {
+    std::array<int, TILE_SLOTS> value{};
+    if (objective == "tiles") {
+        value.fill(1);
+    } else if (objective == "value") {
+        for (int idx = 0; idx < JOKER_INDEX; ++idx) value[idx] = idx % MAX_RANGE + 1;
+        value[JOKER_INDEX] = JOKER_VALUE;
+    } else {
+        throw std::invalid_argument("Unknown objective: " + objective);
+    }
+
+    TileCounts hand_counts(hand);
+    TileCounts table_counts(table);
+    TileCounts pool = table_counts;
+    pool += hand_counts;
+    TileCounts playable = playable_tiles(hand_counts, pool);
+    if (playable.empty()) {
+        return std::nullopt;
+    }
 
-        if ((same_number_partners + joker_count) >= 2) {
-            is_playable = true;
+    pool = table_counts;
+    pool += playable;
+    const MeldTable& meld_table = meld_table_for(pool);
+    const MeldSession session(meld_table, meld_table.fitting_melds(pool));
+    BestMoveSearch search(session, pool, playable, value, static_cast<int>(max_tiles));
+    search.solve();
+    if (search.best_value == 0) {
+        return std::nullopt;
+    }
+
+    // Posortowane indeksy dają posortowany stół, jak w find_valid_moves_in
+    std::sort(search.best_layout.begin(), search.best_layout.end());
+    Layout new_table;
+    TileCounts used;
+    for (int meld_id : search.best_layout) {
+        new_table.push_back(meld_table.tiles[meld_id]);
+        used += meld_table.melds[meld_id];
+    }
+    used -= table_counts;
+
+    // Kafelki w kolejności z ręki, jak kombinacje w possible_moves_cpp
+    std::vector<Tile> used_tiles;
+    for (const Tile& tile : hand) {
+        int idx = tile_index(tile);
+        if (used[idx]) {
+            used[idx]--;
+            used_tiles.push_back(tile);
         }
+    }
+    return Move{std::move(new_table), std::move(used_tiles)};
+}
 
-        if (!is_playable) {
+PlayabilityIndex::PlayabilityIndex(const TileCounts& pool) {
+    for (int idx = 0; idx <= JOKER_INDEX; ++idx) {
+        if (pool[idx]) add(idx, pool[idx]);
+    }
+}
 
-            int needed1_count;
-            int needed2_count;
+void PlayabilityIndex::add(int idx, int count) {
+    pool[idx] += count;
+    if (idx != JOKER_INDEX) number_totals[idx % MAX_RANGE + 1] += count;
+}
 
-            // Kombinacja [N-2, N-1, N]
-            needed1_count = pool_counter.count(Tile(tile.number - 1, tile.color)) ? pool_counter.at(Tile(tile.number - 1, tile.color)) : 0;
-            needed2_count = pool_counter.count(Tile(tile.number - 2, tile.color)) ? pool_counter.at(Tile(tile.number - 2, tile.color)) : 0;
-            if ((needed1_count + needed2_count + joker_count) >= 2) {
-                is_playable = true;
-            }
+void PlayabilityIndex::remove(int idx, int count) {
+    pool[idx] -= count;
+    if (idx != JOKER_INDEX) number_totals[idx % MAX_RANGE + 1] -= count;
+}
 
-            // Kombinacja [N-1, N, N+1]
-            if (!is_playable) {
-                needed1_count = pool_counter.count(Tile(tile.number - 1, tile.color)) ? pool_counter.at(Tile(tile.number - 1, tile.color)) : 0;
-                needed2_count = pool_counter.count(Tile(tile.number + 1, tile.color)) ? pool_counter.at(Tile(tile.number + 1, tile.color)) : 0;
-                if ((needed1_count + needed2_count + joker_count) >= 2) {
-                    is_playable = true;
-                }
-            }
+void PlayabilityIndex::update(const TileCounts& new_pool) {
+    for (int idx = 0; idx <= JOKER_INDEX; ++idx) {
+        if (new_pool[idx] > pool[idx]) add(idx, new_pool[idx] - pool[idx]);
+        else if (new_pool[idx] < pool[idx]) remove(idx, pool[idx] - new_pool[idx]);
+    }
+}
 
-            // Kombinacja [N, N+1, N+2]
-            if (!is_playable) {
-                needed1_count = pool_counter.count(Tile(tile.number + 1, tile.color)) ? pool_counter.at(Tile(tile.number + 1, tile.color)) : 0;
-                needed2_count = pool_counter.count(Tile(tile.number + 2, tile.color)) ? pool_counter.at(Tile(tile.number + 2, tile.color)) : 0;
-                if ((needed1_count + needed2_count + joker_count) >= 2) {
-                    is_playable = true;
-                }
-            }
-        }
+TileCounts PlayabilityIndex::playable(const TileCounts& hand) const {
+    PhaseTimer timer(StatPhase::PreFilter);
+    TileCounts result;
+    for (int idx = 0; idx <= JOKER_INDEX; ++idx) {
+        if (hand[idx] && is_playable(idx)) result[idx] = hand[idx];
+    }
+    return result;
+}
 
-        pool_counter[tile]++;
+TileCounts playable_tiles(const TileCounts& hand, const TileCounts& pool) {
+    return PlayabilityIndex(pool).playable(hand);
+}
 
-        if (is_playable) {
-            for (int i = 0; i < count; ++i) {
-                playable_hand.push_back(tile);
-            }
-        } else {
-            for (int i = 0; i < count; ++i) {
-                unplayable_hand.push_back(tile);
-            }
-        }
+std::pair<std::vector<Tile>, std::vector<Tile>>
+pre_filter_unplayable_tiles_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table
+) {
+    if (hand.empty()) {
+        return {std::vector<Tile>(), std::vector<Tile>()};
     }
 
-    return {playable_hand, unplayable_hand};
-}
\ No newline at end of file
+    TileCounts hand_counter(hand);
+    TileCounts pool_counter(table);
+    pool_counter += hand_counter;
+
+    TileCounts playable = playable_tiles(hand_counter, pool_counter);
+    TileCounts unplayable = hand_counter;
+    unplayable -= playable;
+
+    return {playable.to_tiles(), unplayable.to_tiles()};
+}
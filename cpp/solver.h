@@ -2,8 +2,19 @@
 #define SOLVER_H
 
 #include "tile.h"
+#include <array>
+#include <deque>
+#include <memory>
+#include <optional>
+#include <string>
 #include <vector>
 #include <set>
+#include <tuple>
+#include <unordered_set>
+
+
+using Layout = std::vector<std::vector<Tile>>;
+using Move = std::tuple<Layout, std::vector<Tile>>;
 
 
 std::vector<std::vector<std::vector<Tile>>>
@@ -20,6 +31,37 @@ possible_moves_cpp(
     const size_t max_target = 0
 );
 
+// Czy z kafelkami tile_sets[i] (z ręki) da się ułożyć cały stół, czyli czy to legalny ruch.
+// Tylko istnienie pokrycia, bez budowania nowych układów; układy-kandydaci są liczone raz dla wszystkich zestawów.
+std::vector<bool>
+can_play_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const std::vector<std::vector<Tile>>& tile_sets
+);
+
+// Czy jest jakikolwiek ruch z co najwyżej max_target kafelkami z ręki (0 = bez limitu)
+bool
+has_any_move_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const size_t max_target = 0
+);
+
+// Wartość jokera dla objective "value" (jak kara za jokera na ręce)
+constexpr int JOKER_VALUE = 30;
+
+// Ruch wykładający najwięcej: objective "tiles" liczy kafelki z ręki, "value" sumę ich numerów.
+// Branch and bound zamiast wyliczania wszystkich ruchów; max_tiles ogranicza liczbę kafelków (0 = bez limitu).
+// Przy remisie wygrywa pierwszy znaleziony ruch; brak ruchu daje nullopt.
+std::optional<Move>
+best_move_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const std::string& objective = "tiles",
+    const size_t max_tiles = 0
+);
+
 std::pair<std::vector<Tile>, std::vector<Tile>>
 pre_filter_unplayable_tiles_cpp(
     const std::vector<Tile>& hand,
@@ -31,4 +73,140 @@ std::vector<std::vector<Tile>> get_combinations(const std::vector<Tile>& tiles,
 
 std::set<std::vector<Tile>> generate_all_possible_melds(const std::vector<Tile>& tiles);
 
+std::vector<TileCounts> generate_meld_counts(const TileCounts& pool);
+
+
+// Wszystkie możliwe układy dla danego zakresu numerów, posortowane jak std::set<std::vector<Tile>>
+struct MeldTable {
+    int blocks_range = 0;
+    std::vector<TileCounts> melds;
+    std::vector<std::vector<Tile>> tiles;
+    std::array<std::vector<int>, TILE_SLOTS> tile_to_melds;
+    std::array<std::vector<int>, TILE_SLOTS> melds_by_first_tile;
+
+    // Indeksy (rosnąco) układów mieszczących się w puli
+    std::vector<int> fitting_melds(const TileCounts& pool) const;
+};
+
+const MeldTable& get_meld_table(int blocks_range);
+
+
+// Sesja solvera dla jednego wywołania (possible_moves, enumerate_moves silnika): wiersze pokrycia dla listy
+// kandydatów i odwrotny indeks kafelek -> wiersze budowane raz. Każda kombinacja kafelków z ręki przeszukuje
+// widok sesji, w którym żywe są tylko wiersze mieszczące się w jej puli.
+struct MeldSession {
+    struct Entry {
+        uint8_t tile;
+        uint8_t count;
+    };
+
+    const MeldTable& meld_table;
+    std::vector<int> row_meld;                       // wiersz -> indeks układu w tabeli (rosnąco)
+    std::vector<std::vector<Entry>> row_tiles;
+    std::array<std::vector<int>, TILE_SLOTS> column_rows;
+    std::array<std::vector<uint8_t>, TILE_SLOTS> column_need; // ile sztuk kafelka potrzebuje wiersz z column_rows
+    std::array<uint8_t, TILE_SLOTS> max_need{};
+
+    // candidate_melds: rosnące indeksy, nadzbiór układów mieszczących się w pulach przeszukiwanych kombinacji
+    MeldSession(const MeldTable& meld_table, const std::vector<int>& candidate_melds);
+    MeldSession(const MeldSession&) = delete;
+    MeldSession& operator=(const MeldSession&) = delete;
+};
+
+
+// Indeks grywalności puli: liczniki kafelków i liczba kafelków każdego numeru we wszystkich kolorach.
+// Aktualizowany pojedynczymi kafelkami, więc pula zmieniająca się o kilka kafelków na turę nie jest liczona od nowa
+struct PlayabilityIndex {
+    TileCounts pool;
+    std::array<int, MAX_RANGE + 1> number_totals{}; // bez jokerów, indeks 0 nieużywany
+
+    PlayabilityIndex() = default;
+    explicit PlayabilityIndex(const TileCounts& pool);
+
+    void add(int idx, int count = 1);
+    void remove(int idx, int count = 1);
+    // Przestawia indeks na nową pulę, zmieniając tylko różniące się liczniki
+    void update(const TileCounts& new_pool);
+
+    // Czy kafelek może wejść do grupy albo szeregu z resztą puli
+    bool is_playable(int idx) const {
+        if (idx == JOKER_INDEX) return true;
+        const int number = idx % MAX_RANGE + 1;
+        const int color = idx / MAX_RANGE;
+        const int jokers = pool[JOKER_INDEX];
+
+        // Grupa albo jedna z kombinacji [N-2, N-1, N], [N-1, N, N+1], [N, N+1, N+2]
+        const int prev2 = pool.count(number - 2, color), prev1 = pool.count(number - 1, color);
+        const int next1 = pool.count(number + 1, color), next2 = pool.count(number + 2, color);
+        return (number_totals[number] - pool[idx] + jokers) >= 2 ||
+               (prev1 + prev2 + jokers) >= 2 ||
+               (prev1 + next1 + jokers) >= 2 ||
+               (next1 + next2 + jokers) >= 2;
+    }
+
+    // Grywalne kafelki z ręki (ręka musi być częścią puli)
+    TileCounts playable(const TileCounts& hand) const;
+};
+
+// Kafelki z ręki, które mogą utworzyć układ z resztą puli (pula zawiera rękę)
+TileCounts playable_tiles(const TileCounts& hand, const TileCounts& pool);
+
+// possible_moves_cpp z gotowym indeksem grywalności puli ręka + stół (np. utrzymywanym przez GameEngine)
+std::vector<std::tuple<std::vector<std::vector<Tile>>, std::vector<Tile>>>
+possible_moves_cpp(
+    const std::vector<Tile>& hand,
+    const std::vector<std::vector<Tile>>& table,
+    const PlayabilityIndex& pool_index,
+    const size_t max_target = 0
+);
+
+// Kombinacje 1..max_target kafelków z ręki w kolejności sprawdzania przez possible_moves_cpp
+std::vector<std::vector<Tile>> hand_combinations(const std::vector<Tile>& playable_hand, size_t max_target);
+
+// find_all_valid_moves_cpp na widoku sesji dla puli hand + table_tiles
+std::vector<Layout>
+find_valid_moves_in(
+    const MeldSession& session,
+    const TileCounts& hand,
+    const TileCounts& table_tiles,
+    const std::set<std::vector<Tile>>& initial_table_canonical,
+    bool first_only
+);
+
+std::set<std::vector<Tile>> canonical_layout(const Layout& layout);
+
+// Czy pulę da się w całości pokryć układami sesji (pierwsze pokrycie kończy szukanie)
+bool has_cover(const MeldSession& session, const TileCounts& pool);
+
+// can_play_cpp na licznikach kafelków
+std::vector<bool> can_play_counts(const TileCounts& hand, const TileCounts& table,
+                                  const std::vector<TileCounts>& tile_sets);
+
+// Ruchy z pierwszych rozwiązań kombinacji, bez powtórzeń stołu
+std::vector<Move> collect_unique_moves(std::vector<std::vector<Tile>>& combos, std::vector<Layout>& solutions);
+
+// Ruchy possible_moves_cpp w tej samej kolejności, wyliczane dopiero przy next().
+// Kombinacje ręki są rozwiązywane po kilka naraz (po jednej na wątek puli), więc przerwanie iteracji
+// oszczędza rozwiązywanie reszty i trzymanie wszystkich stołów w pamięci.
+class MoveGenerator {
+public:
+    MoveGenerator(const std::vector<Tile>& hand, const Layout& table, size_t max_target = 0);
+    // Gotowe ruchy, np. z cache silnika
+    explicit MoveGenerator(std::vector<Move> moves);
+
+    // Kolejny ruch albo nullopt, gdy ruchów już nie ma
+    std::optional<Move> next();
+
+private:
+    void solve_batch();
+
+    std::unique_ptr<const MeldSession> session;
+    TileCounts table_counts;
+    std::set<std::vector<Tile>> initial_table_canonical;
+    std::vector<std::vector<Tile>> combos;
+    size_t next_combo = 0;
+    std::unordered_set<uint64_t> seen_tables; // layout_hash stołów już zwróconych
+    std::deque<Move> ready;
+};
+
 #endif //SOLVER_H
\ No newline at end of file
@@ -0,0 +1,90 @@
+#include "stats.h"
+#include <cstdlib>
+#include <cstring>
+
+
+namespace {
+
+#ifndef RUMMIKUB_NO_STATS
+bool default_stats_enabled() {
+    // RUMMIKUB_SOLVER_STATS=1 włącza statystyki od importu modułu (np. w workerach SubprocVecEnv)
+    const char* env = std::getenv("RUMMIKUB_SOLVER_STATS");
+    return env && env[0] != '\0' && std::strcmp(env, "0") != 0;
+}
+#endif
+
+std::array<std::atomic<uint64_t>, STAT_PHASES> phase_calls{};
+std::array<std::atomic<uint64_t>, STAT_PHASES> phase_nanoseconds{};
+std::array<std::atomic<uint64_t>, STAT_COUNTERS> counters{};
+
+}
+
+#ifndef RUMMIKUB_NO_STATS
+std::atomic<bool> stats_flag{default_stats_enabled()};
+#endif
+
+const char* stat_phase_name(StatPhase phase) {
+    switch (phase) {
+        case StatPhase::PreFilter: return "pre_filter";
+        case StatPhase::MeldGeneration: return "meld_generation";
+        case StatPhase::ExactCover: return "exact_cover";
+        case StatPhase::Dedup: return "dedup";
+        case StatPhase::Conversion: return "conversion";
+        case StatPhase::DpSweep: return "dp_sweep";
+        default: return "unknown";
+    }
+}
+
+const char* stat_counter_name(StatCounter counter) {
+    switch (counter) {
+        case StatCounter::SearchNodes: return "search_nodes";
+        case StatCounter::MeldsGenerated: return "melds_generated";
+        case StatCounter::Combinations: return "combinations";
+        case StatCounter::Moves: return "moves";
+        case StatCounter::DpStates: return "dp_states";
+        case StatCounter::SymmetryHits: return "symmetry_hits";
+        case StatCounter::SymmetryMisses: return "symmetry_misses";
+        case StatCounter::StoreHits: return "store_hits";
+        case StatCounter::StoreMisses: return "store_misses";
+        default: return "unknown";
+    }
+}
+
+void set_stats_enabled(bool enabled) {
+#ifndef RUMMIKUB_NO_STATS
+    stats_flag = enabled;
+#else
+    (void)enabled;
+#endif
+}
+
+StatsSnapshot get_stats() {
+    StatsSnapshot snapshot;
+    snapshot.enabled = stats_enabled();
+    for (size_t i = 0; i < STAT_PHASES; ++i) {
+        snapshot.phase_calls[i] = phase_calls[i].load(std::memory_order_relaxed);
+        snapshot.phase_seconds[i] = phase_nanoseconds[i].load(std::memory_order_relaxed) * 1e-9;
+    }
+    for (size_t i = 0; i < STAT_COUNTERS; ++i) {
+        snapshot.counters[i] = counters[i].load(std::memory_order_relaxed);
+    }
+    return snapshot;
+}
+
+void reset_stats() {
+    for (auto& value : phase_calls) value = 0;
+    for (auto& value : phase_nanoseconds) value = 0;
+    for (auto& value : counters) value = 0;
+}
+
+void record_phase(StatPhase phase, std::chrono::steady_clock::duration elapsed) {
+    const size_t i = static_cast<size_t>(phase);
+    phase_calls[i].fetch_add(1, std::memory_order_relaxed);
+    phase_nanoseconds[i].fetch_add(
+        static_cast<uint64_t>(std::chrono::duration_cast<std::chrono::nanoseconds>(elapsed).count()),
+        std::memory_order_relaxed);
+}
+
+void record_count(StatCounter counter, uint64_t amount) {
+    counters[static_cast<size_t>(counter)].fetch_add(amount, std::memory_order_relaxed);
+}
@@ -0,0 +1,87 @@
+#ifndef STATS_H
+#define STATS_H
+
+#include <array>
+#include <atomic>
+#include <chrono>
+#include <cstddef>
+#include <cstdint>
+
+
+// Liczniki i czasy faz solvera do profilowania, wspólne dla całego procesu.
+// Domyślnie wyłączone: set_stats_enabled(true) albo RUMMIKUB_SOLVER_STATS=1 przed importem modułu.
+// Z -DRUMMIKUB_NO_STATS pomiary kompilują się do niczego.
+
+enum class StatPhase {
+    PreFilter,       // grywalne kafelki z ręki
+    MeldGeneration,  // układy mieszczące się w puli (fitting_melds, aktualizacja kandydatów silnika)
+    ExactCover,      // szukanie pokryć dla kombinacji
+    Dedup,           // usuwanie ruchów dających ten sam stół
+    Conversion,      // zamiana wyników na obiekty Pythona
+    DpSweep,         // przemiatanie numerów w solverze dp
+    Count
+};
+
+enum class StatCounter {
+    SearchNodes,     // wywołania rekurencji pokrycia
+    MeldsGenerated,  // układy zwrócone przez fitting_melds i dołożone do kandydatów silnika
+    Combinations,    // kombinacje kafelków z ręki przekazane do pokrycia
+    Moves,           // ruchy po usunięciu duplikatów
+    DpStates,        // stany solvera dp odwiedzone po kolejnych numerach
+    SymmetryHits,    // pozycje znalezione w cache symetrii kolorów
+    SymmetryMisses,  // pozycje rozwiązane mimo włączonego cache symetrii kolorów
+    StoreHits,       // wyniki odczytane z magazynu na dysku
+    StoreMisses,     // wyniki nieobecne w otwartym magazynie na dysku
+    Count
+};
+
+constexpr size_t STAT_PHASES = static_cast<size_t>(StatPhase::Count);
+constexpr size_t STAT_COUNTERS = static_cast<size_t>(StatCounter::Count);
+
+struct StatsSnapshot {
+    bool enabled = false;
+    std::array<uint64_t, STAT_PHASES> phase_calls{};
+    std::array<double, STAT_PHASES> phase_seconds{}; // suma po wątkach, więc może przekroczyć czas zegarowy
+    std::array<uint64_t, STAT_COUNTERS> counters{};
+};
+
+const char* stat_phase_name(StatPhase phase);
+const char* stat_counter_name(StatCounter counter);
+
+void set_stats_enabled(bool enabled);
+StatsSnapshot get_stats();
+void reset_stats();
+
+void record_phase(StatPhase phase, std::chrono::steady_clock::duration elapsed);
+void record_count(StatCounter counter, uint64_t amount);
+
+#ifdef RUMMIKUB_NO_STATS
+inline bool stats_enabled() { return false; }
+#else
+extern std::atomic<bool> stats_flag;
+inline bool stats_enabled() { return stats_flag.load(std::memory_order_relaxed); }
+#endif
+
+inline void count_stat(StatCounter counter, uint64_t amount = 1) {
+    if (stats_enabled() && amount) record_count(counter, amount);
+}
+
+// Mierzy czas od utworzenia do końca zakresu, jeśli statystyki są włączone
+class PhaseTimer {
+public:
+    explicit PhaseTimer(StatPhase phase) : phase(phase), active(stats_enabled()) {
+        if (active) start = std::chrono::steady_clock::now();
+    }
+    ~PhaseTimer() {
+        if (active) record_phase(phase, std::chrono::steady_clock::now() - start);
+    }
+    PhaseTimer(const PhaseTimer&) = delete;
+    PhaseTimer& operator=(const PhaseTimer&) = delete;
+
+private:
+    StatPhase phase;
+    bool active;
+    std::chrono::steady_clock::time_point start;
+};
+
+#endif // STATS_H
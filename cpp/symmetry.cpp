@@ -0,0 +1,191 @@
+#include "symmetry.h"
+#include "stats.h"
+#include "zobrist.h"
+#include <algorithm>
+#include <cstdlib>
+
+
+namespace {
+
+constexpr size_t DEFAULT_CACHE_ENTRIES = 10000;
+
+// Wiersz porównania koloru: liczniki numerów 1..13 na ręce, potem na stole
+using ColorRow = std::array<uint8_t, 2 * MAX_RANGE>;
+
+ColorRow color_row(const TileCounts& hand, const TileCounts& table, int color) {
+    ColorRow row{};
+    for (int number = 1; number <= MAX_RANGE; ++number) {
+        row[number - 1] = hand.count(number, color);
+        row[MAX_RANGE + number - 1] = table.count(number, color);
+    }
+    return row;
+}
+
+std::vector<Move> apply_to_moves(const ColorPermutation& permutation, const std::vector<Move>& moves) {
+    std::vector<Move> mapped;
+    mapped.reserve(moves.size());
+    for (const auto& [layout, used] : moves) {
+        mapped.emplace_back(permutation.apply(layout), permutation.apply(used));
+    }
+    return mapped;
+}
+
+// Ruchy w kolejności possible_moves_cpp: kombinacje grywalnej ręki po kolei, pierwsza kombinacja danego zestawu
+std::vector<Move> in_combination_order(std::vector<Move> moves, const std::vector<Tile>& playable_hand,
+                                       size_t max_target) {
+    std::unordered_map<TileCounts, size_t, TileCountsHash> by_used;
+    for (size_t i = 0; i < moves.size(); ++i) by_used.emplace(TileCounts(std::get<1>(moves[i])), i);
+
+    std::vector<Move> ordered;
+    ordered.reserve(moves.size());
+    for (const auto& combo : hand_combinations(playable_hand, max_target)) {
+        if (by_used.empty()) break;
+        auto it = by_used.find(TileCounts(combo));
+        if (it == by_used.end()) continue;
+        ordered.push_back(std::move(moves[it->second]));
+        by_used.erase(it);
+    }
+    return ordered;
+}
+
+bool default_cache_enabled(size_t& max_entries) {
+    // RUMMIKUB_SOLVER_CACHE=<max_entries> włącza cache od importu modułu (np. w workerach SubprocVecEnv)
+    const char* env = std::getenv("RUMMIKUB_SOLVER_CACHE");
+    if (!env || env[0] == '\0') return false;
+    const long long entries = std::atoll(env);
+    if (entries <= 0) return false;
+    max_entries = static_cast<size_t>(entries);
+    return true;
+}
+
+}
+
+ColorPermutation ColorPermutation::inverse() const {
+    ColorPermutation result;
+    for (int color = 0; color < NUM_COLORS; ++color) result.to_canonical[to_canonical[color]] = color;
+    return result;
+}
+
+Tile ColorPermutation::apply(const Tile& tile) const {
+    if (tile.color == TileColor::Joker) return tile;
+    return Tile(tile.number, static_cast<TileColor>(to_canonical[static_cast<int>(tile.color)]));
+}
+
+TileCounts ColorPermutation::apply(const TileCounts& counts) const {
+    TileCounts result;
+    for (int color = 0; color < NUM_COLORS; ++color) {
+        for (int number = 1; number <= MAX_RANGE; ++number) {
+            result[tile_index(number, to_canonical[color])] = counts[tile_index(number, color)];
+        }
+    }
+    result[JOKER_INDEX] = counts[JOKER_INDEX];
+    return result;
+}
+
+std::vector<Tile> ColorPermutation::apply(const std::vector<Tile>& tiles) const {
+    std::vector<Tile> result;
+    result.reserve(tiles.size());
+    for (const auto& tile : tiles) result.push_back(apply(tile));
+    std::sort(result.begin(), result.end());
+    return result;
+}
+
+Layout ColorPermutation::apply(const Layout& layout) const {
+    Layout result;
+    result.reserve(layout.size());
+    for (const auto& meld : layout) result.push_back(apply(meld));
+    std::sort(result.begin(), result.end());
+    return result;
+}
+
+ColorPermutation canonical_colors(const TileCounts& hand, const TileCounts& table) {
+    std::array<ColorRow, NUM_COLORS> rows;
+    std::array<int, NUM_COLORS> order;
+    for (int color = 0; color < NUM_COLORS; ++color) {
+        rows[color] = color_row(hand, table, color);
+        order[color] = color;
+    }
+    std::stable_sort(order.begin(), order.end(), [&](int a, int b) { return rows[a] < rows[b]; });
+
+    ColorPermutation permutation;
+    for (int k = 0; k < NUM_COLORS; ++k) permutation.to_canonical[order[k]] = static_cast<uint8_t>(k);
+    return permutation;
+}
+
+CanonicalPosition canonical_position(const std::vector<Tile>& playable_hand, const Layout& table, size_t max_target) {
+    const TileCounts hand_counts(playable_hand);
+    const ColorPermutation permutation = canonical_colors(hand_counts, TileCounts(table));
+
+    // layout_hash stołu w kolorach kanonicznych, bez budowania go
+    uint64_t table_hash = 0;
+    for (const auto& meld : table) {
+        uint64_t meld_sum = 0;
+        for (const auto& tile : meld) meld_sum += tile_key(tile_index(permutation.apply(tile)));
+        table_hash += mix64(meld_sum);
+    }
+    const uint64_t hand_hash = counts_hash(permutation.apply(hand_counts));
+    return {permutation, mix64(hand_hash + mix64(max_target)) ^ table_hash};
+}
+
+SolverCache::SolverCache() : max_entries(DEFAULT_CACHE_ENTRIES) {
+    is_enabled = default_cache_enabled(max_entries);
+}
+
+SolverCache& SolverCache::instance() {
+    static SolverCache cache;
+    return cache;
+}
+
+void SolverCache::configure(bool enabled, size_t new_max_entries) {
+    std::lock_guard<std::mutex> lock(mutex);
+    max_entries = new_max_entries;
+    while (entries.size() > max_entries) {
+        entries.erase(insertion_order.front());
+        insertion_order.pop_front();
+    }
+    is_enabled = enabled;
+}
+
+SolverCache::Info SolverCache::info() const {
+    std::lock_guard<std::mutex> lock(mutex);
+    return {enabled(), entries.size(), max_entries, hits.load(), misses.load()};
+}
+
+void SolverCache::clear() {
+    std::lock_guard<std::mutex> lock(mutex);
+    entries.clear();
+    insertion_order.clear();
+    hits = 0;
+    misses = 0;
+}
+
+std::optional<std::vector<Move>> SolverCache::find(const CanonicalPosition& position,
+                                                   const std::vector<Tile>& playable_hand, size_t max_target) {
+    std::vector<Move> canonical_moves;
+    {
+        std::lock_guard<std::mutex> lock(mutex);
+        auto it = entries.find(position.key);
+        if (it == entries.end()) {
+            misses.fetch_add(1, std::memory_order_relaxed);
+            count_stat(StatCounter::SymmetryMisses);
+            return std::nullopt;
+        }
+        canonical_moves = it->second;
+    }
+    hits.fetch_add(1, std::memory_order_relaxed);
+    count_stat(StatCounter::SymmetryHits);
+    return in_combination_order(apply_to_moves(position.permutation.inverse(), canonical_moves),
+                                playable_hand, max_target);
+}
+
+void SolverCache::insert(const CanonicalPosition& position, const std::vector<Move>& moves) {
+    auto canonical_moves = apply_to_moves(position.permutation, moves);
+
+    std::lock_guard<std::mutex> lock(mutex);
+    if (max_entries == 0 || !entries.emplace(position.key, std::move(canonical_moves)).second) return;
+    insertion_order.push_back(position.key);
+    while (entries.size() > max_entries) {
+        entries.erase(insertion_order.front());
+        insertion_order.pop_front();
+    }
+}
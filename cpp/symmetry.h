@@ -0,0 +1,96 @@
+#ifndef SYMMETRY_H
+#define SYMMETRY_H
+
+#include "solver.h"
+#include <atomic>
+#include <cstdint>
+#include <deque>
+#include <mutex>
+#include <optional>
+#include <unordered_map>
+#include <vector>
+
+
+// Cztery kolory są w regułach układów wymienne, więc pozycja (ręka, stół) i jej wersje z przestawionymi kolorami
+// mają takie same ruchy z dokładnością do tej permutacji. Postać kanoniczna porządkuje kolory według ich kafelków,
+// a cache wyników solvera trzyma ruchy w kolorach kanonicznych i przy trafieniu przekłada je na kolory pozycji.
+
+// to_canonical[kolor] = kolor w postaci kanonicznej
+struct ColorPermutation {
+    std::array<uint8_t, NUM_COLORS> to_canonical{0, 1, 2, 3};
+
+    ColorPermutation inverse() const;
+    Tile apply(const Tile& tile) const;
+    TileCounts apply(const TileCounts& counts) const;
+    // Kafelki i układy po zmianie kolorów są z powrotem posortowane, jak wyniki solvera
+    std::vector<Tile> apply(const std::vector<Tile>& tiles) const;
+    Layout apply(const Layout& layout) const;
+};
+
+// Permutacja sortująca kolory po (liczniki ręki, liczniki stołu) tego koloru
+ColorPermutation canonical_colors(const TileCounts& hand, const TileCounts& table);
+
+// Pozycja w kolorach kanonicznych: permutacja i klucz Zobrista (ręka, stół, max_target)
+struct CanonicalPosition {
+    ColorPermutation permutation;
+    uint64_t key;
+};
+
+CanonicalPosition canonical_position(const std::vector<Tile>& playable_hand, const Layout& table, size_t max_target);
+
+// Ruchy possible_moves dla grywalnej ręki i stołu, zapamiętane w kolorach kanonicznych.
+// Domyślnie wyłączony: trafienie zwraca inny, równie poprawny stół niż solver dla tej samej pozycji, więc wyniki
+// zależą od tego, która wersja pozycji wypełniła wpis. RUMMIKUB_SOLVER_CACHE=<max_entries> włącza go od importu.
+class SolverCache {
+public:
+    struct Info {
+        bool enabled;
+        size_t entries;
+        size_t max_entries;
+        uint64_t hits;
+        uint64_t misses;
+    };
+
+    static SolverCache& instance();
+
+    void configure(bool enabled, size_t max_entries);
+    bool enabled() const { return is_enabled.load(std::memory_order_relaxed); }
+    Info info() const;
+    // Usuwa wpisy i zeruje liczniki trafień
+    void clear();
+
+    // Ruchy w kolorach pozycji, w kolejności possible_moves_cpp, albo nullopt
+    std::optional<std::vector<Move>> find(const CanonicalPosition& position, const std::vector<Tile>& playable_hand,
+                                          size_t max_target);
+    void insert(const CanonicalPosition& position, const std::vector<Move>& moves);
+
+private:
+    SolverCache();
+
+    std::atomic<bool> is_enabled{false};
+    std::atomic<uint64_t> hits{0};
+    std::atomic<uint64_t> misses{0};
+    mutable std::mutex mutex;
+    size_t max_entries;
+    std::unordered_map<uint64_t, std::vector<Move>> entries;
+    std::deque<uint64_t> insertion_order; // najstarsze wpisy są usuwane pierwsze
+};
+
+// solve() przez cache symetrii kolorów, jeśli jest włączony; solve liczy ruchy possible_moves dla tej pozycji
+template <typename Solve>
+std::vector<Move> cached_moves(const std::vector<Tile>& playable_hand, const Layout& table, size_t max_target,
+                               Solve solve) {
+    SolverCache& cache = SolverCache::instance();
+    if (!cache.enabled()) {
+        return solve();
+    }
+    const CanonicalPosition position = canonical_position(playable_hand, table, max_target);
+    if (auto moves = cache.find(position, playable_hand, max_target)) {
+        return std::move(*moves);
+    }
+    auto moves = solve();
+    cache.insert(position, moves);
+    return moves;
+}
+
+#endif // SYMMETRY_H
@@ -0,0 +1,157 @@
+#include "thread_pool.h"
+#include <algorithm>
+#include <atomic>
+#include <cstdlib>
+#include <exception>
+#include <memory>
+#include <string>
+
+
+namespace {
+
+size_t default_num_threads() {
+    // RUMMIKUB_SOLVER_THREADS pozwala ustawić rozmiar puli przed importem modułu (np. w workerach SubprocVecEnv)
+    if (const char* env = std::getenv("RUMMIKUB_SOLVER_THREADS")) {
+        try {
+            long value = std::stol(env);
+            if (value > 0) return static_cast<size_t>(value);
+        } catch (const std::exception&) {
+        }
+    }
+    return std::max<size_t>(1, std::thread::hardware_concurrency());
+}
+
+struct ParallelJob {
+    size_t count;
+    size_t chunk_size;
+    const std::function<void(size_t, size_t)>* body;
+
+    std::atomic<size_t> next{0};
+    std::atomic<size_t> finished{0};
+    size_t total_chunks;
+
+    std::mutex mtx;
+    std::condition_variable done;
+    std::exception_ptr error;
+
+    // Pobiera porcje dopóki jakieś zostały; zwraca po wyczerpaniu zakresu
+    void run() {
+        while (true) {
+            size_t begin = next.fetch_add(chunk_size);
+            if (begin >= count) return;
+            size_t end = std::min(count, begin + chunk_size);
+            try {
+                (*body)(begin, end);
+            } catch (...) {
+                std::lock_guard<std::mutex> lock(mtx);
+                if (!error) error = std::current_exception();
+            }
+            if (finished.fetch_add(1) + 1 == total_chunks) {
+                std::lock_guard<std::mutex> lock(mtx);
+                done.notify_all();
+            }
+        }
+    }
+};
+
+}
+
+ThreadPool& ThreadPool::instance() {
+    // Celowo bez destruktora: przy zamykaniu interpretera nie czekamy na wątki
+    static ThreadPool* pool = new ThreadPool(default_num_threads());
+    return *pool;
+}
+
+ThreadPool::ThreadPool(size_t num_threads) {
+    start(num_threads);
+}
+
+ThreadPool::~ThreadPool() {
+    stop();
+}
+
+void ThreadPool::start(size_t num_threads) {
+    threads = num_threads == 0 ? default_num_threads() : num_threads;
+    stopping = false;
+    // Wątek wywołujący też liczy, więc potrzeba o jednego workera mniej
+    for (size_t i = 1; i < threads; ++i) {
+        workers.emplace_back([this]() { worker_loop(); });
+    }
+}
+
+void ThreadPool::stop() {
+    // Workery zabieramy pod blokadą, bo parallel_for czyta workers.size() z innych wątków;
+    // do czasu start() zadania liczy sam wątek wywołujący
+    std::vector<std::thread> stopped;
+    {
+        std::lock_guard<std::mutex> lock(mtx);
+        stopping = true;
+        stopped.swap(workers);
+    }
+    cv.notify_all();
+    for (auto& worker : stopped) worker.join();
+}
+
+void ThreadPool::set_num_threads(size_t num_threads) {
+    // Równoległe wywołania po kolei, żeby każdy worker był dołączany dokładnie raz
+    std::lock_guard<std::mutex> resize_lock(resize_mtx);
+    stop();
+    std::lock_guard<std::mutex> lock(mtx);
+    start(num_threads);
+}
+
+size_t ThreadPool::num_threads() const {
+    std::lock_guard<std::mutex> lock(mtx);
+    return threads;
+}
+
+void ThreadPool::worker_loop() {
+    while (true) {
+        std::function<void()> task;
+        {
+            std::unique_lock<std::mutex> lock(mtx);
+            cv.wait(lock, [this]() { return stopping || !tasks.empty(); });
+            if (tasks.empty()) return;
+            task = std::move(tasks.front());
+            tasks.pop_front();
+        }
+        task();
+    }
+}
+
+void ThreadPool::parallel_for(size_t count, size_t chunk_size, const std::function<void(size_t, size_t)>& body) {
+    if (count == 0) return;
+    chunk_size = std::max<size_t>(1, chunk_size);
+    size_t total_chunks = (count + chunk_size - 1) / chunk_size;
+
+    size_t helpers;
+    {
+        std::lock_guard<std::mutex> lock(mtx);
+        helpers = std::min(workers.size(), total_chunks - 1);
+    }
+    if (helpers == 0) {
+        body(0, count);
+        return;
+    }
+
+    auto job = std::make_shared<ParallelJob>();
+    job->count = count;
+    job->chunk_size = chunk_size;
+    job->body = &body;
+    job->total_chunks = total_chunks;
+
+    {
+        std::lock_guard<std::mutex> lock(mtx);
+        for (size_t i = 0; i < helpers; ++i) {
+            tasks.emplace_back([job]() { job->run(); });
+        }
+    }
+    cv.notify_all();
+
+    job->run();
+
+    // Czekamy tylko na porcje już pobrane przez inne wątki
+    std::unique_lock<std::mutex> lock(job->mtx);
+    job->done.wait(lock, [&]() { return job->finished.load() == total_chunks; });
+    if (job->error) std::rethrow_exception(job->error);
+}
@@ -0,0 +1,44 @@
+#ifndef THREAD_POOL_H
+#define THREAD_POOL_H
+
+#include <condition_variable>
+#include <cstddef>
+#include <deque>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+
+// Wspólna dla całego procesu pula wątków solvera.
+// parallel_for dzieli zakres na porcje, które wątki (łącznie z wywołującym) pobierają ze wspólnego licznika,
+// więc zagnieżdżone wywołania z wnętrza puli nie blokują się nawzajem.
+class ThreadPool {
+public:
+    static ThreadPool& instance();
+
+    // 0 = liczba rdzeni, 1 = wszystko w wątku wywołującym
+    void set_num_threads(size_t num_threads);
+    size_t num_threads() const;
+
+    void parallel_for(size_t count, size_t chunk_size, const std::function<void(size_t begin, size_t end)>& body);
+
+    ~ThreadPool();
+
+private:
+    explicit ThreadPool(size_t num_threads);
+
+    void start(size_t num_threads);
+    void stop();
+    void worker_loop();
+
+    std::vector<std::thread> workers;
+    std::deque<std::function<void()>> tasks;
+    mutable std::mutex mtx;
+    std::mutex resize_mtx; // szereguje set_num_threads
+    std::condition_variable cv;
+    bool stopping = false;
+    size_t threads = 1;
+};
+
+#endif // THREAD_POOL_H
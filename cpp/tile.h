@@ -1,7 +1,12 @@
 #ifndef TILE_H
 #define TILE_H
 
+#include <array>
+#include <cstdint>
 #include <functional>
+#include <stdexcept>
+#include <string>
+#include <vector>
 
 
 enum class TileColor { Red, Blue, Yellow, Black, Joker };
@@ -37,4 +42,143 @@ namespace std {
     };
 }
 
-#endif // TILE_H
\ No newline at end of file
+
+// Indeksowanie kafelków: kolor * MAX_RANGE + (numer - 1), jokery na końcu
+constexpr int MAX_RANGE = 13;
+constexpr int NUM_COLORS = 4;
+constexpr int JOKER_INDEX = NUM_COLORS * MAX_RANGE;
+constexpr int TILE_SLOTS = 64; // 53 używane pola, dopełnione do 64, żeby operacje na tablicy się wektoryzowały
+
+inline int tile_index(const Tile& t) {
+    if (t.color == TileColor::Joker) return JOKER_INDEX;
+    return static_cast<int>(t.color) * MAX_RANGE + (t.number - 1);
+}
+
+inline int tile_index(int number, int color) {
+    return color * MAX_RANGE + (number - 1);
+}
+
+inline Tile index_to_tile(int idx) {
+    if (idx == JOKER_INDEX) return Tile(1, TileColor::Joker);
+    return Tile(idx % MAX_RANGE + 1, static_cast<TileColor>(idx / MAX_RANGE));
+}
+
+// Indeksy w kolejności Tile::operator< (najpierw numer, potem kolor, joker po czarnej jedynce)
+inline const std::array<int, JOKER_INDEX + 1>& tile_order() {
+    static const std::array<int, JOKER_INDEX + 1> order = [] {
+        std::array<int, JOKER_INDEX + 1> o{};
+        int k = 0;
+        for (int number = 1; number <= MAX_RANGE; ++number) {
+            for (int color = 0; color < NUM_COLORS; ++color) {
+                o[k++] = tile_index(number, color);
+            }
+            if (number == 1) o[k++] = JOKER_INDEX;
+        }
+        return o;
+    }();
+    return order;
+}
+
+
+// Multizbiór kafelków jako wektor liczników (jeden bajt na rodzaj kafelka)
+struct TileCounts {
+    alignas(64) std::array<uint8_t, TILE_SLOTS> c{};
+
+    TileCounts() = default;
+    explicit TileCounts(const std::vector<Tile>& tiles) { add(tiles); }
+    explicit TileCounts(const std::vector<std::vector<Tile>>& melds) {
+        for (const auto& meld : melds) add(meld);
+    }
+
+    uint8_t& operator[](int idx) { return c[idx]; }
+    uint8_t operator[](int idx) const { return c[idx]; }
+
+    // Liczba kafelków (number, color), 0 poza zakresem numerów
+    int count(int number, int color) const {
+        if (number < 1 || number > MAX_RANGE) return 0;
+        return c[tile_index(number, color)];
+    }
+
+    void add(const Tile& t) {
+        if (t.color != TileColor::Joker && (t.number < 1 || t.number > MAX_RANGE)) {
+            throw std::out_of_range("Tile number out of range: " + std::to_string(t.number));
+        }
+        c[tile_index(t)]++;
+    }
+
+    void add(const std::vector<Tile>& tiles) {
+        for (const auto& t : tiles) add(t);
+    }
+
+    // Czy other jest podzbiorem (z krotnościami) tego multizbioru
+    bool contains(const TileCounts& other) const {
+        bool ok = true;
+        for (int i = 0; i < TILE_SLOTS; ++i) ok &= other.c[i] <= c[i];
+        return ok;
+    }
+
+    TileCounts& operator+=(const TileCounts& other) {
+        for (int i = 0; i < TILE_SLOTS; ++i) c[i] += other.c[i];
+        return *this;
+    }
+
+    TileCounts& operator-=(const TileCounts& other) {
+        for (int i = 0; i < TILE_SLOTS; ++i) c[i] -= other.c[i];
+        return *this;
+    }
+
+    bool empty() const {
+        uint8_t any = 0;
+        for (int i = 0; i < TILE_SLOTS; ++i) any |= c[i];
+        return any == 0;
+    }
+
+    // Najwyższy numer kafelka w multizbiorze (0 dla samych jokerów)
+    int max_number() const {
+        int highest = 0;
+        for (int color = 0; color < NUM_COLORS; ++color) {
+            for (int number = MAX_RANGE; number > highest; --number) {
+                if (c[tile_index(number, color)]) {
+                    highest = number;
+                    break;
+                }
+            }
+        }
+        return highest;
+    }
+
+    int total() const {
+        int sum = 0;
+        for (int i = 0; i < TILE_SLOTS; ++i) sum += c[i];
+        return sum;
+    }
+
+    bool operator==(const TileCounts& other) const { return c == other.c; }
+    bool operator!=(const TileCounts& other) const { return c != other.c; }
+    bool operator<(const TileCounts& other) const { return c < other.c; }
+
+    // Kafelki posortowane jak Tile::operator<
+    std::vector<Tile> to_tiles() const {
+        std::vector<Tile> tiles;
+        tiles.reserve(total());
+        for (int idx : tile_order()) {
+            for (int k = 0; k < c[idx]; ++k) tiles.push_back(index_to_tile(idx));
+        }
+        return tiles;
+    }
+};
+
+struct TileCountsHash {
+    size_t operator()(const TileCounts& counts) const {
+        uint64_t h = 1469598103934665603ULL;
+        for (int i = 0; i < TILE_SLOTS; i += 8) {
+            uint64_t word = 0;
+            for (int k = 0; k < 8; ++k) word |= static_cast<uint64_t>(counts.c[i + k]) << (8 * k);
+            h = (h ^ word) * 1099511628211ULL;
+            h ^= h >> 29;
+        }
+        return static_cast<size_t>(h);
+    }
+};
+
+#endif // TILE_H
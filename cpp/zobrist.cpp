@@ -0,0 +1,65 @@
+#include "zobrist.h"
+#include <array>
+
+
+namespace {
+
+// Osobne strumienie kluczy dla stołu, graczy na ruchu i rąk kolejnych graczy
+constexpr uint64_t TABLE_STREAM = 0;
+constexpr uint64_t PLAYER_STREAM = 1;
+constexpr uint64_t HAND_STREAM = 2;
+
+uint64_t stream_key(uint64_t stream, uint64_t idx) {
+    return mix64(mix64(stream) ^ idx);
+}
+
+const std::array<uint64_t, TILE_SLOTS>& table_keys() {
+    static const auto keys = [] {
+        std::array<uint64_t, TILE_SLOTS> result{};
+        for (int idx = 0; idx < TILE_SLOTS; ++idx) result[idx] = stream_key(TABLE_STREAM, idx);
+        return result;
+    }();
+    return keys;
+}
+
+}
+
+uint64_t tile_key(int idx) {
+    return table_keys()[idx];
+}
+
+uint64_t hand_key(int player, int idx) {
+    return stream_key(HAND_STREAM + player, idx);
+}
+
+uint64_t player_key(int player) {
+    return stream_key(PLAYER_STREAM, player);
+}
+
+uint64_t tiles_hash(const std::vector<Tile>& tiles) {
+    uint64_t hash = 0;
+    for (const auto& tile : tiles) hash += tile_key(tile_index(tile));
+    return hash;
+}
+
+uint64_t counts_hash(const TileCounts& counts) {
+    uint64_t hash = 0;
+    for (int idx = 0; idx < TILE_SLOTS; ++idx) hash += counts[idx] * tile_key(idx);
+    return hash;
+}
+
+uint64_t meld_hash(const std::vector<Tile>& meld) {
+    return mix64(tiles_hash(meld));
+}
+
+uint64_t layout_hash(const std::vector<std::vector<Tile>>& layout) {
+    uint64_t hash = 0;
+    for (const auto& meld : layout) hash += meld_hash(meld);
+    return hash;
+}
+
+uint64_t hand_hash(int player, const std::vector<Tile>& hand) {
+    uint64_t hash = 0;
+    for (const auto& tile : hand) hash += hand_key(player, tile_index(tile));
+    return hash;
+}
@@ -0,0 +1,35 @@
+#ifndef ZOBRIST_H
+#define ZOBRIST_H
+
+#include "tile.h"
+#include <cstdint>
+#include <vector>
+
+
+// Haszowanie Zobrista: każdy rodzaj kafelka ma stały 64-bitowy klucz (ten sam w każdym procesie).
+// Multizbiór kafelków to suma kluczy modulo 2^64, więc kolejność nie ma znaczenia, duplikaty się nie znoszą,
+// a dołożenie albo zabranie kafelka to jedno dodawanie. Układ to zmieszana suma kluczy jego kafelków,
+// stół to suma haszy układów: te same kafelki podzielone inaczej na układy dają inny hasz.
+
+// Mieszanie splitmix64
+inline uint64_t mix64(uint64_t x) {
+    x += 0x9E3779B97F4A7C15ULL;
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9ULL;
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EBULL;
+    return x ^ (x >> 31);
+}
+
+// Klucz kafelka na stole albo w puli
+uint64_t tile_key(int idx);
+// Klucz kafelka na ręce gracza (osobny dla każdego gracza, żeby zamiana rąk zmieniała hasz stanu)
+uint64_t hand_key(int player, int idx);
+// Klucz gracza na ruchu
+uint64_t player_key(int player);
+
+uint64_t tiles_hash(const std::vector<Tile>& tiles);
+uint64_t counts_hash(const TileCounts& counts);
+uint64_t meld_hash(const std::vector<Tile>& meld);
+uint64_t layout_hash(const std::vector<std::vector<Tile>>& layout);
+uint64_t hand_hash(int player, const std::vector<Tile>& hand);
+
+#endif // ZOBRIST_H
@@ -2,10 +2,15 @@ from itertools import combinations
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-from typing import Literal, List
+from typing import Literal, Mapping, NamedTuple, Optional
 from enum import Enum
+from functools import lru_cache
+import time
+from types import MappingProxyType
 
 
+import rummikub_solver
+
 from .game import GameEngine as GEP
 from rummikub_solver import GameEngine as GEC
 from rummikub_solver import TileColor as TCC
@@ -26,11 +31,129 @@ GameEngine = GEC
 Color = TCC
 Tile = TC
 
+# Colour order of the observation vector, shared by both engines (TCP members hash like their str values)
+COLOR_INDEX = {
+    TCC.Red: 0, TCC.Blue: 1, TCC.Yellow: 2, TCC.Black: 3, TCC.Joker: 4,
+    TCP.Red: 0, TCP.Blue: 1, TCP.Yellow: 2, TCP.Black: 3, TCP.Joker: 4,
+}
+
+class ActionSpace(NamedTuple):
+    """Action table of RummikubEnv, shared read-only by all envs of a process."""
+    actions: tuple                        # tile tuples of action i + 2
+    index: Mapping[tuple, int]            # sorted tile indices -> action number
+    keys: np.ndarray                      # (actions, 3) sorted tile indices, padded with -1
+    table: Optional[rummikub_solver.ActionTable]  # the same table in C++, for the cpp engine
+
+
+def solver_stats_since(before: dict, start: float) -> dict:
+    """Change of rummikub_solver.get_stats() since the snapshot `before`, plus the wall time since `start`."""
+    after = rummikub_solver.get_stats()
+    stats = {key: value - before[key] for key, value in after.items() if key != "enabled"}
+    stats["step_seconds"] = time.perf_counter() - start
+    return stats
+
+
+def tile_index(tile, blocks_range: int) -> int:
+    """indeks = kolor * liczba kafelków + (numer-1), jokery na końcu"""
+    color_idx = COLOR_INDEX[tile.color]
+    if color_idx == 4:
+        return 4 * blocks_range
+    return color_idx * blocks_range + (tile.number - 1)
+
+
+def _build_actions(blocks_range: int, Tile, Color) -> list:
+    actions = []
+
+    # combinations of 1
+    for num in range(1, blocks_range + 1):
+        actions.append((Tile(num, Color.Red), ))
+        actions.append((Tile(num, Color.Blue), ))
+        actions.append((Tile(num, Color.Yellow), ))
+        actions.append((Tile(num, Color.Black), ))
+    actions.append((Tile(1, Color.Joker), ))
+
+    # combinations of 2
+    actions.extend(list(combinations(actions, 2)))
+    for num in range(1, blocks_range + 1):
+        for color in [Color.Red, Color.Blue, Color.Yellow, Color.Black]:
+            actions.append((Tile(num, color), Tile(num, color)))
+
+    # combinations of 3
+    # runs
+    for num in range(1, blocks_range - 1):
+        for color in [Color.Red, Color.Blue, Color.Yellow, Color.Black]:
+            if color != Color.Joker:
+                # without jokers
+                actions.append((Tile(num, color), Tile(num + 1, color), Tile(num + 2, color)))
+                # with 1 joker
+                actions.append((Tile(num, color), Tile(1, Color.Joker), Tile(num + 2, color)))
+    # with 1 joker
+    for num in range(1, blocks_range):
+        for color in [Color.Red, Color.Blue, Color.Yellow, Color.Black]:
+            if color != Color.Joker:
+                actions.append((Tile(num, color), Tile(num + 1, color), Tile(1, Color.Joker)))
+    # with 2 jokers included in melds with 2 jokers
+    # melds
+    for num in range(1, blocks_range + 1):
+        # without jokers
+        actions.append((Tile(num, Color.Red), Tile(num, Color.Blue), Tile(num, Color.Yellow)))
+        actions.append((Tile(num, Color.Red), Tile(num, Color.Blue), Tile(num, Color.Black)))
+        actions.append((Tile(num, Color.Red), Tile(num, Color.Black), Tile(num, Color.Yellow)))
+        actions.append((Tile(num, Color.Black), Tile(num, Color.Blue), Tile(num, Color.Yellow)))
+        # with 1 joker
+        actions.append((Tile(num, Color.Red), Tile(num, Color.Blue), Tile(1, Color.Joker)))
+        actions.append((Tile(num, Color.Red), Tile(num, Color.Yellow), Tile(1, Color.Joker)))
+        actions.append((Tile(num, Color.Red), Tile(num, Color.Black), Tile(1, Color.Joker)))
+        actions.append((Tile(num, Color.Blue), Tile(num, Color.Yellow), Tile(1, Color.Joker)))
+        actions.append((Tile(num, Color.Blue), Tile(num, Color.Black), Tile(1, Color.Joker)))
+        actions.append((Tile(num, Color.Yellow), Tile(num, Color.Black), Tile(1, Color.Joker)))
+        # with 2 jokers
+        actions.append((Tile(num, Color.Red), Tile(1, Color.Joker), Tile(1, Color.Joker)))
+        actions.append((Tile(num, Color.Blue), Tile(1, Color.Joker), Tile(1, Color.Joker)))
+        actions.append((Tile(num, Color.Yellow), Tile(1, Color.Joker), Tile(1, Color.Joker)))
+        actions.append((Tile(num, Color.Black), Tile(1, Color.Joker), Tile(1, Color.Joker)))
+
+    return actions
+
+
+@lru_cache(maxsize=None)
+def get_action_space(blocks_range: int, version: versions) -> ActionSpace:
+    """
+    The action table for the range and engine, built on first use. SubprocVecEnv workers started by fork
+    inherit it from the parent; the cpp engine keeps the compact keys and the reverse index in C++.
+    """
+    if version == "cpp":
+        actions = tuple(_build_actions(blocks_range, TC, TCC))
+        table = rummikub_solver.get_action_table(blocks_range)
+        keys = table.keys
+    else:
+        actions = tuple(_build_actions(blocks_range, TP, TCP))
+        table = None
+        keys = np.full((len(actions), 3), -1, dtype=np.int32)
+        for i, action in enumerate(actions):
+            key = sorted(tile_index(tile, blocks_range) for tile in RummikubEnv._flatten(action))
+            keys[i, :len(key)] = key
+        keys.setflags(write=False)
+
+    index = MappingProxyType({tuple(int(idx) for idx in key if idx >= 0): i + 2 for i, key in enumerate(keys)})
+    return ActionSpace(actions, index, keys, table)
+
+
 class RummikubEnv(gym.Env):
     metadata = {"render.modes": ["human"]}
 
-    def __init__(self, players: int = 2, blocks_start: int = 14, blocks_range: int = 13, version: versions = "cpp", render_mask: bool = True):
+    def __init__(self, players: int = 2, blocks_start: int = 14, blocks_range: int = 13, version: versions = "cpp", render_mask: bool = True,
+                 solver_threads: Optional[int] = None, solver_stats: bool = False):
         super().__init__()
+        # size of the process-wide C++ solver pool; 1 keeps vectorized-env workers single-threaded
+        if solver_threads is not None:
+            rummikub_solver.set_num_threads(solver_threads)
+
+        # solver phase timers and counters of every reset/step in info["solver_stats"] (process-wide, off by default)
+        self.solver_stats = solver_stats
+        if solver_stats:
+            rummikub_solver.set_stats_enabled(True)
+
         global GameEngine, Color, Tile
         match(version):
             case "cpp":
@@ -44,7 +167,6 @@ class RummikubEnv(gym.Env):
 
         self.version = version
         self.players = players
-        self.engine = GameEngine(players, blocks_start, blocks_range)
         self.render_mask = render_mask
 
         self.number_of_tiles = blocks_range * 4 * 2 + 2
@@ -52,57 +174,9 @@ class RummikubEnv(gym.Env):
             low=0, high=2, shape=(self.number_of_tiles,), dtype=np.int32
         )
 
-        self.actions = []
-
-        # combinations of 1
-        for num in range(1, blocks_range + 1):
-            self.actions.append((Tile(num, Color.Red), ))
-            self.actions.append((Tile(num, Color.Blue), ))
-            self.actions.append((Tile(num, Color.Yellow), ))
-            self.actions.append((Tile(num, Color.Black), ))
-        self.actions.append((Tile(1, Color.Joker), ))
-
-        # combinations of 2
-        self.actions.extend(list(combinations(self.actions, 2)))
-        for num in range(1, blocks_range + 1):
-            for color in [Color.Red, Color.Blue, Color.Yellow, Color.Black]:
-                self.actions.append((Tile(num, color), Tile(num, color)))
-
-        # combinations of 3
-        # runs
-        for num in range(1, blocks_range - 1):
-            for color in [Color.Red, Color.Blue, Color.Yellow, Color.Black]:
-                if color != Color.Joker:
-                    # without jokers
-                    self.actions.append((Tile(num, color), Tile(num + 1, color), Tile(num + 2, color)))
-                    # with 1 joker
-                    self.actions.append((Tile(num, color), Tile(1, Color.Joker), Tile(num + 2, color)))
-        # with 1 joker
-        for num in range(1, blocks_range):
-            for color in [Color.Red, Color.Blue, Color.Yellow, Color.Black]:
-                if color != Color.Joker:
-                    self.actions.append((Tile(num, color), Tile(num + 1, color), Tile(1, Color.Joker)))
-        # with 2 jokers included in melds with 2 jokers
-        # melds
-        for num in range(1, blocks_range + 1):
-            # without jokers
-            self.actions.append((Tile(num, Color.Red), Tile(num, Color.Blue), Tile(num, Color.Yellow)))
-            self.actions.append((Tile(num, Color.Red), Tile(num, Color.Blue), Tile(num, Color.Black)))
-            self.actions.append((Tile(num, Color.Red), Tile(num, Color.Black), Tile(num, Color.Yellow)))
-            self.actions.append((Tile(num, Color.Black), Tile(num, Color.Blue), Tile(num, Color.Yellow)))
-            # with 1 joker
-            self.actions.append((Tile(num, Color.Red), Tile(num, Color.Blue), Tile(1, Color.Joker)))
-            self.actions.append((Tile(num, Color.Red), Tile(num, Color.Yellow), Tile(1, Color.Joker)))
-            self.actions.append((Tile(num, Color.Red), Tile(num, Color.Black), Tile(1, Color.Joker)))
-            self.actions.append((Tile(num, Color.Blue), Tile(num, Color.Yellow), Tile(1, Color.Joker)))
-            self.actions.append((Tile(num, Color.Blue), Tile(num, Color.Black), Tile(1, Color.Joker)))
-            self.actions.append((Tile(num, Color.Yellow), Tile(num, Color.Black), Tile(1, Color.Joker)))
-            # with 2 jokers
-            self.actions.append((Tile(num, Color.Red), Tile(1, Color.Joker), Tile(1, Color.Joker)))
-            self.actions.append((Tile(num, Color.Blue), Tile(1, Color.Joker), Tile(1, Color.Joker)))
-            self.actions.append((Tile(num, Color.Yellow), Tile(1, Color.Joker), Tile(1, Color.Joker)))
-            self.actions.append((Tile(num, Color.Black), Tile(1, Color.Joker), Tile(1, Color.Joker)))
-
+        # built once per process and shared by every env with the same range and engine
+        action_space = get_action_space(blocks_range, version)
+        self.actions = action_space.actions
 
         self.max_actions = len(self.actions) + 2 # all possible combinations + PASS + DRAW
         self.action_space = spaces.Discrete(self.max_actions)
@@ -110,20 +184,35 @@ class RummikubEnv(gym.Env):
         self.blocks_start = blocks_start
         self.blocks_range = blocks_range
 
+        # canonical tile multiset -> action number (PASS and DRAW shift the actions by 2)
+        self.action_index = action_space.index
+        self.action_keys = action_space.keys
+
+        # the C++ engine writes observations and masks into its own buffers using this table
+        self.action_table = action_space.table
+
+        self.engine = self._new_engine()
+
     def reset(self, seed=None, options=None):
+        start = time.perf_counter()
+        stats_before = rummikub_solver.get_stats() if self.solver_stats else None
         super().reset(seed=seed)
-        global GameEngine
-        self.engine = GameEngine(self.players, self.blocks_start, self.blocks_range)
+        # the deal comes from the env's generator, so reset(seed=...) replays the same sequence of games
+        self.engine = self._new_engine(int(self.np_random.integers(2 ** 63)))
         obs = self._get_obs()
         if self.render_mask:
             mask = self._get_mask()
         else:
             mask = None
-        return obs, {"action_mask": mask}
+        info = {"action_mask": mask}
+        if stats_before is not None:
+            info["solver_stats"] = solver_stats_since(stats_before, start)
+        return obs, info
 
     def step(self, action: int):
+        start = time.perf_counter()
+        stats_before = rummikub_solver.get_stats() if self.solver_stats else None
         player = self.engine.state.current_player
-        moves = self.engine.enumerate_moves(player)
         # print("CHOSEN ACTION:", action)
 
         if action >= self.max_actions:
@@ -133,12 +222,9 @@ class RummikubEnv(gym.Env):
             placed = action == 0
             self.engine.next_player(placed=placed)
         else:
-            tiles: tuple = self.actions[action - 2]
-            tiles_key = self._tiles_to_key(tiles)
-            if self.version == "cpp":
-                move = next((m for m in moves if self._tiles_to_key(m[1]) == tiles_key), None)
-            elif self.version == "python":
-                move = next((m for m in moves if tuple(m[1], ) == tiles), None)
+            # served from the engine's move cache filled by _get_mask for this state
+            moves = self.engine.enumerate_moves(player)
+            move = next((m for m in moves if self.action_index.get(self._action_key(m[1])) == action), None)
             self.engine.apply_move(player, move)
             self.engine.state.player_putted = True
 
@@ -151,7 +237,10 @@ class RummikubEnv(gym.Env):
         else:
             mask = None
 
-        return obs, reward, terminated, truncated, {"action_mask": mask}
+        info = {"action_mask": mask}
+        if stats_before is not None:
+            info["solver_stats"] = solver_stats_since(stats_before, start)
+        return obs, reward, terminated, truncated, info
 
     def render(self, mode="human"):
         print(f"\n--- Player {self.engine.state.current_player} ---")
@@ -159,32 +248,43 @@ class RummikubEnv(gym.Env):
             print(f"Player {i} hand: {hand}")
         print(f"Table: {self.engine.state.table}")
 
+    def _new_engine(self, seed: Optional[int] = None):
+        # the engine of this env's version, even if another env switched the module-level default since
+        engine_class = GEC if self.version == "cpp" else GEP
+        engine = engine_class(self.players, self.blocks_start, self.blocks_range, seed)
+        if self.action_table is not None:
+            engine.set_action_table(self.action_table)
+        return engine
+
     def _get_obs(self):
         """
         Zamiana stanu gry na wektor liczb (obserwacja dla sieci NN).
         Każdy typ kafelka = unikalny indeks (0..105).
+        Silnik C++ liczy ją we własnym buforze, nadpisywanym w kolejnym kroku, więc zwracamy kopię.
         """
+        if self.action_table is not None:
+            self.engine.update_observation()
+            return self.engine.observation.copy()
+
         all_tiles = self.engine.state.hands[self.engine.state.current_player] + [
             tile for meld in self.engine.state.table for tile in meld
         ]
         vec = np.zeros(self.number_of_tiles, dtype=np.int32)
 
-        # indeks = kolor * liczba kafelków + (numer-1), jokery na końcu
-        def tile_to_idx(tile):
-            color_idx = {Color.Red: 0, Color.Blue: 1, Color.Yellow: 2, Color.Black: 3, Color.Joker: 4}[tile.color]
-            return color_idx * self.blocks_range + (tile.number - 1)
-
         for t in all_tiles:
-            vec[tile_to_idx(t)] += 1
+            vec[self._tile_index(t)] += 1
 
         return vec
 
 
-    def _get_mask(self) -> List[int]:
-        player = self.engine.state.current_player
-        possible_moves = self.engine.enumerate_moves(player)
+    def _get_mask(self) -> np.ndarray:
+        if self.action_table is not None:
+            # same rules as below, computed in C++ into the engine's buffer; copied because the next step overwrites it
+            self.engine.update_action_mask()
+            return self.engine.action_mask.copy()
 
-        legal_moves = [tuple(move[1]) for move in possible_moves]
+        player = self.engine.state.current_player
+        legal_moves = self.engine.enumerate_moves(player)
 
 
         # gracz wystawil sie
@@ -206,18 +306,12 @@ class RummikubEnv(gym.Env):
                     PASS = 1
                     DRAW = 0
 
-        def normalize(move):
-            return tuple(t if isinstance(t, Tile) else t[0] for t in move)
-
+        mask = np.zeros(self.max_actions, dtype=np.int8)
+        mask[0] = PASS
+        mask[1] = DRAW
 
-        mask = [PASS, DRAW]
-        for action in self.actions:
-            if not isinstance(action, tuple):
-                action = tuple(action)
-            if self.version == "cpp":
-                mask.append(1 if normalize(action) in [normalize(m) for m in legal_moves] else 0)
-            elif self.version == "python":
-                mask.append(1 if action in legal_moves else 0)
+        legal_actions = [self.action_index.get(self._action_key(move[1])) for move in legal_moves]
+        mask[[a for a in legal_actions if a is not None]] = 1
 
         return mask
 
@@ -247,17 +341,17 @@ class RummikubEnv(gym.Env):
         return reward
 
 
-    def _tiles_to_key(self, tile_seq):
-        """Zamienia dowolną strukturę kafelków (Tile, (Tile,), [Tile], ((Tile,), ...))
-           na spłaszczoną krotkę par (number, str(color)) zachowując kolejność."""
-        vals = []
-        def collect(x):
-            # list/tuple => iteruj i rekurencyjnie zbieraj
+    def _tile_index(self, tile) -> int:
+        return tile_index(tile, self.blocks_range)
+
+    def _action_key(self, tile_seq) -> tuple:
+        """Canonical key of a tile multiset: sorted tile indices, independent of order, nesting and engine."""
+        return tuple(sorted(self._tile_index(tile) for tile in self._flatten(tile_seq)))
+
+    @staticmethod
+    def _flatten(tile_seq):
+        for x in tile_seq:
             if isinstance(x, (list, tuple)):
-                for e in x:
-                    collect(e)
+                yield from RummikubEnv._flatten(x)
             else:
-                # oczekujemy obiektu Tile
-                vals.append((x.number, str(x.color)))
-        collect(tile_seq)
-        return tuple(vals)
\ No newline at end of file
+                yield x
@@ -1,20 +1,20 @@
-from typing import List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import random
 
-from .generation import possible_moves as ps
+from .generation import best_move, can_play, has_any_move, iter_moves, possible_moves as ps
 from .tile import Tile
 
 
 class GameState:
-    def __init__(self, players: int, blocks: int = 14, r: int = 13):
+    def __init__(self, players: int, blocks: int = 14, r: int = 13, rng: Optional[random.Random] = None):
         self.tile_pull = ([Tile(number, color)
                            for color in ['Red', 'Blue', 'Yellow', 'Black']
                            for number in range(1, r+1)]
                           ) * 2 + [Tile(1, 'Joker'), Tile(1, 'Joker')]
 
-        # Draw pile
+        # Draw pile (shuffled by the given generator, the global one otherwise)
         self.stock = self.tile_pull.copy()
-        random.shuffle(self.stock)
+        (rng or random).shuffle(self.stock)
 
         # Deal tiles
         self.hands = [[self.stock.pop() for _ in range(blocks)] for _ in range(players)]
@@ -29,10 +29,14 @@ class GameState:
         self.winner: Optional[int] = None
 
     def clone(self):
-        st = GameState(self.players)
+        """Copy without building and shuffling a new pool. Melds are shared: the engine replaces
+        the table on every move and never modifies a meld in place."""
+        st = GameState.__new__(GameState)
+        st.tile_pull = self.tile_pull
         st.stock = self.stock.copy()
         st.hands = [hand.copy() for hand in self.hands]
-        st.table = [meld.copy() for meld in self.table]
+        st.table = list(self.table)
+        st.players = self.players
         st.current_player = self.current_player
         st.done = self.done
         st.winner = self.winner
@@ -41,21 +45,88 @@ class GameState:
 
 
 class GameEngine:
-    def __init__(self, players: int = 2, blocks_start: int = 14, blocks_range: int = 13):
-        self.state = GameState(players, blocks_start, blocks_range)
+    def __init__(self, players: int = 2, blocks_start: int = 14, blocks_range: int = 13, seed: Optional[int] = None):
+        # Engine's own random stream; deals of reset() without a seed come from it
+        self.rng = random.Random(seed)
+        self.blocks_start = blocks_start
+        self.blocks_range = blocks_range
+        self.state = GameState(players, blocks_start, blocks_range, self.rng)
         self.tile_pull = ([Tile(number, color)
                      for color in ['Red', 'Blue', 'Yellow', 'Black']
                      for number in range(1, 14)]
                     + [Tile(1, 'Joker')]) * 2
 
+        # Moves cached per state fingerprint, dropped on every state change
+        self.move_cache: Dict[tuple, List[Tuple[List[List[Tile]], List[Tile]]]] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def reset(self, seed: Optional[int] = None) -> None:
+        """Starts a new game; the same seed gives the same deal."""
+        if seed is not None:
+            self.rng.seed(seed)
+        self.state = GameState(self.state.players, self.blocks_start, self.blocks_range, self.rng)
+        self.move_cache.clear()
+
     def enumerate_moves(self, player: int):
+        key = self._state_fingerprint(player)
+        if key in self.move_cache:
+            self.cache_hits += 1
+            return self.move_cache[key]
+        self.cache_misses += 1
+
         hand = self.state.hands[player]
         table = self.state.table
 
         moves = ps(hand, table, 3)
 
+        self.move_cache[key] = moves
         return moves
 
+    def can_play(self, player: int, tiles: List[Tile]) -> bool:
+        """Whether the player can place exactly these tiles."""
+        return self.can_play_batch(player, [tiles])[0]
+
+    def can_play_batch(self, player: int, tile_sets: List[List[Tile]]) -> List[bool]:
+        """can_play for many tile sets at once, answered from the move cache when the moves are known."""
+        cached = self.move_cache.get(self._state_fingerprint(player))
+        if cached is not None and all(len(tiles) <= 3 for tiles in tile_sets):
+            legal = {tuple(sorted(used)) for _, used in cached}
+            return [tuple(sorted(tiles)) in legal for tiles in tile_sets]
+        return can_play(self.state.hands[player], self.state.table, tile_sets)
+
+    def has_any_move(self, player: int) -> bool:
+        """Whether enumerate_moves would return any move."""
+        cached = self.move_cache.get(self._state_fingerprint(player))
+        if cached is not None:
+            return bool(cached)
+        return has_any_move(self.state.hands[player], self.state.table, 3)
+
+    def iter_moves(self, player: int) -> Iterator[Tuple[List[List[Tile]], List[Tile]]]:
+        """Moves of enumerate_moves one by one: from the cache when present, otherwise solved lazily and not cached."""
+        cached = self.move_cache.get(self._state_fingerprint(player))
+        if cached is not None:
+            return iter(cached)
+        return iter_moves(self.state.hands[player], self.state.table, 3)
+
+    def best_move(self, player: int, objective: str = "tiles", max_tiles: int = 3):
+        """Best move of the player by branch and bound (generation.best_move), max_tiles = 3 like enumerate_moves."""
+        return best_move(self.state.hands[player], self.state.table, objective, max_tiles)
+
+    @staticmethod
+    def enumerate_moves_batch(engines: List["GameEngine"]) -> List[List[Tuple[List[List[Tile]], List[Tile]]]]:
+        """Moves of the current player of every engine (sequential counterpart of the C++ batch)."""
+        return [engine.enumerate_moves(engine.state.current_player) for engine in engines]
+
+    def clear_move_cache(self) -> None:
+        self.move_cache.clear()
+
+    def _state_fingerprint(self, player: int) -> tuple:
+        """Identifies the position seen by the player: current player, hand multiset and table layout."""
+        hand = tuple(sorted(self.state.hands[player]))
+        table = tuple(sorted(tuple(sorted(meld)) for meld in self.state.table))
+        return player, hand, table
+
     def apply_move(self, player: int, move: Tuple[List[List[Tile]], List[Tile]]) -> None:
         new_table, used_tiles = move
 
@@ -69,6 +140,7 @@ class GameEngine:
                 self.state.hands[player].remove(tile)
 
             self.state.table = [meld.copy() for meld in new_table]
+            self.move_cache.clear()
 
             if len(self.state.hands[player]) == 0:
                 self.state.done = True
@@ -83,6 +155,7 @@ class GameEngine:
                 raise ValueError("Draws from an empty stock")
             else:
                 self.state.hands[player].append(self.state.stock.pop())
+        self.move_cache.clear()
 
         self.state.player_putted = False
 
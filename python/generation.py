@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from collections import defaultdict, Counter
 from itertools import combinations
 
@@ -6,167 +6,248 @@ from .tile import Tile
 from .validation import is_valid_group, is_valid_run
 
 
-def generate_all_possible_melds(tiles: List[Tile]) -> List[Tuple[Tile]]:
-    """Generuje wszystkie możliwe poprawne grupy i szeregi z danego zbioru klocków."""
-    possible_melds = set()
+COLORS = ('Red', 'Blue', 'Yellow', 'Black')
+JOKER = 'Joker'
+MAX_RANGE = 13
+# Value of a joker for the 'value' objective of best_move (the penalty for a joker left in hand)
+JOKER_VALUE = 30
+
+# Tile kind: (number, color) for regular tiles, 'Joker' for jokers (their number is irrelevant)
+TileKind = Tuple[int, str] | str
+
+
+class MeldTable:
+    """All groups and runs for a given blocks range, with an index from tile kind to melds."""
+
+    def __init__(self, blocks_range: int):
+        self.blocks_range = blocks_range
+        self.melds: List[Counter] = sorted(self._generate(blocks_range), key=self._sort_key)
+        self.melds_by_first_kind: Dict[TileKind, List[int]] = defaultdict(list)
+        for meld_id, meld in enumerate(self.melds):
+            self.melds_by_first_kind[min((k for k in meld if k != JOKER))].append(meld_id)
+
+    @staticmethod
+    def _sort_key(meld: Counter):
+        return sorted((k for k in meld.elements() if k != JOKER)), meld[JOKER]
+
+    @staticmethod
+    def _generate(blocks_range: int) -> List[Counter]:
+        melds = []
+
+        # Groups: same number, distinct colours, 3-4 tiles including jokers
+        for number in range(1, blocks_range + 1):
+            for size in range(1, len(COLORS) + 1):
+                for colors in combinations(COLORS, size):
+                    for jokers in range(3):
+                        if 3 <= size + jokers <= 4:
+                            meld = Counter((number, color) for color in colors)
+                            meld[JOKER] = jokers
+                            melds.append(+meld)
+
+        # Runs: numbers lo..hi of one colour, jokers fill the missing numbers
+        for color in COLORS:
+            for lo in range(1, blocks_range + 1):
+                for hi in range(lo + 1, blocks_range + 1):
+                    inner = range(lo + 1, hi)
+                    for dropped_count in range(min(2, len(inner)) + 1):
+                        for dropped in combinations(inner, dropped_count):
+                            numbers = [n for n in range(lo, hi + 1) if n not in dropped]
+                            for jokers in range(dropped_count, 3):
+                                if len(numbers) + jokers >= 3:
+                                    meld = Counter((n, color) for n in numbers)
+                                    meld[JOKER] = jokers
+                                    melds.append(+meld)
+        return melds
+
+    def fitting_melds(self, pool: Counter) -> List[int]:
+        """Ids (ascending) of the melds contained in the pool of tile kinds."""
+        fitting = []
+        for kind in pool:
+            for meld_id in self.melds_by_first_kind.get(kind, ()):
+                meld = self.melds[meld_id]
+                if all(pool[k] >= count for k, count in meld.items()):
+                    fitting.append(meld_id)
+        return sorted(fitting)
+
+
+_meld_tables: Dict[int, MeldTable] = {}
+
+
+def get_meld_table(blocks_range: int) -> MeldTable:
+    """Returns the meld table for the range, building it on first use."""
+    if not 1 <= blocks_range <= MAX_RANGE:
+        raise ValueError(f"blocks_range must be between 1 and {MAX_RANGE}")
+    if blocks_range not in _meld_tables:
+        _meld_tables[blocks_range] = MeldTable(blocks_range)
+    return _meld_tables[blocks_range]
+
+
+def tile_kind(tile: Tile) -> TileKind:
+    return JOKER if tile.color == JOKER else (tile.number, tile.color)
 
-    # 1. Generuj grupy
-    for r in range(3, 5): # Grupy mogą mieć 3 lub 4 klocki
-        for group_candidate_tuple in combinations(tiles, r):
-            group_candidate = list(group_candidate_tuple)
-            if is_valid_group(group_candidate):
-                possible_melds.add(tuple(sorted(group_candidate)))
 
-    # 2. Generuj szeregi
-    tiles_by_color = defaultdict(list)
-    jokers = [t for t in tiles if t.color == 'Joker']
-    non_jokers = [t for t in tiles if t.color != 'Joker']
+def generate_all_possible_melds(tiles: List[Tile]) -> List[Tuple[Tile]]:
+    """Generuje wszystkie możliwe poprawne grupy i szeregi z danego zbioru klocków."""
+    pool = Counter(tile_kind(tile) for tile in tiles)
+    representative = {tile_kind(tile): tile for tile in tiles}
+    blocks_range = max([tile.number for tile in tiles if tile.color != JOKER], default=1)
+    meld_table = get_meld_table(blocks_range)
 
-    for tile in non_jokers:
-        tiles_by_color[tile.color].append(tile)
+    return [tuple(sorted(representative[kind] for kind in meld_table.melds[meld_id].elements()))
+            for meld_id in meld_table.fitting_melds(pool)]
 
-    for color in tiles_by_color:
-        color_tiles = sorted(list(set(tiles_by_color[color])))
-        for r_tiles in range(1, len(color_tiles) + 1):
-            for tile_subset_tuple in combinations(color_tiles, r_tiles):
-                for r_jokers in range(len(jokers) + 1):
-                    if r_jokers > len(jokers):
-                        continue
-                    for joker_subset_tuple in combinations(jokers, r_jokers):
-                        if len(tile_subset_tuple) + len(joker_subset_tuple) < 3:
-                            continue
 
-                        run_candidate = list(tile_subset_tuple) + list(joker_subset_tuple)
-                        if is_valid_run(run_candidate):
-                            possible_melds.add(tuple(sorted(run_candidate)))
+class PlayabilityIndex:
+    """
+    Counts of the pool by tile kind and of the colored tiles of every number, updated tile by tile.
+    Whether a tile can join a group or a run is then a few lookups, without building Tile objects.
+    """
 
-    return list(possible_melds)
+    def __init__(self, tiles: List[Tile] = ()):
+        self.pool: Counter = Counter()
+        self.number_totals: Counter = Counter()
+        for tile in tiles:
+            self.add(tile)
+
+    def add(self, tile: Tile, count: int = 1) -> None:
+        kind = tile_kind(tile)
+        self.pool[kind] += count
+        if kind != JOKER:
+            self.number_totals[tile.number] += count
+
+    def remove(self, tile: Tile, count: int = 1) -> None:
+        self.add(tile, -count)
+
+    def is_playable(self, tile: Tile) -> bool:
+        """Whether the tile (part of the pool) can form a group or a run with the rest of the pool."""
+        if tile.color == JOKER:
+            return True
+        pool = self.pool
+        num, color = tile.number, tile.color
+        jokers = pool[JOKER]
+
+        # Group, or one of the runs [N-2, N-1, N], [N-1, N, N+1], [N, N+1, N+2]
+        prev2, prev1 = pool.get((num - 2, color), 0), pool.get((num - 1, color), 0)
+        next1, next2 = pool.get((num + 1, color), 0), pool.get((num + 2, color), 0)
+        return ((self.number_totals[num] - pool[(num, color)] + jokers) >= 2
+                or (prev1 + prev2 + jokers) >= 2
+                or (prev1 + next1 + jokers) >= 2
+                or (next1 + next2 + jokers) >= 2)
+
+    def split(self, hand: List[Tile]) -> Tuple[List[Tile], List[Tile]]:
+        """Hand tiles (part of the pool) divided into playable and unplayable ones."""
+        playable_hand = []
+        unplayable_hand = []
+        for tile, count in Counter(hand).items():
+            if self.is_playable(tile):
+                playable_hand.extend([tile] * count)
+            else:
+                unplayable_hand.extend([tile] * count)
+        return playable_hand, unplayable_hand
 
 
 def pre_filter_unplayable_tiles(hand: List[Tile], table: List[List[Tile]]) -> Tuple[List[Tile], List[Tile]]:
     if not hand:
         return [], []
 
-    pool = hand + [tile for meld in table for tile in meld]
-    pool_counter = Counter(pool)
-    joker_count = sum(count for tile, count in pool_counter.items() if tile.color == 'Joker')
-
-    playable_hand = []
-    unplayable_hand = []
-
-    for tile, count in Counter(hand).items():
-        if tile.color == 'Joker':
-            playable_hand.extend([tile]*count)
-            continue
-
-        is_playable = False
-
-        pool_counter[tile] -= 1
-
-        colors_to_check = {'Red', 'Blue', 'Yellow', 'Black'}
-        if tile.color in colors_to_check:
-            colors_to_check.discard(tile.color)
-
-        same_number_partners = 0
-        for color in colors_to_check:
-            same_number_partners += pool_counter.get(Tile(tile.number, color), 0)
-
-        if (same_number_partners + joker_count) >= 2:
-            is_playable = True
-
-        if not is_playable:
-            num, color = tile.number, tile.color
+    return PlayabilityIndex(hand + [tile for meld in table for tile in meld]).split(hand)
 
-            # Kombinacja [N-2, N-1, N]
-            needed1, needed2 = Tile(num - 1, color), Tile(num - 2, color)
-            if (pool_counter.get(needed1, 0) + pool_counter.get(needed2, 0) + joker_count) >= 2:
-                is_playable = True
 
-            # Kombinacja [N-1, N, N+1]
-            if not is_playable:
-                needed1, needed2 = Tile(num - 1, color), Tile(num + 1, color)
-                if (pool_counter.get(needed1, 0) + pool_counter.get(needed2, 0) + joker_count) >= 2:
-                    is_playable = True
+class MeldSession:
+    """
+    The melds fitting in the tiles plus the table, generated once for all the hand combinations of one call.
+    Each combination searches a view of the session: the melds that fit in the table with its own tiles,
+    in the same order find_all_valid_moves would generate them.
+    """
 
-            if not is_playable:
-                needed1, needed2 = Tile(num + 1, color), Tile(num + 2, color)
-                if (pool_counter.get(needed1, 0) + pool_counter.get(needed2, 0) + joker_count) >= 2:
-                    is_playable = True
+    def __init__(self, tiles: List[Tile], table: List[List[Tile]]):
+        self.table = table
+        self.table_tiles = [tile for meld in table for tile in meld]
+        self.initial_table_fset = frozenset(frozenset(meld) for meld in table)
+        self.table_tiles_counter = Counter(self.table_tiles)
 
-        pool_counter[tile] += 1
+        all_tiles_list = tiles + self.table_tiles
+        pool = Counter(tile_kind(tile) for tile in all_tiles_list)
+        representative = {tile_kind(tile): tile for tile in all_tiles_list}
+        blocks_range = max([tile.number for tile in all_tiles_list if tile.color != JOKER], default=1)
+        meld_table = get_meld_table(blocks_range)
 
-        if is_playable:
-            playable_hand.extend([tile] * count)
-        else:
-            unplayable_hand.extend([tile] * count)
+        # Every meld with the tile kinds it needs beyond the table
+        table_kinds = Counter(tile_kind(tile) for tile in self.table_tiles)
+        self.melds: List[Tuple[Tuple[Tile], Tuple[Tuple[TileKind, int], ...]]] = []
+        for meld_id in meld_table.fitting_melds(pool):
+            meld = meld_table.melds[meld_id]
+            extra = tuple((kind, count - table_kinds[kind]) for kind, count in meld.items() if count > table_kinds[kind])
+            self.melds.append((tuple(sorted(representative[kind] for kind in meld.elements())), extra))
 
-    return playable_hand, unplayable_hand
+    def view(self, hand: List[Tile]) -> List[Tuple[Tile]]:
+        """The melds of the session that fit in the table plus the hand tiles (part of the session tiles)."""
+        hand_kinds = Counter(tile_kind(tile) for tile in hand)
+        return [meld for meld, extra in self.melds if all(hand_kinds[kind] >= count for kind, count in extra)]
 
+    def find_moves(self, hand: List[Tile], first_only=False) -> List[List[List[Tile]]]:
+        """find_all_valid_moves for the hand tiles, searched over the view of the session."""
+        # Pula wszystkich klocków do ułożenia
+        workspace_tiles_counter = Counter(hand + self.table_tiles)
 
-def find_all_valid_moves(hand: List[Tile], table: List[List[Tile]], first_only=False) -> List[List[List[Tile]]]:
-    """
-    Główna funkcja, która znajduje wszystkie możliwe ruchy (nowe układy stołu).
-    """
-    initial_table_fset = frozenset(frozenset(meld) for meld in table)
+        if not workspace_tiles_counter:
+            return []
 
-    # Pula wszystkich klocków do ułożenia
-    all_tiles_list = hand + [tile for meld in table for tile in meld]
-    workspace_tiles_counter = Counter(all_tiles_list)
+        tile_to_melds_map = defaultdict(list)
+        for meld in self.view(hand):
+            for tile in set(meld):
+                tile_to_melds_map[tile].append(meld)
 
-    if not workspace_tiles_counter:
-        return []
+        solutions = set()
 
-    all_melds = generate_all_possible_melds(all_tiles_list)
+        def solve(tiles_to_cover: Counter[Tile], current_layout: List[Tuple[Tile]]):
+            """
+            Funkcja rekurencyjna szukająca dokładnego pokrycia.
+            """
+            if first_only and solutions:
+                return
+            if not tiles_to_cover:
+                solutions.add(tuple(sorted(current_layout)))
+                return
 
-    tile_to_melds_map = defaultdict(list)
-    for meld in all_melds:
-        for tile in set(meld):
-            tile_to_melds_map[tile].append(meld)
+            tile_to_process = min(tiles_to_cover.keys(), key=lambda t: len(tile_to_melds_map.get(t, [1]*1000)))
 
-    solutions = set()
+            for meld in tile_to_melds_map[tile_to_process]:
+                meld_counter = Counter(meld)
+                if all(tiles_to_cover[tile] >= meld_counter[tile] for tile in meld):
+                    solve(tiles_to_cover - meld_counter, current_layout + [meld])
 
-    def solve(tiles_to_cover: Counter[Tile], current_layout: List[Tuple[Tile]]):
-        """
-        Funkcja rekurencyjna szukająca dokładnego pokrycia.
-        """
-        if first_only and solutions:
-            return
-        if not tiles_to_cover:
-            solutions.add(tuple(sorted(current_layout)))
-            return
-
-        tile_to_process = min(tiles_to_cover.keys(), key=lambda t: len(tile_to_melds_map.get(t, [1]*1000)))
+        solve(workspace_tiles_counter, [])
 
-        for meld in tile_to_melds_map[tile_to_process]:
-            meld_counter = Counter(meld)
-            if all(tiles_to_cover[tile] >= meld_counter[tile] for tile in meld):
-                solve(tiles_to_cover - meld_counter, current_layout + [meld])
+        final_moves = []
 
-    solve(workspace_tiles_counter, [])
+        for layout in solutions:
+            new_table = [list(meld) for meld in layout]
 
-    final_moves = []
+            new_table_fset = frozenset(frozenset(meld) for meld in new_table)
 
-    for layout in solutions:
-        new_table = [list(meld) for meld in layout]
+            is_new_layout = new_table_fset != self.initial_table_fset
 
-        new_table_fset = frozenset(frozenset(meld) for meld in new_table)
+            new_table_tiles_counter = Counter(tile for meld in new_table for tile in meld)
 
-        is_new_layout = new_table_fset != initial_table_fset
+            if len(new_table_tiles_counter) < len(self.table_tiles_counter):
+                continue
 
-        table_tiles_counter = Counter(tile for meld in table for tile in meld)
-        new_table_tiles_counter = Counter(tile for meld in new_table for tile in meld)
+            used_from_hand_counter = new_table_tiles_counter - self.table_tiles_counter
 
-        if len(new_table_tiles_counter) < len(table_tiles_counter):
-            continue
+            if is_new_layout and sum(used_from_hand_counter.values()) > 0:
+                final_moves.append(new_table)
+                if first_only:
+                    return final_moves
 
-        used_from_hand_counter = new_table_tiles_counter - table_tiles_counter
+        return final_moves
 
-        if is_new_layout and sum(used_from_hand_counter.values()) > 0:
-            final_moves.append(new_table)
-            if first_only:
-                return final_moves
 
-    return final_moves
+def find_all_valid_moves(hand: List[Tile], table: List[List[Tile]], first_only=False) -> List[List[List[Tile]]]:
+    """
+    Główna funkcja, która znajduje wszystkie możliwe ruchy (nowe układy stołu).
+    """
+    return MeldSession(hand, table).find_moves(hand, first_only)
 
 
 def possible_moves(hand: List[Tile], table: List[List[Tile]], max_target=None) -> List[Tuple[List[List[Tile]], List[Tile]]]:
@@ -180,11 +261,20 @@ def possible_moves(hand: List[Tile], table: List[List[Tile]], max_target=None) -
     :param table:
     :return:
     """
+    return list(iter_moves(hand, table, max_target))
+
+
+def iter_moves(hand: List[Tile], table: List[List[Tile]], max_target=None) -> Iterator[Tuple[List[List[Tile]], List[Tile]]]:
+    """
+    Yields the moves of possible_moves in the same order, solving each combination of hand tiles
+    only when the next move is requested, so stopping early skips the rest of the work.
+    """
     playable_hand, _ = pre_filter_unplayable_tiles(hand, table)
     if not playable_hand:
-        return []
+        return
 
-    all_found_moves = []
+    # One session for all the combinations: the melds of the playable hand and the table are generated once
+    session = MeldSession(playable_hand, table)
     seen_tables = set()
 
     if max_target:
@@ -192,18 +282,152 @@ def possible_moves(hand: List[Tile], table: List[List[Tile]], max_target=None) -
     else:
         max_target = len(playable_hand)
 
-
     for r in range(1, max_target + 1):
         for combo in combinations(playable_hand, r):
             used_hand_tiles = list(combo)
 
-            solution_for_combo = find_all_valid_moves(used_hand_tiles, table, True)
+            solution_for_combo = session.find_moves(used_hand_tiles, True)
 
             if solution_for_combo:
                 solution = solution_for_combo[0]
                 table_signature = frozenset(frozenset(meld) for meld in solution)
                 if table_signature not in seen_tables:
-                    all_found_moves.append((solution, used_hand_tiles))
                     seen_tables.add(table_signature)
+                    yield solution, used_hand_tiles
+
+
+def can_play(hand: List[Tile], table: List[List[Tile]], tile_sets: List[List[Tile]]) -> List[bool]:
+    """
+    For every tile set taken from the hand, whether placing exactly those tiles is a legal move.
+    Each set stops at the first layout found; the unplayable hand tiles are filtered and the melds generated once
+    for all sets.
+    """
+    playable_hand, _ = pre_filter_unplayable_tiles(hand, table)
+    playable_counter = Counter(playable_hand)
+    session = MeldSession(playable_hand, table)
+
+    result = []
+    for tiles in tile_sets:
+        tiles = list(tiles)
+        fits = bool(tiles) and not (Counter(tiles) - playable_counter)
+        result.append(fits and bool(session.find_moves(tiles, True)))
+    return result
+
+
+def has_any_move(hand: List[Tile], table: List[List[Tile]], max_target=None) -> bool:
+    """Whether possible_moves would return anything, stopping at the first move."""
+    return next(iter_moves(hand, table, max_target), None) is not None
+
+
+def best_move(hand: List[Tile], table: List[List[Tile]], objective: str = "tiles",
+              max_tiles=None) -> Optional[Tuple[List[List[Tile]], List[Tile]]]:
+    """
+    Returns the move placing the most tiles from the hand (objective 'tiles') or the highest total of their
+    numbers (objective 'value', a joker is worth JOKER_VALUE), without listing every move like possible_moves.
+
+    Branch and bound over covers of the pool: the table tiles have to be covered, the hand tiles are optional,
+    and a branch is cut when the value of the hand tiles that still fit in some meld cannot beat the best move.
+    max_tiles limits the tiles taken from the hand. Returns None when there is no move.
+    """
+    if objective == "tiles":
+        def value(kind: TileKind) -> int:
+            return 1
+    elif objective == "value":
+        def value(kind: TileKind) -> int:
+            return JOKER_VALUE if kind == JOKER else kind[0]
+    else:
+        raise ValueError(f"Unknown objective: {objective}")
+
+    playable_hand, _ = pre_filter_unplayable_tiles(hand, table)
+    if not playable_hand:
+        return None
+
+    table_tiles = [tile for meld in table for tile in meld]
+    hand_counter = Counter(tile_kind(tile) for tile in playable_hand)
+    table_counter = Counter(tile_kind(tile) for tile in table_tiles)
+    pool = table_counter + hand_counter
+    representative = {tile_kind(tile): tile for tile in table_tiles + playable_hand}
+    blocks_range = max([tile.number for tile in table_tiles + playable_hand if tile.color != JOKER], default=1)
+    meld_table = get_meld_table(blocks_range)
+
+    kind_to_melds: Dict[TileKind, List[Counter]] = defaultdict(list)
+    for meld_id in meld_table.fitting_melds(pool):
+        for kind in meld_table.melds[meld_id]:
+            kind_to_melds[kind].append(meld_table.melds[meld_id])
+    by_value = sorted(hand_counter, key=value, reverse=True)
+
+    best = {"value": 0, "layout": None}
+    # remaining pool -> the most that can still be gained from it
+    bounds: Dict[tuple, int] = {}
+
+    def hand_left(remaining: Counter, kind: TileKind) -> int:
+        return min(hand_counter[kind], remaining[kind])
+
+    def fitting(remaining: Counter, kind: TileKind) -> List[Counter]:
+        return [meld for meld in kind_to_melds[kind] if all(remaining[k] >= count for k, count in meld.items())]
+
+    def upper_bound(remaining: Counter, placed_tiles: int) -> int:
+        capacity = max_tiles - placed_tiles if max_tiles else len(playable_hand)
+        bound = 0
+        for kind in by_value:
+            if capacity <= 0:
+                break
+            take = min(hand_left(remaining, kind), capacity)
+            if take and fitting(remaining, kind):
+                bound += take * value(kind)
+                capacity -= take
+        return bound
+
+    def solve(remaining: Counter, placed_tiles: int, placed_value: int, layout: List[Counter]):
+        if placed_value + upper_bound(remaining, placed_tiles) <= best["value"]:
+            return
+        key = (frozenset(remaining.items()), placed_tiles if max_tiles else 0)
+        if key in bounds and placed_value + bounds[key] <= best["value"]:
+            return
+
+        # Table tiles first, the kind with the fewest fitting melds
+        mandatory = [kind for kind in remaining if remaining[kind] > hand_counter[kind]]
+        if mandatory:
+            options = min((fitting(remaining, kind) for kind in mandatory), key=len)
+            excluded_kind = None
+        else:
+            # The table is covered, so this is a move; more hand tiles can still be added or given up
+            if placed_value > best["value"]:
+                best["value"], best["layout"] = placed_value, list(layout)
+            optional = {kind: fitting(remaining, kind) for kind in remaining if hand_left(remaining, kind)}
+            optional = {kind: melds for kind, melds in optional.items() if melds}
+            options, excluded_kind = [], None
+            if optional:
+                excluded_kind = min(optional, key=lambda kind: len(optional[kind]))
+                options = optional[excluded_kind]
+
+        for meld in options:
+            # table tiles of a kind are used before the hand tiles of the same kind
+            from_hand = {kind: hand_left(remaining, kind) - min(hand_counter[kind], remaining[kind] - count)
+                         for kind, count in meld.items()}
+            tiles = sum(from_hand.values())
+            if max_tiles and placed_tiles + tiles > max_tiles:
+                continue
+            gained = sum(count * value(kind) for kind, count in from_hand.items())
+            solve(+(remaining - meld), placed_tiles + tiles, placed_value + gained, layout + [meld])
+
+        if excluded_kind is not None:
+            excluded = remaining.copy()
+            del excluded[excluded_kind]
+            solve(excluded, placed_tiles, placed_value, layout)
+
+        bounds[key] = min(bounds.get(key, best["value"] - placed_value), best["value"] - placed_value)
+
+    solve(+pool, 0, 0, [])
+    if best["layout"] is None:
+        return None
+
+    new_table = sorted(sorted(representative[kind] for kind in meld.elements()) for meld in best["layout"])
+    used = sum(best["layout"], Counter()) - table_counter
+    used_tiles = []
+    for tile in playable_hand:
+        if used[tile_kind(tile)]:
+            used[tile_kind(tile)] -= 1
+            used_tiles.append(tile)
+    return new_table, used_tiles
 
-    return all_found_moves
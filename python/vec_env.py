@@ -0,0 +1,94 @@
+from typing import Any, List, Optional, Sequence, Type
+import time
+
+import numpy as np
+import gymnasium as gym
+from stable_baselines3.common.vec_env import VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import VecEnvIndices
+
+import rummikub_solver
+
+from .environment import RummikubEnv, solver_stats_since
+
+
+class RummikubVecEnv(VecEnv):
+    """
+    N gier silnika C++ w jednym procesie (zamiast SubprocVecEnv z procesem na grę).
+    Kroki wszystkich gier liczone są w puli wątków solvera, a obserwacje, nagrody i maski akcji
+    trafiają do buforów numpy współdzielonych z C++. Zakończone gry są od razu resetowane.
+    """
+
+    def __init__(self, num_envs: int, players: int = 2, blocks_start: int = 14, blocks_range: int = 13,
+                 solver_threads: Optional[int] = None, solver_stats: bool = False):
+        # the template env defines the spaces and the action table, so actions mean the same as in RummikubEnv
+        template = RummikubEnv(players, blocks_start, blocks_range, version="cpp", render_mask=False,
+                               solver_threads=solver_threads, solver_stats=solver_stats)
+        self.players = players
+        self.solver_stats = solver_stats
+        self.actions = template.actions
+        self.max_actions = template.max_actions
+
+        # without action keys the core uses the process-wide table that the template env shares as well
+        self.core = rummikub_solver.VecEnv(num_envs, players, blocks_start, blocks_range)
+        super().__init__(num_envs, template.observation_space, template.action_space)
+        self._actions: Optional[np.ndarray] = None
+
+    def reset(self) -> np.ndarray:
+        # seeds set by VecEnv.seed() apply to this reset only, later games continue the engines' streams
+        seeds = getattr(self, "_seeds", [])
+        self.core.reset(seeds if any(seed is not None for seed in seeds) else [])
+        if hasattr(self, "_reset_seeds"):
+            self._reset_seeds()
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return self.core.observations.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        start = time.perf_counter()
+        stats_before = rummikub_solver.get_stats() if self.solver_stats else None
+        self.core.step(self._actions)
+        # the buffers are overwritten by the next step, the rollout buffer keeps the previous observation
+        obs = self.core.observations.copy()
+        rewards = self.core.rewards.copy()
+        dones = self.core.dones.copy()
+
+        infos: List[dict] = [{} for _ in range(self.num_envs)]
+        if stats_before is not None:
+            # the games step together, so every env gets the statistics of the whole batch
+            stats = solver_stats_since(stats_before, start)
+            for info in infos:
+                info["solver_stats"] = stats
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = self.core.terminal_observations[i].copy()
+            infos[i]["TimeLimit.truncated"] = False
+        return obs, rewards, dones, infos
+
+    def action_masks(self) -> np.ndarray:
+        return self.core.action_masks.astype(bool)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> List[Any]:
+        if method_name != "action_masks":
+            raise AttributeError(f"RummikubVecEnv does not support env_method('{method_name}')")
+        masks = self.action_masks()
+        return [masks[i] for i in self._get_indices(indices)]
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        if attr_name == "action_masks":
+            return [lambda i=i: self.action_masks()[i] for i in self._get_indices(indices)]
+        value = getattr(self, attr_name)
+        return [value for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        setattr(self, attr_name, value)
+
+    def env_is_wrapped(self, wrapper_class: Type[gym.Wrapper], indices: VecEnvIndices = None) -> List[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+    def close(self) -> None:
+        pass
+
+    def engine(self, index: int):
+        """GameEngine of one of the games, e.g. for rendering."""
+        return self.core.engine(index)
@@ -9,7 +9,8 @@ linker_args = []
 if sys.platform == "win32":
     extra_compile_args = ["/std:c++17", "/02"]
 else:
-    extra_compile_args = ["-std=c++17", "-O3"]
+    extra_compile_args = ["-std=c++17", "-O3", "-pthread"]
+    linker_args = ["-pthread"]
 
 ext_modules = [
     Extension(
@@ -18,7 +19,15 @@ ext_modules = [
             'cpp/validation.cpp',
             'cpp/solver.cpp',
             'cpp/bindings.cpp',
-            'cpp/GameEngine.cpp'
+            'cpp/GameEngine.cpp',
+            'cpp/thread_pool.cpp',
+            'cpp/VecEnv.cpp',
+            'cpp/simulation.cpp',
+            'cpp/stats.cpp',
+            'cpp/dp_solver.cpp',
+            'cpp/zobrist.cpp',
+            'cpp/symmetry.cpp',
+            'cpp/result_store.cpp'
         ],
         include_dirs=[
             'cpp',
@@ -26,6 +35,7 @@ ext_modules = [
         ],
         language='c++',
         extra_compile_args=extra_compile_args,
+        extra_link_args=linker_args,
     ),
 ]
 
@@ -0,0 +1,37 @@
+from collections import Counter
+
+import pytest
+
+from bench.positions import CATEGORIES, make_position, corpus
+from bench.run import compare
+
+
+# --- Tests for the benchmark corpus ---
+
+@pytest.mark.parametrize("category", list(CATEGORIES))
+def test_positions_are_reproducible_and_valid(category):
+    position = make_position(3, category)
+    assert position == make_position(3, category)
+
+    (melds_lo, melds_hi), (hand_lo, hand_hi), hand_jokers, _ = CATEGORIES[category]
+    assert melds_lo <= len(position["table"]) <= melds_hi
+    assert hand_lo <= len(position["hand"]) <= hand_hi
+    assert position["hand"].count((1, "Joker")) >= hand_jokers
+
+    # every tile of the full pool is used exactly once
+    tiles = position["hand"] + position["opponent"] + position["stock"] + [t for meld in position["table"] for t in meld]
+    assert len(tiles) == 106
+    assert max(Counter(tiles).values()) == 2
+
+
+def test_corpus_size():
+    assert len(corpus(2)) == 2 * len(CATEGORIES)
+
+
+# --- Tests for the regression check ---
+
+def test_compare_reports_slowdowns():
+    record = {"engine": "cpp", "benchmark": "mask", "category": "mid", "positions": 10}
+    baseline = {"results": [dict(record, best_s=1.0)]}
+    assert compare(baseline, {"results": [dict(record, best_s=1.1)]}, 1.25) == []
+    assert len(compare(baseline, {"results": [dict(record, best_s=2.0)]}, 1.25)) == 1
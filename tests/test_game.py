@@ -1,5 +1,6 @@
 import random
 import numpy as np
+import pytest
 
 from python.environment import RummikubEnv
 from python.tile import Tile
@@ -21,6 +22,61 @@ def test_initial_state():
     assert state.winner is None
 
 
+# --- Tests for seeding ---
+
+@pytest.mark.parametrize("version", ["cpp", "python"])
+def test_same_seed_same_deal(version):
+    import rummikub_solver as rs
+    engine_class = rs.GameEngine if version == "cpp" else GameEngine
+
+    def deal(engine):
+        return [str(t) for t in engine.state.stock], [[str(t) for t in hand] for hand in engine.state.hands]
+
+    first = engine_class(players=2, seed=7)
+    assert deal(first) == deal(engine_class(players=2, seed=7))
+    assert deal(first) != deal(engine_class(players=2, seed=8))
+
+    # reset continues the engine's stream, reset(seed) restarts it
+    second = engine_class(players=2, seed=7)
+    first.reset()
+    second.reset()
+    assert deal(first) == deal(second)
+    first.reset(seed=3)
+    assert deal(first) == deal(engine_class(players=2, seed=3))
+
+
+@pytest.mark.parametrize("version", ["cpp", "python"])
+def test_env_reset_seed_replays_games(version):
+    env = RummikubEnv(blocks_range=6, blocks_start=8, version=version)
+
+    def play(seed):
+        obs, info = env.reset(seed=seed)
+        history = [obs.copy()]
+        for _ in range(10):
+            mask = info["action_mask"]
+            obs, reward, terminated, _, info = env.step(int(np.flatnonzero(mask)[-1]))
+            history.append(obs.copy())
+            if terminated:
+                break
+        return history
+
+    first, second = play(11), play(11)
+    assert all(np.array_equal(a, b) for a, b in zip(first, second)) and len(first) == len(second)
+
+
+def test_vec_env_reset_seeds():
+    import rummikub_solver as rs
+
+    env = RummikubEnv(blocks_range=6, blocks_start=8)
+    keys = [list(env._action_key(action)) for action in env.actions]
+    vec = rs.VecEnv(2, 2, 8, 6, keys)
+    vec.reset([5, 6])
+    first = vec.observations.copy()
+    vec.reset([5, 6])
+    assert np.array_equal(first, vec.observations)
+    assert not np.array_equal(first[0], first[1])
+
+
 # --- Test for enumerate_moves ---
 
 def test_enumerate_moves_basic():
@@ -32,6 +88,237 @@ def test_enumerate_moves_basic():
         assert all(tile in engine.state.hands[player] for tile in used)
 
 
+# --- Test for the move cache ---
+
+def test_enumerate_moves_cache():
+    engine = GameEngine(players=2)
+    player = engine.state.current_player
+
+    first = engine.enumerate_moves(player)
+    second = engine.enumerate_moves(player)
+    assert first == second
+    assert (engine.cache_hits, engine.cache_misses) == (1, 1)
+
+    # Drawing a tile changes the state, so the cached moves must not be reused
+    engine.next_player(placed=False)
+    engine.enumerate_moves(player)
+    assert (engine.cache_hits, engine.cache_misses) == (1, 2)
+
+
+def test_env_step_reuses_mask_moves():
+    env = RummikubEnv(blocks_range=6, blocks_start=8)
+    obs, info = env.reset()
+    for _ in range(5):
+        mask = info["action_mask"]
+        action = np.random.choice(np.where(mask)[0])
+        misses = env.engine.cache_misses
+        obs, reward, terminated, truncated, info = env.step(action)
+        # one enumeration for the mask of the new state, none for the step itself
+        assert env.engine.cache_misses == misses + 1
+        if terminated:
+            break
+
+
+# --- Test for batched move enumeration ---
+
+def test_enumerate_moves_batch_matches_single():
+    import rummikub_solver as rs
+
+    engines = [rs.GameEngine(players=2) for _ in range(4)]
+    engines[1].next_player(placed=False)
+    expected = [[(str(t), str(u)) for t, u in rs.possible_moves(e.state.hands[e.state.current_player], e.state.table, 3)]
+                for e in engines]
+
+    by_state = rs.enumerate_moves_batch([e.state for e in engines])
+    by_engine = rs.GameEngine.enumerate_moves_batch(engines)
+    for moves in (by_state, by_engine):
+        assert [[(str(t), str(u)) for t, u in m] for m in moves] == expected
+
+    # the engine batch fills the per-engine cache
+    assert all(e.cache_misses == 1 for e in engines)
+    with pytest.raises(ValueError):
+        rs.GameEngine.enumerate_moves_batch([engines[0], engines[0]])
+
+
+def test_python_enumerate_moves_batch():
+    engines = [GameEngine(players=2) for _ in range(2)]
+    assert GameEngine.enumerate_moves_batch(engines) == [e.enumerate_moves(e.state.current_player) for e in engines]
+
+
+# --- Test for the engine observation buffers ---
+
+def test_engine_buffers_are_read_only_views():
+    import rummikub_solver as rs
+    env = RummikubEnv(blocks_range=6, blocks_start=8)
+    obs, info = env.reset()
+    mask = info["action_mask"]
+    engine_obs = env.engine.observation
+    assert not engine_obs.flags.owndata and not engine_obs.flags.writeable
+    assert not env.engine.action_mask.flags.writeable
+    with pytest.raises(ValueError):
+        engine_obs[0] = 1
+
+    def expected_obs():
+        state = env.engine.state
+        vec = np.zeros(env.number_of_tiles, dtype=np.int32)
+        for t in state.hands[state.current_player] + [t for meld in state.table for t in meld]:
+            vec[env._tile_index(t)] += 1
+        return vec
+
+    assert np.array_equal(obs, expected_obs())
+    first_obs, first_mask = obs.copy(), mask.copy()
+    new_obs, *_ = env.step(1)
+    # the env returns copies, the engine's views follow its buffers
+    assert np.array_equal(obs, first_obs) and np.array_equal(mask, first_mask)
+    assert np.array_equal(new_obs, expected_obs()) and np.array_equal(engine_obs, expected_obs())
+    assert obs.dtype == env.observation_space.dtype
+
+    # the buffers are never reallocated: the same table keeps the views valid, another size is refused
+    env.engine.set_action_table(env.action_table)
+    env.engine.update_observation()
+    assert np.array_equal(engine_obs, expected_obs())
+    with pytest.raises(ValueError):
+        env.engine.set_action_table(rs.get_action_table(5))
+    env.engine.update_observation()
+    assert np.array_equal(engine_obs, expected_obs())
+
+
+# --- Tests for the vectorized environment ---
+
+def test_vec_env_matches_single_env():
+    import rummikub_solver as rs
+
+    env = RummikubEnv(blocks_range=6, blocks_start=8)
+    keys = [list(env._action_key(action)) for action in env.actions]
+    vec = rs.VecEnv(3, 2, 8, 6, keys)
+    vec.reset()
+    assert vec.observations.shape == (3, env.number_of_tiles)
+    assert vec.action_masks.shape == (3, env.max_actions)
+
+    for _ in range(30):
+        actions = []
+        singles = []
+        for i in range(vec.num_envs):
+            single = RummikubEnv(blocks_range=6, blocks_start=8)
+            single.engine.state = vec.engine(i).state.clone()
+            assert np.array_equal(single._get_obs(), vec.observations[i])
+            assert np.array_equal(single._get_mask(), vec.action_masks[i])
+            actions.append(np.random.choice(np.flatnonzero(vec.action_masks[i])))
+            singles.append(single)
+
+        vec.step(np.array(actions))
+        for i, (single, action) in enumerate(zip(singles, actions)):
+            obs, reward, terminated, _, _ = single.step(action)
+            assert vec.rewards[i] == reward
+            assert vec.dones[i] == terminated
+            expected_obs = vec.terminal_observations[i] if terminated else vec.observations[i]
+            assert np.array_equal(obs, expected_obs)
+
+
+def test_vec_env_rejects_illegal_batch_before_stepping():
+    import rummikub_solver as rs
+
+    env = RummikubEnv(blocks_range=6, blocks_start=8)
+    vec = rs.VecEnv(3, 2, 8, 6, [list(env._action_key(action)) for action in env.actions])
+    vec.reset(seeds=[0, 1, 2])
+    before = (vec.observations.copy(), vec.action_masks.copy(), [vec.engine(i).state.zobrist_hash() for i in range(3)])
+
+    legal = [int(np.flatnonzero(vec.action_masks[i])[0]) for i in range(3)]
+    illegal = int(np.flatnonzero(vec.action_masks[2] == 0)[0])
+    for actions, error in [(legal[:2] + [illegal], ValueError), (legal[:2] + [env.max_actions], IndexError)]:
+        with pytest.raises(error):
+            vec.step(np.array(actions))
+        # no env moved, so the same batch can be retried with a legal action
+        assert np.array_equal(vec.observations, before[0]) and np.array_equal(vec.action_masks, before[1])
+        assert [vec.engine(i).state.zobrist_hash() for i in range(3)] == before[2]
+    vec.step(np.array(legal))
+
+
+def test_rummikub_vec_env_masks():
+    pytest.importorskip("stable_baselines3")
+    from python.vec_env import RummikubVecEnv
+
+    vec = RummikubVecEnv(2, blocks_range=6, blocks_start=8)
+    obs = vec.reset()
+    assert obs.shape == (2, vec.observation_space.shape[0])
+    masks = np.stack(vec.env_method("action_masks"))
+    assert masks.shape == (2, vec.action_space.n)
+
+    actions = [np.random.choice(np.flatnonzero(mask)) for mask in masks]
+    obs, rewards, dones, infos = vec.step(np.array(actions))
+    assert obs.shape == (2, vec.observation_space.shape[0]) and len(infos) == 2
+
+
+# --- Tests for the shared action table ---
+
+@pytest.mark.parametrize("blocks_range", [3, 8, 13])
+def test_action_table_same_for_both_engines(blocks_range):
+    import rummikub_solver as rs
+    from python.environment import get_action_space
+    cpp, python = get_action_space(blocks_range, "cpp"), get_action_space(blocks_range, "python")
+    # the C++ table is built in the order of the Python actions
+    assert np.array_equal(cpp.keys, python.keys)
+    assert dict(cpp.index) == dict(python.index)
+    assert cpp.table is rs.get_action_table(blocks_range)
+    assert not cpp.keys.flags.writeable and not python.keys.flags.writeable
+
+
+def test_envs_share_action_table():
+    first, second = RummikubEnv(render_mask=False), RummikubEnv(render_mask=False)
+    assert first.actions is second.actions
+    assert first.action_table is second.action_table
+
+    table = first.action_table
+    for action in (2, 100, first.max_actions - 1):
+        tiles = list(first._flatten(first.actions[action - 2]))
+        assert table.find(tiles) == action
+        assert table.find_key(list(reversed(first._action_key(tiles)))) == action
+    assert table.find_key([0, 0, 0]) == -1
+
+
+# --- Test for the action mask ---
+
+def test_mask_same_for_both_engines():
+    import rummikub_solver as rs
+
+    cpp_color = {"Red": rs.TileColor.Red, "Blue": rs.TileColor.Blue, "Yellow": rs.TileColor.Yellow,
+                 "Black": rs.TileColor.Black, "Joker": rs.TileColor.Joker}
+    hand = [Tile(1, "Red"), Tile(2, "Red"), Tile(4, "Blue"), Tile(4, "Yellow"), Tile(1, "Joker"), Tile(6, "Black")]
+    table = [[Tile(3, "Red"), Tile(4, "Red"), Tile(5, "Red")], [Tile(4, "Black"), Tile(4, "Red"), Tile(4, "Blue")]]
+
+    masks = []
+    for version in ("cpp", "python"):
+        env = RummikubEnv(blocks_range=6, blocks_start=8, version=version)
+        env.reset()
+        convert = (lambda t: rs.Tile(t.number, cpp_color[t.color])) if version == "cpp" else (lambda t: t)
+        hands = [[convert(t) for t in hand], []]
+        env.engine.state.hands = hands
+        env.engine.state.table = [[convert(t) for t in meld] for meld in table]
+        masks.append(env._get_mask())
+
+    assert isinstance(masks[0], np.ndarray)
+    assert masks[0].sum() > 2
+    assert np.array_equal(masks[0], masks[1])
+
+
+
+def test_env_info_has_solver_stats():
+    import rummikub_solver as rs
+
+    env = RummikubEnv(solver_stats=True)
+    try:
+        _, info = env.reset(seed=0)
+        assert info["solver_stats"]["exact_cover_calls"] > 0
+        action = int(np.flatnonzero(info["action_mask"])[-1])
+        stats = env.step(action)[4]["solver_stats"]
+    finally:
+        rs.set_stats_enabled(False)
+        rs.reset_stats()
+
+    assert stats["pre_filter_calls"] >= 1
+    assert stats["step_seconds"] > 0
+    assert "solver_stats" not in RummikubEnv().reset(seed=0)[1]
+
 # --- Test for apply_move and play ---
 
 def test_apply_move_pass_and_play():
@@ -56,6 +343,21 @@ def test_apply_move_pass_and_play():
     assert engine.state.winner == 1
 
 
+def test_cpp_apply_move_rejects_out_of_range_tile():
+    import rummikub_solver as rs
+
+    def t(number, color=rs.TileColor.Blue):
+        return rs.Tile(number, color)
+
+    engine = rs.GameEngine(players=2, seed=0)
+    engine.state.hands = [[t(1), t(2), t(3)], [t(9)]]
+    # Red 14 would share the index of Blue 1
+    for tile in (rs.Tile(14, rs.TileColor.Red), rs.Tile(0, rs.TileColor.Blue)):
+        with pytest.raises(RuntimeError, match="required tile"):
+            engine.apply_move(0, ([[t(1), t(2), t(3)]], [tile, t(2), t(3)]))
+    assert str(engine.state.hands[0]) == "[B1, B2, B3]" and engine.state.table == []
+
+
 # --- Test for clone ---
 
 def test_clone_independence():
@@ -66,6 +368,114 @@ def test_clone_independence():
     assert len(clone_state.hands[0]) != len(engine.state.hands[0])
 
 
+def test_cpp_clone_shares_until_changed():
+    import rummikub_solver as rs
+
+    engine = rs.GameEngine(players=2, seed=1)
+    stock = [str(t) for t in engine.state.stock]
+    moves = engine.enumerate_moves(0)
+
+    fork = rs.GameEngine(players=2)
+    fork.state = engine.state.clone()
+    assert [str(t) for t in fork.state.stock] == stock
+
+    # drawing and playing in the fork leaves the original untouched
+    if moves:
+        fork.apply_move(0, moves[0])
+    fork.next_player(placed=bool(moves))
+    fork.next_player(placed=False)
+    assert len(fork.state.stock) == len(stock) - (1 if moves else 2)
+    assert [str(t) for t in engine.state.stock] == stock
+    assert engine.state.table == []
+
+    # the original keeps drawing the same tiles as before the fork
+    engine.next_player(placed=False)
+    assert str(engine.state.hands[0][-1]) == stock[-1]
+    assert rs.measure_clone_rate(engine.state, 1000) > 0
+
+
+def test_cpp_state_getters_return_copies():
+    import rummikub_solver as rs
+
+    state = rs.GameState(2, seed=0)
+    state.table = [[rs.Tile(n, rs.TileColor.Red) for n in (1, 2, 3)]]
+    clone = state.clone()
+    hash_before = state.zobrist_hash()
+
+    # a tile taken from the table or a hand is a copy, writing it changes neither the state nor its clones
+    tile = state.table[0][0]
+    tile.number, tile.color = 7, rs.TileColor.Blue
+    state.hands[0][0].number = 13
+    assert str(state.table) == str(clone.table) == "[[R1, R2, R3]]"
+    assert str(state.hands) == str(clone.hands)
+    assert state.zobrist_hash() == hash_before
+
+
+# --- Tests for the Zobrist hash ---
+
+def test_layout_hash_ignores_order():
+    import rummikub_solver as rs
+
+    def t(number, color):
+        return rs.Tile(number, getattr(rs.TileColor, color))
+
+    run = [t(1, "Red"), t(2, "Red"), t(3, "Red")]
+    group = [t(5, "Red"), t(5, "Blue"), t(5, "Black")]
+    assert rs.layout_hash([run, group]) == rs.layout_hash([group[::-1], run[::-1]])
+    assert rs.tiles_hash(run + group) == rs.tiles_hash(group + run)
+    # the same tiles split into other melds, and a repeated meld, change the hash
+    assert rs.layout_hash([run + [t(4, "Red")], group]) != rs.layout_hash([run, [t(4, "Red")] + group])
+    assert rs.layout_hash([run, run]) != rs.layout_hash([run])
+    assert rs.layout_hash([]) == 0
+
+
+def test_state_hash_follows_moves():
+    import rummikub_solver as rs
+
+    engine = rs.GameEngine(players=2, seed=3)
+    hashes = set()
+    for _ in range(12):
+        state = engine.state
+        player = state.current_player
+        moves = engine.enumerate_moves(player)
+        if moves:
+            engine.apply_move(player, moves[0])
+        engine.next_player(placed=bool(moves))
+
+        # the incrementally updated hash equals the one of a state rebuilt from scratch
+        rebuilt = engine.state.clone()
+        rebuilt.hands = engine.state.hands
+        rebuilt.table = [meld[::-1] for meld in engine.state.table[::-1]]
+        assert rebuilt.zobrist_hash() == engine.state.zobrist_hash()
+        assert rebuilt.position_hash(0) == engine.state.position_hash(0)
+        hashes.add(engine.state.zobrist_hash())
+        if engine.state.done:
+            break
+    assert len(hashes) > 1
+
+
+def test_state_hash_and_move_cache_survive_tile_writes():
+    import rummikub_solver as rs
+
+    def t(number, color):
+        return rs.Tile(number, getattr(rs.TileColor, color))
+
+    engine = rs.GameEngine(players=2, seed=0)
+    state = engine.state
+    state.hands = [[t(4, "Red")], [t(9, "Black")]]
+    state.table = [[t(1, "Red"), t(2, "Red"), t(3, "Red")]]
+    moves = engine.enumerate_moves(0)
+
+    # writing tiles taken from the state changes neither the table, nor the hash, nor the cached moves
+    for tile, number in zip(engine.state.table[0], (7, 8, 9)):
+        tile.number, tile.color = number, rs.TileColor.Blue
+    rebuilt = engine.state.clone()
+    rebuilt.table = [[t(1, "Red"), t(2, "Red"), t(3, "Red")]]
+    assert engine.state.zobrist_hash() == rebuilt.zobrist_hash()
+    assert str(engine.enumerate_moves(0)) == str(moves) == str(
+        rs.possible_moves(engine.state.hands[0], engine.state.table, 3))
+
+
 # --- Test for full game integration ---
 
 def test_full_game_random_mini():
@@ -79,3 +489,28 @@ def test_full_game_random_mini():
         obs, reward, terminated, truncated, info = env.step(action)
     assert env.engine.state.done
     assert 0 <= env.engine.state.winner < env.engine.state.players
+
+
+# --- Tests for native simulation ---
+
+@pytest.mark.parametrize("policy", ["random", "greedy"])
+def test_simulate_reproducible(policy):
+    import rummikub_solver as rs
+    first = rs.simulate(3, policy, threads=1, seed=5, blocks_range=9, blocks_start=10)
+    second = rs.simulate(3, policy, threads=2, seed=5, blocks_range=9, blocks_start=10)
+    # every game is dealt from its own seed, so the thread count does not change the results
+    assert first.winners == second.winners
+    assert (first.rounds, first.moves, first.tiles_placed) == (second.rounds, second.moves, second.tiles_placed)
+    assert first.games == 3 and len(first.game_seconds) == 3
+    assert sum(first.wins) + first.unfinished == 3
+    assert all(0 <= winner < 2 for winner in first.winners)
+
+
+def test_simulate_with_action_table():
+    import rummikub_solver as rs
+    env = RummikubEnv(blocks_range=9, blocks_start=10, render_mask=False)
+    stats = rs.simulate(2, "greedy", seed=1, blocks_range=9, blocks_start=10, action_table=env.action_table)
+    assert sum(stats.wins) + stats.unfinished == 2
+    assert sum(stats.tiles_placed) > 0
+    with pytest.raises(ValueError):
+        rs.simulate(1, "best")
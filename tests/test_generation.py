@@ -1,6 +1,8 @@
 import pytest
 from python.tile import Tile
-from python.generation import generate_all_possible_melds, pre_filter_unplayable_tiles, find_all_valid_moves, possible_moves
+from itertools import combinations
+from python.generation import (generate_all_possible_melds, pre_filter_unplayable_tiles, find_all_valid_moves, possible_moves,
+                               PlayabilityIndex, MeldSession)
 
 # Definicje kolorów dla czytelności testów
 R = "Red"
@@ -70,6 +72,23 @@ def test_pre_filter_unplayable_tiles(hand, table, playable, unplayable):
     assert sorted(u) == sorted(unplayable)
 
 
+
+def test_playability_index_updates_match_rebuild():
+    """An index updated tile by tile answers like one built from the final pool"""
+    index = PlayabilityIndex([Tile(5, B), Tile(5, Y), Tile(8, B), Tile(9, B), Tile(10, B)])
+    assert index.is_playable(Tile(9, B))      # szereg 8B 9B 10B
+
+    index.remove(Tile(10, B))
+    assert not index.is_playable(Tile(9, B))
+    index.add(JOKER)
+    assert index.is_playable(Tile(9, B))      # 8B 9B z jokerem
+
+    index.remove(JOKER)
+    index.add(Tile(5, R))
+    rebuilt = PlayabilityIndex([Tile(5, B), Tile(5, Y), Tile(8, B), Tile(9, B), Tile(5, R)])
+    tiles = [Tile(number, color) for number in range(1, 14) for color in (R, B, Y, G)]
+    assert [index.is_playable(tile) for tile in tiles] == [rebuilt.is_playable(tile) for tile in tiles]
+
 # --- Tests for find_all_valid_moves ---
 
 @pytest.mark.parametrize("hand, table, first_only, expected_count", [
@@ -104,6 +123,19 @@ def test_find_all_valid_moves(hand, table, first_only, expected_count):
         assert used_from_hand > 0 or (hand == [] and table == [])
 
 
+def test_meld_session_matches_find_all_valid_moves():
+    """Every hand combination searched over one session finds what a separate find_all_valid_moves call finds"""
+    hand = [Tile(4, R), Tile(5, R), Tile(7, B), Tile(7, Y), JOKER, Tile(12, G)]
+    table = [[Tile(6, R), Tile(7, R), Tile(8, R)], [Tile(7, R), Tile(7, G), Tile(7, B)]]
+    session = MeldSession(hand, table)
+
+    for r in range(1, 4):
+        for combo in combinations(hand, r):
+            combo = list(combo)
+            assert set(session.view(combo)) <= set(session.view(hand))
+            assert sorted(session.find_moves(combo)) == sorted(find_all_valid_moves(combo, table))
+            assert session.find_moves(combo, True) == find_all_valid_moves(combo, table, True)
+
 # --- Tests for possible_moves ---
 
 @pytest.mark.parametrize("hand, table, expected_count", [
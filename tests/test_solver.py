@@ -0,0 +1,500 @@
+import itertools
+import random
+
+import pytest
+import rummikub_solver as rs
+
+from python.tile import Tile
+from python.validation import is_table_valid
+from python.generation import (pre_filter_unplayable_tiles, find_all_valid_moves, possible_moves,
+                               generate_all_possible_melds, get_meld_table, best_move, iter_moves, can_play,
+                               has_any_move, JOKER_VALUE)
+
+# Definicje kolorów dla czytelności testów
+R = "Red"
+B = "Blue"
+G = "Black"
+Y = "Yellow"
+
+# Definicja JOKERA
+JOKER = Tile(1, "Joker")
+
+CPP_COLORS = {R: rs.TileColor.Red, B: rs.TileColor.Blue, Y: rs.TileColor.Yellow, G: rs.TileColor.Black,
+              "Joker": rs.TileColor.Joker}
+
+
+def to_cpp(tiles):
+    return [rs.Tile(t.number, CPP_COLORS[t.color]) for t in tiles]
+
+
+def to_cpp_table(table):
+    return [to_cpp(meld) for meld in table]
+
+
+def key(tiles):
+    """Order independent key of a tile multiset, comparable between engines"""
+    return sorted((t.number, str(t.color).split(".")[-1]) for t in tiles)
+
+
+POSITIONS = [
+    # pusty stół, ręka z szeregiem i grupą
+    ([Tile(1, R), Tile(2, R), Tile(3, R), Tile(7, B), Tile(7, Y), Tile(7, G)], []),
+    # dokładanie do szeregu i grupy
+    ([Tile(4, R), Tile(9, B), Tile(5, Y)], [[Tile(1, R), Tile(2, R), Tile(3, R)], [Tile(9, R), Tile(9, Y), Tile(9, G)]]),
+    # joker w ręce i na stole
+    ([JOKER, Tile(6, B), Tile(11, G)], [[Tile(4, B), JOKER, Tile(6, B)], [Tile(12, G), Tile(13, G), Tile(11, Y)]]),
+    # przebudowa stołu
+    ([Tile(5, R), Tile(5, B)], [[Tile(3, R), Tile(4, R), Tile(5, R), Tile(6, R)], [Tile(4, B), Tile(5, B), Tile(6, B)]]),
+    # po dwa egzemplarze kafelków na stole i w ręce
+    ([Tile(4, Y), Tile(8, Y), Tile(2, G)], [[Tile(5, Y), Tile(6, Y), Tile(7, Y)], [Tile(5, Y), Tile(6, Y), Tile(7, Y)],
+                                           [Tile(2, R), Tile(2, B), Tile(2, G)], [Tile(3, G), Tile(4, G), Tile(5, G)]]),
+]
+
+
+# --- Tests comparing the C++ solver with the Python implementation ---
+
+@pytest.mark.parametrize("blocks_range", [3, 6, 13])
+def test_meld_table_same_size(blocks_range):
+    assert len(get_meld_table(blocks_range).melds) == rs.meld_table_size(blocks_range)
+
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_generate_all_possible_melds_matches_python(hand, table):
+    pool = hand + [t for meld in table for t in meld]
+    melds = rs.generate_all_possible_melds(to_cpp(pool))
+    expected = generate_all_possible_melds(pool)
+    assert sorted(map(str, map(key, melds))) == sorted(map(str, map(key, expected)))
+
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_pre_filter_matches_python(hand, table):
+    playable, unplayable = rs.pre_filter_unplayable_tiles(to_cpp(hand), to_cpp_table(table))
+    expected_playable, expected_unplayable = pre_filter_unplayable_tiles(hand, table)
+    assert key(playable) == key(expected_playable)
+    assert key(unplayable) == key(expected_unplayable)
+
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_find_all_valid_moves_matches_python(hand, table):
+    moves = rs.find_all_valid_moves(to_cpp(hand), to_cpp_table(table), False)
+    expected = find_all_valid_moves(hand, table)
+    assert sorted(sorted(map(str, map(key, layout))) for layout in moves) == \
+           sorted(sorted(map(str, map(key, layout))) for layout in expected)
+
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_possible_moves_matches_python(hand, table):
+    moves = rs.possible_moves(to_cpp(hand), to_cpp_table(table), 3)
+    expected = possible_moves(hand, table, 3)
+    assert sorted(map(str, (key(used) for _, used in moves))) == sorted(map(str, (key(used) for _, used in expected)))
+
+    for new_table, used in moves:
+        assert key(t for meld in new_table for t in meld) == \
+               key(list(used) + to_cpp([t for meld in table for t in meld]))
+
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_find_all_valid_moves_first_only(hand, table):
+    all_moves = rs.find_all_valid_moves(to_cpp(hand), to_cpp_table(table), False)
+    first = rs.find_all_valid_moves(to_cpp(hand), to_cpp_table(table), True)
+    assert len(first) == min(1, len(all_moves))
+    layouts = [sorted(map(str, map(key, layout))) for layout in all_moves]
+    for layout in first:
+        assert sorted(map(str, map(key, layout))) in layouts
+
+
+# --- Tests for the lazy move iterators ---
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_iter_moves_matches_possible_moves(hand, table):
+    cpp_hand, cpp_table = to_cpp(hand), to_cpp_table(table)
+    expected = rs.possible_moves(cpp_hand, cpp_table, 3)
+    assert [(str(t), str(u)) for t, u in rs.iter_moves(cpp_hand, cpp_table, 3)] == \
+           [(str(t), str(u)) for t, u in expected]
+    assert list(iter_moves(hand, table, 3)) == possible_moves(hand, table, 3)
+
+    # stopping early gives the first moves of the full list
+    assert [str(u) for _, u in itertools.islice(rs.iter_moves(cpp_hand, cpp_table, 3), 1)] == \
+           [str(u) for _, u in expected[:1]]
+
+
+def test_engine_iter_moves():
+    engine = rs.GameEngine(players=2, seed=4)
+    lazy = [(str(t), str(u)) for t, u in engine.iter_moves(0)]
+    expected = [(str(t), str(u)) for t, u in engine.enumerate_moves(0)]
+    assert lazy == expected
+    # the second pass comes from the move cache
+    assert [(str(t), str(u)) for t, u in engine.iter_moves(0)] == expected
+
+
+def test_python_engine_iter_moves():
+    from python.game import GameEngine
+    engine = GameEngine(2, seed=4)
+    assert list(engine.iter_moves(0)) == engine.enumerate_moves(0)
+    assert list(engine.iter_moves(0)) == engine.enumerate_moves(0)
+    assert engine.has_any_move(0) == bool(engine.enumerate_moves(0))
+    assert engine.can_play_batch(0, [used for _, used in engine.enumerate_moves(0)]) == [True] * len(engine.enumerate_moves(0))
+
+
+# --- Tests for the legality queries ---
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_can_play_matches_possible_moves(hand, table):
+    tile_sets = [list(c) for r in range(1, 4) for c in itertools.combinations(hand, r)] + [[Tile(13, R)], []]
+    legal = {str(key(used)) for _, used in possible_moves(hand, table, 3)}
+    expected = [bool(tiles) and str(key(tiles)) in legal for tiles in tile_sets]
+
+    assert can_play(hand, table, tile_sets) == expected
+    assert rs.can_play(to_cpp(hand), to_cpp_table(table), [to_cpp(tiles) for tiles in tile_sets]) == expected
+    assert has_any_move(hand, table, 3) == any(expected)
+    assert rs.has_any_move(to_cpp(hand), to_cpp_table(table), 3) == any(expected)
+
+
+def test_engine_can_play_matches_mask():
+    from python.environment import RummikubEnv
+    env = RummikubEnv(players=2, version="cpp", render_mask=False)
+    env.reset(seed=6)
+    keys = [list(env._flatten(action)) for action in env.actions]
+    player = env.engine.state.current_player
+
+    # without the move cache the sets are solved, with it they are looked up
+    solved = env.engine.can_play_batch(player, keys)
+    assert env.engine.has_any_move(player) == bool(env.engine.enumerate_moves(player))
+    cached = env.engine.can_play_batch(player, keys)
+    assert solved == cached == [bool(x) for x in env._get_mask()[2:]]
+    assert env.engine.can_play(player, []) is False
+
+
+# --- Tests for the best move search ---
+
+def objective_value(tiles, objective):
+    if objective == "tiles":
+        return len(tiles)
+    return sum(JOKER_VALUE if "Joker" in str(t.color) else t.number for t in tiles)
+
+
+@pytest.mark.parametrize("objective", ["tiles", "value"])
+@pytest.mark.parametrize("max_tiles", [3, 0])
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_best_move_matches_enumeration(hand, table, max_tiles, objective):
+    expected = max((objective_value(used, objective) for _, used in possible_moves(hand, table, max_tiles)), default=0)
+
+    for move in (best_move(hand, table, objective, max_tiles),
+                 rs.best_move(to_cpp(hand), to_cpp_table(table), objective, max_tiles)):
+        if move is None:
+            assert expected == 0
+            continue
+        new_table, used = move
+        assert objective_value(used, objective) == expected
+        assert key(t for meld in new_table for t in meld) == key(list(used) + [t for meld in table for t in meld])
+        assert is_table_valid([[Tile(number, color) for number, color in key(meld)] for meld in new_table])
+
+
+def test_engine_best_move():
+    engine = rs.GameEngine(players=2, seed=3)
+    move = engine.best_move(0)
+    moves = engine.enumerate_moves(0)
+    assert (move is None) == (not moves)
+    if move is not None:
+        assert len(move[1]) == max(len(used) for _, used in moves)
+        engine.apply_move(0, move)
+    with pytest.raises(ValueError):
+        rs.best_move(to_cpp(POSITIONS[0][0]), [], "points")
+
+
+
+# --- Tests for the dp solver backend ---
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+@pytest.mark.parametrize("max_tiles", [0, 3])
+def test_dp_max_tiles_matches_exact_cover(hand, table, max_tiles):
+    cpp_hand, cpp_table = to_cpp(hand), to_cpp_table(table)
+    dp = rs.max_tiles_placeable(cpp_hand, cpp_table, max_tiles, "dp")
+    assert dp == rs.max_tiles_placeable(cpp_hand, cpp_table, max_tiles, "exact_cover")
+    assert rs.has_any_move(cpp_hand, cpp_table, 3, "dp") == rs.has_any_move(cpp_hand, cpp_table, 3)
+
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_dp_can_play_matches_exact_cover(hand, table):
+    tile_sets = [list(c) for r in (1, 2, 3) for c in itertools.combinations(to_cpp(hand), r)]
+    dp = rs.can_play(to_cpp(hand), to_cpp_table(table), tile_sets, "dp")
+    assert dp == rs.can_play(to_cpp(hand), to_cpp_table(table), tile_sets)
+
+
+def test_dp_joker_beyond_full_run():
+    """A joker added to the run 1..13 sits outside the numbers, which the sweep allows at both ends"""
+    table = [[Tile(number, R) for number in range(1, 14)]]
+    assert rs.max_tiles_placeable(to_cpp([JOKER, JOKER]), to_cpp_table(table), 0, "dp") == 2
+    assert rs.max_tiles_placeable(to_cpp([Tile(5, B)]), to_cpp_table(table), 0, "dp") == 0
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_dp_backend_on_game_positions(seed):
+    import random
+    random.seed(seed)
+    engine = rs.GameEngine(players=2, seed=seed)
+    dp_engine = rs.GameEngine(players=2, seed=seed)
+    dp_engine.set_solver_backend("dp")
+    assert dp_engine.get_solver_backend() == "dp"
+
+    for _ in range(30):
+        if engine.state.done:
+            break
+        player = engine.state.current_player
+        dp_engine.state = engine.state.clone()
+        assert dp_engine.max_tiles_placeable(player) == engine.max_tiles_placeable(player)
+        assert dp_engine.has_any_move(player) == engine.has_any_move(player)
+        hand = engine.state.hands[player]
+        tile_sets = [random.sample(hand, min(k, len(hand))) for k in (1, 2, 3)]
+        assert dp_engine.can_play_batch(player, tile_sets) == engine.can_play_batch(player, tile_sets)
+
+        moves = engine.enumerate_moves(player)
+        if moves and random.random() < 0.7:
+            engine.apply_move(player, random.choice(moves))
+            engine.next_player(True)
+        else:
+            engine.next_player(False)
+
+    with pytest.raises(ValueError):
+        dp_engine.set_solver_backend("ilp")
+
+# --- Tests for the solver thread pool ---
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_single_threaded_same_moves(hand, table):
+    threads = rs.get_num_threads()
+    try:
+        rs.set_num_threads(1)
+        assert rs.get_num_threads() == 1
+        single = rs.possible_moves(to_cpp(hand), to_cpp_table(table), 3)
+        rs.set_num_threads(4)
+        parallel = rs.possible_moves(to_cpp(hand), to_cpp_table(table), 3)
+    finally:
+        rs.set_num_threads(threads)
+
+    assert [(str(t), str(u)) for t, u in single] == [(str(t), str(u)) for t, u in parallel]
+
+
+def test_set_num_threads_while_solving():
+    from concurrent.futures import ThreadPoolExecutor
+    hand, table = POSITIONS[0]
+    expected = str(rs.possible_moves(to_cpp(hand), to_cpp_table(table), 3))
+    threads = rs.get_num_threads()
+
+    def resize(i):
+        rs.set_num_threads(1 + i % 4)
+
+    def solve(_):
+        return str(rs.possible_moves(to_cpp(hand), to_cpp_table(table), 3))
+
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            resizes = [executor.submit(resize, i) for i in range(40)]
+            results = list(executor.map(solve, range(40)))
+            for future in resizes:
+                future.result()
+    finally:
+        rs.set_num_threads(threads)
+
+    assert all(result == expected for result in results)
+
+
+# --- Tests for the colour-symmetry cache ---
+
+def permute_colors(tiles, colors):
+    """Tiles with every colour c replaced by colors[c], jokers unchanged"""
+    mapping = dict(zip((R, B, Y, G), colors))
+    return [t if t.color == "Joker" else Tile(t.number, mapping[t.color]) for t in tiles]
+
+
+def test_canonical_colors_same_for_permuted_positions():
+    hand, table = POSITIONS[4]
+    forms = set()
+    for colors in itertools.permutations((R, B, Y, G)):
+        canonical_hand, canonical_table, permutation = rs.canonical_colors(
+            to_cpp(permute_colors(hand, colors)), to_cpp_table([permute_colors(meld, colors) for meld in table]))
+        assert len(permutation) == 4
+        forms.add((str(canonical_hand), str(canonical_table)))
+    assert len(forms) == 1
+
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_symmetry_cache_remaps_moves(hand, table):
+    try:
+        rs.set_solver_cache(True, max_entries=100)
+        rs.clear_solver_cache()
+        for colors in [(R, B, Y, G), (G, Y, B, R), (B, R, G, Y)]:
+            cpp_hand = to_cpp(permute_colors(hand, colors))
+            cpp_table = to_cpp_table([permute_colors(meld, colors) for meld in table])
+            cached = rs.possible_moves(cpp_hand, cpp_table, 3)
+            rs.set_solver_cache(False)
+            solved = rs.possible_moves(cpp_hand, cpp_table, 3)
+            rs.set_solver_cache(True, max_entries=100)
+
+            # the same moves in the same order, each with a valid table made of the old table and the used tiles
+            assert [str(used) for _, used in cached] == [str(used) for _, used in solved]
+            for new_table, used in cached:
+                assert key([t for meld in new_table for t in meld]) == key([t for meld in cpp_table for t in meld] + used)
+                assert is_table_valid([[Tile(t.number, str(t.color).split(".")[-1]) for t in meld] for meld in new_table])
+        info = rs.solver_cache_info()
+    finally:
+        rs.set_solver_cache(False)
+        rs.clear_solver_cache()
+
+    assert info["entries"] == 1 and info["misses"] == 1
+    assert info["hits"] == 2 and info["hit_rate"] == pytest.approx(2 / 3)
+
+
+
+# --- Tests for the solver result store ---
+
+@pytest.mark.parametrize("hand, table", POSITIONS)
+def test_solver_store_returns_solved_results(tmp_path, hand, table):
+    path = str(tmp_path / "solver.store")
+    cpp_hand, cpp_table = to_cpp(hand), to_cpp_table(table)
+    solved = (rs.find_all_valid_moves(cpp_hand, cpp_table), rs.find_all_valid_moves(cpp_hand, cpp_table, True),
+              rs.possible_moves(cpp_hand, cpp_table, 3))
+    try:
+        rs.open_solver_store(path)
+        for _ in range(2):
+            stored = (rs.find_all_valid_moves(cpp_hand, cpp_table), rs.find_all_valid_moves(cpp_hand, cpp_table, True),
+                      rs.possible_moves(cpp_hand, cpp_table, 3))
+            assert str(stored) == str(solved)
+        info = rs.solver_store_info()
+        assert info["open"] and info["path"] == path
+        assert info["misses"] == info["entries"] and info["hits"] == info["misses"] > 0
+
+        # wpisy zostają w pliku dla następnego otwarcia
+        rs.close_solver_store()
+        assert not rs.solver_store_info()["open"]
+        rs.open_solver_store(path)
+        assert str(rs.possible_moves(cpp_hand, cpp_table, 3)) == str(solved[2])
+        info = rs.solver_store_info()
+        assert info["hits"] == 1 and info["misses"] == 0
+    finally:
+        rs.close_solver_store()
+
+
+def test_engine_moves_use_solver_store(tmp_path):
+    def play(engine, steps=10):
+        """Moves of the first steps of a seeded game, with the copied hand and table of every position"""
+        random.seed(0)
+        seen = []
+        for _ in range(steps):
+            player = engine.state.current_player
+            copy = lambda tiles: [rs.Tile(t.number, t.color) for t in tiles]
+            hand, table = copy(engine.state.hands[player]), [copy(meld) for meld in engine.state.table]
+            moves = engine.enumerate_moves(player)
+            seen.append((hand, table, str(moves)))
+            if moves:
+                engine.apply_move(player, random.choice(moves))
+            engine.next_player(bool(moves))
+        return seen
+
+    solved = play(rs.GameEngine(players=2, seed=3))
+    try:
+        rs.open_solver_store(str(tmp_path / "solver.store"))
+        assert play(rs.GameEngine(players=2, seed=3)) == solved
+        first = rs.solver_store_info()
+        assert first["misses"] > 0 and first["entries"] > 0
+
+        # a new engine, and possible_moves for the same positions, read the entries written by the first engine
+        assert play(rs.GameEngine(players=2, seed=3)) == solved
+        for hand, table, moves in solved:
+            assert str(rs.possible_moves(hand, table, 3)) == moves
+        info = rs.solver_store_info()
+        assert info["misses"] == first["misses"] and info["hits"] > first["hits"]
+    finally:
+        rs.close_solver_store()
+
+
+def test_solver_store_stays_within_max_bytes(tmp_path):
+    path = tmp_path / "solver.store"
+    tiles = [Tile(number, color) for color in (R, B, Y, G) for number in range(1, 14)]
+    try:
+        rs.open_solver_store(str(path), max_bytes=64 * 1024)
+        for pair in itertools.combinations(tiles, 2):
+            assert rs.find_all_valid_moves(to_cpp(pair), []) == []
+        info = rs.solver_store_info()
+        assert info["resets"] > 0 and info["misses"] == 52 * 51 // 2
+        assert path.stat().st_size == info["max_bytes"] == 64 * 1024
+
+        rs.clear_solver_store()
+        assert rs.solver_store_info()["entries"] == 0
+        with pytest.raises(ValueError):
+            rs.open_solver_store(str(path), max_bytes=1024)
+    finally:
+        rs.close_solver_store()
+
+    not_a_store = tmp_path / "notes.txt"
+    not_a_store.write_text("not a store")
+    with pytest.raises(RuntimeError):
+        rs.open_solver_store(str(not_a_store))
+    assert not_a_store.read_text() == "not a store"
+
+
+# --- Tests for the solver statistics ---
+
+def test_stats_count_solver_phases():
+    hand, table = POSITIONS[0]
+    try:
+        rs.set_stats_enabled(True)
+        rs.reset_stats()
+        moves = rs.possible_moves(to_cpp(hand), to_cpp_table(table), 3)
+        stats = rs.get_stats()
+    finally:
+        rs.set_stats_enabled(False)
+        rs.reset_stats()
+
+    assert stats["enabled"]
+    assert stats["moves"] == len(moves)
+    assert stats["combinations"] == stats["exact_cover_calls"] > 0
+    assert stats["search_nodes"] >= stats["combinations"]
+    for phase in ("pre_filter", "meld_generation", "dedup", "conversion"):
+        assert stats[f"{phase}_calls"] == 1
+        assert stats[f"{phase}_seconds"] >= 0
+
+
+def test_stats_off_by_default():
+    hand, table = POSITIONS[0]
+    rs.possible_moves(to_cpp(hand), to_cpp_table(table), 3)
+    stats = rs.get_stats()
+    assert not stats["enabled"]
+    assert all(value == 0 for key, value in stats.items() if key != "enabled")
+
+# --- Tests for the incremental engine solver ---
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_engine_moves_match_full_recompute(seed):
+    import random
+    random.seed(seed)
+    engine = rs.GameEngine(players=2)
+
+    for _ in range(40):
+        if engine.state.done:
+            break
+        player = engine.state.current_player
+        moves = engine.enumerate_moves(player)
+        expected = rs.possible_moves(engine.state.hands[player], engine.state.table, 3)
+        assert [(str(t), str(u)) for t, u in moves] == [(str(t), str(u)) for t, u in expected]
+
+        if moves and random.random() < 0.7:
+            engine.apply_move(player, random.choice(moves))
+            engine.next_player(True)
+        else:
+            engine.next_player(False)
+
+
+def test_engine_moves_follow_direct_state_changes():
+    """The engine's pool index follows hands and tables assigned directly, not only draws and moves"""
+    engine = rs.GameEngine(players=2, seed=3)
+    engine.enumerate_moves(0)
+
+    hands = engine.state.hands
+    hands[0] = to_cpp([Tile(7, R), Tile(8, R), Tile(2, B)])
+    engine.state.hands = hands
+    engine.state.table = to_cpp_table([[Tile(9, R), Tile(10, R), Tile(11, R)]])
+    moves = engine.enumerate_moves(0)
+    expected = rs.possible_moves(engine.state.hands[0], engine.state.table, 3)
+    assert [(str(t), str(u)) for t, u in moves] == [(str(t), str(u)) for t, u in expected]
+    assert moves and all(t.number in (7, 8) for _, used in moves for t in used)
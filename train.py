@@ -6,14 +6,16 @@ import numpy as np
 import time
 import torch
 
-from python.environment import RummikubEnv
+import rummikub_solver
+from python.environment import RummikubEnv, get_action_space
+from python.vec_env import RummikubVecEnv
 
 parser = argparse.ArgumentParser()
 
 parser.add_argument("--players", type=int, default=2)
 parser.add_argument("--blocks_start", type=int, default=14)
 parser.add_argument("--blocks_range", type=int, default=13)
-parser.add_argument("--mode", type=str, default="test", choices=["test", "train", "play"])
+parser.add_argument("--mode", type=str, default="test", choices=["test", "train", "play", "simulate"])
 parser.add_argument("--total_games", type=int, default=1)
 parser.add_argument("--model_path", type=str, default=None)
 parser.add_argument("--save_path", type=str, default="models/ppo_rummikub")
@@ -22,6 +24,10 @@ parser.add_argument("--num_envs", type=int, default=4)
 parser.add_argument("--n_steps", type=int, default=128)
 parser.add_argument("--device", type=str, choices=["cpu", "cuda", "mps", "auto"], default="cpu")
 parser.add_argument("--render", type=int, choices=[0, 1], default=1)
+parser.add_argument("--solver_threads", type=int, default=None)
+parser.add_argument("--policy", type=str, choices=["random", "greedy"], default="random")
+parser.add_argument("--sim_threads", type=int, default=0)
+parser.add_argument("--seed", type=int, default=None)
 
 args = parser.parse_args()
 
@@ -93,7 +99,7 @@ if __name__ == "__main__":
             print(f"Loaded model from {args.model_path}")
 
     if args.mode == "test":
-        env = RummikubEnv(players=args.players, blocks_start=args.blocks_start, blocks_range=args.blocks_range, version=args.engine)
+        env = RummikubEnv(players=args.players, blocks_start=args.blocks_start, blocks_range=args.blocks_range, version=args.engine, solver_threads=args.solver_threads)
         load_model()
 
         print(f"=== Test {args.total_games} {'game' if args.total_games == 1 else 'games'} on {torch.cuda.get_device_name(0) if device == "cuda" else device} ===")
@@ -122,11 +128,37 @@ if __name__ == "__main__":
         for i in range(args.players):
             print(f"Player {i} - Total wins: {w[i]}, Total moves: {mp[i]}, Total tiles placed: {bp[i]}")
 
+    elif args.mode == "simulate":
+        # whole games in C++ without a model, spread over --sim_threads threads
+        env = RummikubEnv(players=args.players, blocks_start=args.blocks_start, blocks_range=args.blocks_range, version="cpp", render_mask=False, solver_threads=args.solver_threads)
+
+        print(f"=== Simulate {args.total_games} {'game' if args.total_games == 1 else 'games'} with the {args.policy} policy ===")
+        stats = rummikub_solver.simulate(args.total_games, args.policy, threads=args.sim_threads, seed=args.seed,
+                                         players=args.players, blocks_start=args.blocks_start,
+                                         blocks_range=args.blocks_range, action_table=env.action_table)
+
+        print(f"\n===== {stats.games} games finished =====")
+        print(f"Total rounds: {stats.rounds}")
+        print(f"Average game time: {sum(stats.game_seconds) / max(len(stats.game_seconds), 1)}")
+        print(f"Wall time: {stats.total_seconds}")
+        if stats.unfinished:
+            print(f"Unfinished games: {stats.unfinished}")
+        for i in range(args.players):
+            print(f"Player {i} - Total wins: {stats.wins[i]}, Total moves: {stats.moves[i]}, Total tiles placed: {stats.tiles_placed[i]}")
+
     elif args.mode == "train":
         def make_env():
-            return lambda: ActionMasker(RummikubEnv(players=args.players, blocks_start=args.blocks_start, blocks_range=args.blocks_range, version=args.engine, render_mask=False), mask_fn)
+            # every worker process solves in its own thread unless told otherwise
+            solver_threads = args.solver_threads if args.solver_threads is not None else 1
+            return lambda: ActionMasker(RummikubEnv(players=args.players, blocks_start=args.blocks_start, blocks_range=args.blocks_range, version=args.engine, render_mask=False, solver_threads=solver_threads), mask_fn)
 
-        env = SubprocVecEnv([make_env() for _ in range(args.num_envs)])
+        if args.engine == "cpp":
+            # all games in this process, stepped by the C++ thread pool
+            env = RummikubVecEnv(args.num_envs, players=args.players, blocks_start=args.blocks_start, blocks_range=args.blocks_range, solver_threads=args.solver_threads)
+        else:
+            # built before the workers start, so forked workers inherit the action table instead of rebuilding it
+            get_action_space(args.blocks_range, args.engine)
+            env = SubprocVecEnv([make_env() for _ in range(args.num_envs)])
         load_model()
 
         print(f"=== Training for around {args.total_games} {'games' if args.total_games != 1 else 'game'} on {torch.cuda.get_device_name(0) if device == "cuda" else device} ===")